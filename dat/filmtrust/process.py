@@ -1,14 +1,44 @@
 import sys
+import argparse
 import scipy.io
 from collections import defaultdict
 import os
-from os.path import join, exists
+from os.path import join, exists, dirname, abspath
 import random
 
 ### command line args
 
-raw_dir = sys.argv[1]
-output_dir = sys.argv[2]
+parser = argparse.ArgumentParser(description='process the raw FilmTrust ' +
+    'data into train, test, validation, and network files')
+parser.add_argument('raw_dir')
+parser.add_argument('output_dir')
+parser.add_argument('--engine', choices=['python', 'numpy'], default='python',
+    help='python is the original per-rating loop (it reproduces the ' +
+    'shipped splits only under Python 2); numpy uses the vectorized split ' +
+    'engine from scripts/split.py')
+parser.add_argument('--streaming', action='store_true',
+    help='partition ratings by user into spill files on disk and split and ' +
+    'cull one bucket at a time (same output as --engine numpy); memory is ' +
+    'bounded by the buckets and the network, which is still read whole')
+parser.add_argument('--tmpdir', default=None,
+    help='directory for --streaming spill files (default: system temp)')
+parser.add_argument('--bucket-rows', type=int, default=5000000,
+    help='approximate ratings per --streaming bucket')
+args = parser.parse_args()
+if args.streaming and args.engine != 'numpy':
+    parser.error('--streaming requires --engine numpy')
+
+raw_dir = args.raw_dir
+output_dir = args.output_dir
+
+sys.path.append(join(dirname(abspath(__file__)), '..', '..', 'scripts'))
+import idindex
+if args.engine == 'numpy':
+    import numpy as np
+    import dataio
+    import cull
+    import split
+    import stream
 
 
 ### split math
@@ -29,14 +59,24 @@ random.seed(11)
 
 ### read in everything
 
-ratings = open(join(raw_dir, "ratings.txt"), 'r')
 user_ratings = defaultdict(dict)
 ur = defaultdict(set)
+if args.streaming:
+    partition = stream.UserPartition(stream.read_chunks(join(raw_dir,
+        "ratings.txt"), 3, None, np.float64), 3, args.tmpdir, args.bucket_rows)
+    ratings = []
+elif args.engine == 'numpy':
+    rows = np.loadtxt(join(raw_dir, "ratings.txt"), dtype=np.float64,
+        ndmin=2).astype(np.int64)
+    ratings = []
+else:
+    ratings = open(join(raw_dir, "ratings.txt"), 'r')
 for line in ratings:
     user, item, rating = [int(float(x)) for x in line.strip().split()]
     user_ratings[user][item] = rating
     ur[user].add(item)
-ratings.close()
+if args.engine == 'python':
+    ratings.close()
 
 trustnetwork = open(join(raw_dir, "trust.txt"), 'r')
 network = set()
@@ -59,8 +99,32 @@ network_file = open(join(output_dir, "network.tsv"), 'w+')
 a = 0
 b = 0
 c = 0
+if args.engine == 'numpy':
+    blocks = partition.buckets() if args.streaming else [rows]
+    for block in blocks:
+        users, items, ratings = split.dedupe(*block.T)
+        splits = split.split_ratings(users, items, ratings, test, valid, 11,
+            skip_zero=False)
+        for f, part in zip((train_file, test_file, valid_file), splits):
+            dataio.write_tsv(f, *part)
+        a += len(splits[0][0])
+        b += len(splits[1][0])
+        c += len(splits[2][0])
+
+    user_ids, friend_ids = cull.edge_arrays(network)
+    if args.streaming:
+        user_ids, friend_ids, overlap = partition.cull_edges(user_ids,
+            friend_ids)
+        partition.close()
+    else:
+        uids, matrix = cull.rating_matrix(rows[:, 0], rows[:, 1])
+        user_ids, friend_ids, overlap = cull.cull_edges(uids, matrix,
+            user_ids, friend_ids)
+    dataio.write_tsv(network_file, user_ids, friend_ids)
+    network = []
+
 for user in user_ratings:
-    ratings = user_ratings[user].items()
+    ratings = list(user_ratings[user].items())
     random.shuffle(ratings)
     R = len(ratings)
     for i in range(R):
@@ -89,6 +153,7 @@ train_file.close()
 valid_file.close()
 test_file.close()
 network_file.close()
+idindex.build(output_dir)
 
 total = float(a + b + c)
 print (a/total, b/total, c/total)
@@ -1,164 +1,39 @@
-import sys
-from collections import defaultdict
-from random import randint, shuffle, sample
-
-dir = sys.argv[1]
-out = sys.argv[2]
-per = float(sys.argv[3]) / 100
-
-# read in network
-#print "* reading network data"
-
-network = defaultdict(set)
-for line in open(dir +'/network.tsv'):
-    if ',' in line:
-        a, b = [int(x) for x in line.strip().split(',')]
-    else:
-        a, b = [int(x) for x in line.strip().split('\t')]
-    network[a].add(b)
-    network[b].add(a)
-
-#print "* reading train, test, and validation data"
-
-user_items = defaultdict(set)
-train = defaultdict(set)
-test = defaultdict(set)
-valid = defaultdict(set)
-all_items = set()
-for line in open(dir +'/train.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
-    if len(network[u]) == 0:
-        continue
-    user_items[u].add(i)
-    train[u].add(i)
-    all_items.add(i)
-for line in open(dir +'/test.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
-    if len(network[u]) == 0:
-        continue
-    user_items[u].add(i)
-    test[u].add(i)
-    all_items.add(i)
-for line in open(dir +'/validation.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
-    if len(network[u]) == 0:
-        continue
-    user_items[u].add(i)
-    valid[u].add(i)
-    all_items.add(i)
-
-#print "  %d unique items in original data" % len(all_items)
+import argparse
+import amplification
+import profiling
+
+### command line args
+
+parser = argparse.ArgumentParser(description='swap items so that each ' +
+    'user shares about the given percent of their items with friends')
+parser.add_argument('dir')
+parser.add_argument('out')
+parser.add_argument('per', type=float, help='percent of items shared')
+parser.add_argument('passes', type=int, nargs='?', default=1)
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+dir = args.dir
+out = args.out
+per = args.per / 100
+passes = args.passes
+profile = profiling.from_args(args, 'adjust_amplification', out)
+
+#print "* reading network, train, test, and validation data"
+profile.stage('read data')
+network, user_items, splits = amplification.load(dir)
+profile.rows(sum(len(items) for items in user_items.values()))
 
 #print "* exchanging items for each user"
-changed_amp = 0
-changed_deamp = 0
-# start with those with the fewest number of items
-for user in sorted(user_items.keys(), key=lambda x: len(user_items[x])):
-    candidates = defaultdict(int)
-    omit = set()
-    shared = set()
-    for friend in network[user]:
-        for item in user_items[friend]:
-            if item not in user_items[user]:
-                candidates[item] += 1
-                omit.add(item)
-            else:
-                shared.add(item)
-
-    ### does this user have too many or too few items?
-    # too many!
-    #if len(shared) * 1.0 / len(user_items[user]) >= (per+0.05):
-    if len(shared) * 1.0 / len(user_items[user]) > per:
-        candidates = all_items - omit - shared
-        items = list(user_items[user] - set(candidates))
-        shuffle(items)
-
-        for item in items:
-            #if len(shared) * 1.0 / len(user_items[user]) < (per+0.05) or \
-            if len(shared) * 1.0 / len(user_items[user]) <= per or \
-                len(candidates) == 0:
-                break
-
-            pick = sample(candidates, 1)[0]
-            changed_deamp += 1
-
-            if item in train[user]:
-                train[user].remove(item)
-                train[user].add(pick)
-            if item in test[user]:
-                test[user].remove(item)
-                test[user].add(pick)
-            if item in valid[user]:
-                valid[user].remove(item)
-                valid[user].add(pick)
-
-            candidates.remove(pick)
-            user_items[user].remove(item)
-            user_items[user].add(pick)
-
-
-        # too few!
-    elif len(shared) * 1.0 / len(user_items[user]) < per:
-        #elif len(shared) * 1.0 / len(user_items[user]) <= (per-0.05):
-
-        items = list(user_items[user] - set(candidates))
-        shuffle(items)
-        for item in items:
-            #if len(shared) * 1.0 / len(user_items[user]) > (per-0.05) or \
-            if len(shared) * 1.0 / len(user_items[user]) >= per or \
-                len(candidates) == 0:
-                break
-
-            pickv = randint(1, sum(candidates.values()))
-            for c in candidates:
-                if pickv <= candidates[c]:
-                    pick = c
-                    break
-                pickv -= candidates[c]
-
-            shared.add(pick)
-            changed_amp += 1
-
-            if item in train[user]:
-                train[user].remove(item)
-                train[user].add(pick)
-            if item in test[user]:
-                test[user].remove(item)
-                test[user].add(pick)
-            if item in valid[user]:
-                valid[user].remove(item)
-                valid[user].add(pick)
-
-            del candidates[pick]
-            user_items[user].remove(item)
-            user_items[user].add(pick)
-
-
-    #print "user", user, "has", (len(shared) * 100.0 / len(user_items[user])), "%% items shared"
-all_items = set()
-for user in user_items.keys():
-    all_items = all_items | user_items[user]
-#print "  %d unique items in amplified data" % len(all_items)
-print (changed_amp + changed_deamp), "changed items (", changed_amp, \
-    changed_deamp, ")"
-
-f = open(out +'/train.tsv', 'w+')
-for user in train:
-    for item in train[user]:
-        f.write('%d\t%d\t1\n' % (user,item))
-f.close()
-#print "* done writing out training data"
-
-f = open(out +'/test.tsv', 'w+')
-for user in test:
-    for item in test[user]:
-        f.write('%d\t%d\t1\n' % (user,item))
-f.close()
-#print "* done writing out testing data"
-
-f = open(out +'/validation.tsv', 'w+')
-for user in valid:
-    for item in valid[user]:
-        f.write('%d\t%d\t1\n' % (user,item))
-f.close()
-#print "* done writing out validation data"
+profile.stage('adjust')
+changed_amp, changed_deamp, index = amplification.adjust(network, user_items,
+    splits, per, passes)
+profile.rows(changed_amp + changed_deamp)
+
+print((changed_amp + changed_deamp), "changed items (", changed_amp,
+    changed_deamp, ")")
+print((index.mean_share() * 100), "%  shared")
+
+profile.stage('write')
+amplification.write(out, splits)
+profile.finish()
@@ -1,28 +1,28 @@
-from os import listdir
-from os.path import join, isdir, isfile
-import sys
+import argparse
+import resultsindex
 
-fits = sys.argv[1]
-out = sys.argv[2]
+### command line args
 
-fout = open(out, 'w+')
+parser = argparse.ArgumentParser(description='aggregate the results of an ' +
+    'amplification study (fits-dir/[amp level]/[model]/summary_eval.dat) ' +
+    'into a single comma-separated file')
+parser.add_argument('fits')
+parser.add_argument('out')
+parser.add_argument('--index', default=None,
+    help='the results index, updated with the summaries that changed ' +
+    'since it was last used (default: fits/%s)' % resultsindex.INDEX_NAME)
+parser.add_argument('--threads', type=int, default=resultsindex.SCAN_THREADS,
+    help='directories scanned and summaries read at once')
+args = parser.parse_args()
 
-for dir in sorted(listdir(fits)):
-    dirp = join(fits,dir)
-    if not isdir(dirp):
-        continue
-    print dir
-    for model in sorted(listdir(dirp)):
-        modelp = join(dirp,model)
-        if not isdir(modelp):
-            continue
-        if isfile(join(modelp, 'summary_eval.dat')):
-            print "\t", model
-            f = open(join(modelp, 'summary_eval.dat'))
-            for line in f:
-                metric, val = line.strip().split('\t')
-                fout.write("%s,%s,%s,%s\n" % (dir, model, metric, val))
-            f.close()
-        else:
-            print "\t**", model
+index = resultsindex.ResultsIndex(args.fits, resultsindex.AMP,
+    filename=args.index, threads=args.threads)
+found, changed, gone = index.update()
+print("%d summaries (%d re-read, %d gone)" % (found, changed, gone))
+for amp, model in index.missing:
+    print("\t** %s/%s has no summary_eval.dat" % (amp, model))
+
+fout = open(args.out, 'w+')
+index.write_amp_csv(fout)
+index.close()
 fout.close()
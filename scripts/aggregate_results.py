@@ -1,31 +1,65 @@
-import fnmatch
-import os, sys
-from os.path import isdir, join
-
-m = sys.argv[1]
-outfile = sys.argv[2]
-k = int(sys.argv[3])
-fout = open(outfile, 'w+')
-fout.write("model,k,metric,value\n")
-
-for model in os.listdir(m):
-    if not isdir(join(m, model)):
-        continue
-    for file in os.listdir(join(m, model)):
-        if isdir(join(join(m, model), file)):
-            for f in os.listdir(join(join(m, model), file)):
-                if f == 'eval_summary_final.dat':
-                    fname = join(join(join(m, model), file), f)
-                    for line in open(fname).readlines()[1:]:
-                        tokens = line.split('\t')
-                        fout.write("%s,%d,%s,%s\n" % (file, \
-                            k if model==0 else int(model), \
-                            tokens[0], tokens[1]))
+import argparse
+import os
+import resources
+import resultsindex
 
+### command line args
+
+parser = argparse.ArgumentParser(description='aggregate the results of a ' +
+    'study into a single comma-separated file')
+parser.add_argument('study_dir')
+parser.add_argument('outfile')
+parser.add_argument('K', type=int)
+parser.add_argument('--resources', action='store_true',
+    help='add each model\'s resource use (from jobs.csv or the ' +
+    '*.resources.json records) as extra metric rows')
+parser.add_argument('--index', default=None,
+    help='the results index, updated with the summaries that changed ' +
+    'since it was last used (default: study-dir/%s)' %
+    resultsindex.INDEX_NAME)
+parser.add_argument('--threads', type=int, default=resultsindex.SCAN_THREADS,
+    help='directories scanned and summaries read at once')
+args = parser.parse_args()
+
+m = args.study_dir
+k = args.K
+
+# resource metrics joined onto a model's rows: name and record fields summed
+RESOURCE_METRICS = (('cpu_seconds', ('user', 'sys')), ('wall_seconds',
+    ('wall',)), ('maxrss_kb', ('maxrss_kb',)), ('peak_rss_kb',
+    ('peak_rss_kb',)), ('read_bytes', ('read_bytes',)), ('write_bytes',
+    ('write_bytes',)), ('rchar', ('rchar',)), ('wchar', ('wchar',)))
+
+def resource_rows(records, model):
+    # (metric, value) rows for the job named after the model and, prefixed
+    # with eval_, for its separate evaluation job if there is one
+    rows = []
+    for prefix, job in (('', model), ('eval_', model + '-eval')):
+        record = records.get(job)
+        if record is None:
             continue
-        if file == 'eval_summary_final.dat':
-            fname = join(join(m, model), file)
-            for line in open(fname).readlines()[1:]:
-                tokens = line.split('\t')
-                fout.write("%s,%d,%s,%s\n" % (model, k, tokens[0], tokens[1]))
+        for name, fields in RESOURCE_METRICS:
+            if all(record.get(field, '') != '' for field in fields):
+                rows.append((prefix + name, '%g' % sum(float(record[field])
+                    for field in fields)))
+    return rows
+
+fout = open(args.outfile, 'w+')
+index = resultsindex.ResultsIndex(m, resultsindex.STUDY, k=k,
+    filename=args.index, threads=args.threads)
+found, changed, gone = index.update()
+print("%d summaries (%d re-read, %d gone)" % (found, changed, gone))
+
+extra = None
+if args.resources:
+    # a summary's records are in the directory above its model directory
+    records = {}
+    def extra(path, model):
+        path = os.path.dirname(os.path.dirname(os.path.join(m, path)))
+        if path not in records:
+            records[path] = resources.read_records(path)
+        return resource_rows(records[path], model)
+
+index.write_study_csv(fout, extra)
+index.close()
 fout.close()
@@ -0,0 +1,217 @@
+import os
+import random
+from collections import defaultdict
+import dataio
+from sampler import WeightedSampler, ItemPicker
+
+
+### reading and writing a data directory
+
+def load(path):
+    # the network as {user: set(friends)} in both directions, and the
+    # ratings of users with at least one friend as {user: set(items)}, overall
+    # and for each of train, test and validation
+    network = defaultdict(set)
+    for a, b in dataio.rows(path + '/network.tsv', 2):
+        network[a].add(b)
+        network[b].add(a)
+
+    user_items = defaultdict(set)
+    splits = (defaultdict(set), defaultdict(set), defaultdict(set))
+    for name, split in zip(('train', 'test', 'validation'), splits):
+        for u, i, r in dataio.rows(path + '/' + name + '.tsv', 3):
+            if len(network[u]) == 0:
+                continue
+            user_items[u].add(i)
+            split[u].add(i)
+    return network, user_items, splits
+
+def copy(user_items):
+    return defaultdict(set, ((user, set(items)) for user, items in
+        user_items.items()))
+
+def write(path, splits):
+    for name, split in zip(('train', 'test', 'validation'), splits):
+        f = open(path + '/' + name + '.tsv', 'w+')
+        for user in split:
+            for item in split[user]:
+                f.write('%d\t%d\t1\n' % (user, item))
+        f.close()
+
+
+### per-user counts of the items their friends have
+
+class ShareIndex:
+    # For every user, how many of their friends have each item, kept up to
+    # date as users swap items.  A user's shared items are those of their own
+    # items with a nonzero count; the number of them is tracked too, so the
+    # fraction of a user's items shared with friends is O(1) to read at any
+    # point, for users already processed as much as for the current one.
+    # `user_items` ({user: set(items)}) is updated in place by swap().
+
+    def __init__(self, network, user_items):
+        self.network = network
+        self.user_items = user_items
+        self.counts = {}
+        self.shared = {}
+        for user in user_items:
+            counts = defaultdict(int)
+            for friend in network.get(user, ()):
+                for item in user_items.get(friend, ()):
+                    counts[item] += 1
+            self.counts[user] = counts
+            self.shared[user] = sum(1 for item in user_items[user]
+                if item in counts)
+
+    def share(self, user):
+        return self.shared[user] * 1.0 / len(self.user_items[user])
+
+    def mean_share(self):
+        # the share averaged over users, as amplification_check.py reports it
+        if not self.shared:
+            return 0.0
+        return sum(self.share(user) for user in self.shared) / len(self.shared)
+
+    def friend_items(self, user):
+        # {item: number of friends having it} for the items any friend has
+        return self.counts[user]
+
+    def candidates(self, user):
+        # friend_items minus the user's own items, in the same order
+        items = self.user_items[user]
+        return dict((item, count) for item, count in
+            self.counts[user].items() if item not in items)
+
+    def shared_items(self, user):
+        counts = self.counts[user]
+        return [item for item in self.user_items[user] if item in counts]
+
+    def unshared_items(self, user):
+        counts = self.counts[user]
+        return [item for item in self.user_items[user] if item not in counts]
+
+    def swap(self, user, old, new):
+        # replace `old` with `new` (not yet one of the user's items) and
+        # update the counts of everyone who has the user as a friend
+        items = self.user_items[user]
+        items.remove(old)
+        items.add(new)
+        counts = self.counts[user]
+        self.shared[user] += (new in counts) - (old in counts)
+
+        for friend in self.network.get(user, ()):
+            if friend not in self.counts:
+                continue
+            counts = self.counts[friend]
+            friend_items = self.user_items[friend]
+            counts[old] -= 1
+            if counts[old] == 0:
+                del counts[old]
+                if old in friend_items:
+                    self.shared[friend] -= 1
+            counts[new] += 1
+            if counts[new] == 1 and new in friend_items:
+                self.shared[friend] += 1
+
+
+### moving users towards a target share
+
+def adjust(network, user_items, splits, per, passes=1):
+    # swap items until each user shares about `per` of their items with
+    # friends: users above it trade shared items for ones no friend has,
+    # users below it trade unshared items for friends' items (weighted by how
+    # many friends have them); updates user_items and splits in place and
+    # returns the number of swaps each way and the share index
+    index = ShareIndex(network, user_items)
+    picker = ItemPicker(set().union(*user_items.values()))
+    changed_amp = 0
+    changed_deamp = 0
+    # start with those with the fewest number of items; later passes revisit
+    # users whose share drifted when friends processed after them swapped
+    users = sorted(user_items.keys(), key=lambda x: len(user_items[x]))
+    for rep in range(passes):
+        for user in users:
+            too_many = index.share(user) > per
+            if too_many:
+                # candidates are the items neither the user nor a friend has
+                candidates = picker
+                candidates.reset()
+                candidates.exclude(index.friend_items(user))
+                candidates.exclude(user_items[user])
+                items = index.shared_items(user)
+            elif index.share(user) < per:
+                candidates = WeightedSampler(index.candidates(user))
+                items = index.unshared_items(user)
+            else:
+                continue
+            random.shuffle(items)
+
+            for item in items:
+                share = index.share(user)
+                if (share <= per if too_many else share >= per) or \
+                    len(candidates) == 0:
+                    break
+
+                pick = candidates.pick()
+                if too_many:
+                    changed_deamp += 1
+                else:
+                    candidates.remove(pick)
+                    changed_amp += 1
+
+                for split in splits:
+                    if item in split[user]:
+                        split[user].remove(item)
+                        split[user].add(pick)
+                index.swap(user, item, pick)
+    return changed_amp, changed_deamp, index
+
+
+### all levels from one load
+
+# the loaded data, inherited by forked sweep workers
+_sweep_data = None
+
+def _sweep_level(task):
+    path, pct, passes, seed = task
+    network, user_items, splits = _sweep_data
+    user_items = copy(user_items)
+    splits = tuple(copy(split) for split in splits)
+    # forked workers would otherwise all continue the parent's random state
+    random.seed(None if seed is None else '%d-%g' % (seed, pct))
+    changed_amp, changed_deamp, index = adjust(network, user_items, splits,
+        pct / 100.0, passes)
+
+    out = os.path.join(path, 'amp', '%g' % pct)
+    if not os.path.exists(out):
+        os.makedirs(out)
+    write(out, splits)
+    for name in ('network.tsv', 'network.bin'):
+        source = os.path.abspath(os.path.join(path, name))
+        link = os.path.join(out, name)
+        if os.path.lexists(link):
+            os.remove(link)
+        if os.path.exists(source):
+            os.symlink(source, link)
+    return pct, changed_amp, changed_deamp, index.mean_share()
+
+def sweep(path, levels, passes=1, workers=1, seed=None):
+    # write path/amp/<pct> for every level, reading path only once; with
+    # several workers the levels run in forked processes that share the
+    # loaded sets copy-on-write and each copy only what they change
+    global _sweep_data
+    _sweep_data = load(path)
+    tasks = [(path, pct, passes, seed) for pct in levels]
+    if workers <= 1:
+        for task in tasks:
+            yield _sweep_level(task)
+        return
+    import multiprocessing
+    pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for result in pool.imap(_sweep_level, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
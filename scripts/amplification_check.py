@@ -1,64 +1,63 @@
-import sys
+import argparse
 from collections import defaultdict
-from random import randint, shuffle
+import dataio
+from amplification import ShareIndex
+import profiling
 
-dir = sys.argv[1]
+### command line args
+
+parser = argparse.ArgumentParser(description='print the percent of items ' +
+    'shared with friends, averaged across all users')
+parser.add_argument('dir')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+dir = args.dir
+profile = profiling.from_args(args, 'amplification_check')
 
 # read in network
-print "* reading network data"
+print("* reading network data")
+profile.stage('read network')
 
 network = defaultdict(set)
-for line in open(dir +'/network.tsv'):
-    if ',' in line:
-        a, b = [int(x) for x in line.strip().split(',')]
-    else:
-        a, b = [int(x) for x in line.strip().split('\t')]
+for a, b in dataio.rows(dir +'/network.tsv', 2):
     network[a].add(b)
     network[b].add(a)
+profile.rows(sum(len(friends) for friends in network.values()) // 2)
 
-print "* reading train, test, and validation data"
+print("* reading train, test, and validation data")
+profile.stage('read ratings')
 
 user_items = defaultdict(set)
 train = defaultdict(set)
 test = defaultdict(set)
 valid = defaultdict(set)
 all_items = set()
-for line in open(dir +'/train.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
+for u, i, r in dataio.rows(dir +'/train.tsv', 3):
     if len(network[u]) == 0:
         continue
     user_items[u].add(i)
     train[u].add(i)
     all_items.add(i)
-for line in open(dir +'/test.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
+for u, i, r in dataio.rows(dir +'/test.tsv', 3):
     if len(network[u]) == 0:
         continue
     user_items[u].add(i)
     test[u].add(i)
     all_items.add(i)
-for line in open(dir +'/validation.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
+for u, i, r in dataio.rows(dir +'/validation.tsv', 3):
     if len(network[u]) == 0:
         continue
     user_items[u].add(i)
     valid[u].add(i)
     all_items.add(i)
 
-print "  %d unique items in original data" % len(all_items)
-
-print "* finding shared"
+profile.rows(sum(len(items) for items in user_items.values()))
+print("  %d unique items in original data" % len(all_items))
 
-# start with those with the fewest number of items
-shared_sum = 0
-U = 0
-for user in sorted(user_items.keys(), key=lambda x: len(user_items[x])):
-    shared = set()
-    for friend in network[user]:
-        for item in user_items[friend]:
-            if item in user_items[user]:
-                shared.add(item)
+print("* finding shared")
+profile.stage('find shared')
 
-    shared_sum += len(shared)*100.0/ len(user_items[user])
-    U += 1
-print (shared_sum / U), "%  shared"
+index = ShareIndex(network, user_items)
+print((index.mean_share() * 100), "%  shared")
+profile.finish()
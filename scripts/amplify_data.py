@@ -1,46 +1,56 @@
-import sys
+import argparse
 from collections import defaultdict
-from random import randint, shuffle
-
-dir = sys.argv[1]
-out = sys.argv[2]
-per = float(sys.argv[3]) / 100
+import dataio
+from amplification import ShareIndex
+from sampler import WeightedSampler
+from random import shuffle
+import profiling
+
+### command line args
+
+parser = argparse.ArgumentParser(description='swap unshared items for ' +
+    'friends\' items until each user shares at least the given percent of ' +
+    'their items with friends')
+parser.add_argument('dir')
+parser.add_argument('out')
+parser.add_argument('per', type=float, help='percent of items shared')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+dir = args.dir
+out = args.out
+per = args.per / 100
+profile = profiling.from_args(args, 'amplify_data', out)
 
 # read in network
 #print "* reading network data"
-
+profile.stage('read network')
 network = defaultdict(set)
-for line in open(dir +'/network.tsv'):
-    if ',' in line:
-        a, b = [int(x) for x in line.strip().split(',')]
-    else:
-        a, b = [int(x) for x in line.strip().split('\t')]
+for a, b in dataio.rows(dir +'/network.tsv', 2):
     network[a].add(b)
     network[b].add(a)
+profile.rows(sum(len(friends) for friends in network.values()) // 2)
 
 #print "* reading train, test, and validation data"
-
+profile.stage('read ratings')
 user_items = defaultdict(set)
 train = defaultdict(set)
 test = defaultdict(set)
 valid = defaultdict(set)
 all_items = set()
-for line in open(dir +'/train.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
+for u, i, r in dataio.rows(dir +'/train.tsv', 3):
     if len(network[u]) == 0:
         continue
     user_items[u].add(i)
     train[u].add(i)
     all_items.add(i)
-for line in open(dir +'/test.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
+for u, i, r in dataio.rows(dir +'/test.tsv', 3):
     if len(network[u]) == 0:
         continue
     user_items[u].add(i)
     test[u].add(i)
     all_items.add(i)
-for line in open(dir +'/validation.tsv'):
-    u,i,r = [int(x) for x in line.strip().split('\t')]
+for u, i, r in dataio.rows(dir +'/validation.tsv', 3):
     if len(network[u]) == 0:
         continue
     user_items[u].add(i)
@@ -49,35 +59,24 @@ for line in open(dir +'/validation.tsv'):
 
 #print "  %d unique items in original data" % len(all_items)
 
+profile.rows(sum(len(items) for items in user_items.values()))
+
 #print "* exchanging items for each user"
+profile.stage('swap items')
 changed = 0
+index = ShareIndex(network, user_items)
 # start with those with the fewest number of items
 for user in sorted(user_items.keys(), key=lambda x: len(user_items[x])):
-    candidates = defaultdict(int)
-    shared = set()
-    for friend in network[user]:
-        for item in user_items[friend]:
-            if item not in user_items[user]:
-                candidates[item] += 1
-            else:
-                shared.add(item)
-
-    items = list(user_items[user] - set(candidates))
+    candidates = WeightedSampler(index.candidates(user))
+    items = index.unshared_items(user)
     shuffle(items)
-    #if len(shared) != 0:
-    #    #print "user", user, "has", (len(shared) * 100.0 / len(user_items[user])), "%% items shared"
+    #if index.shared[user] != 0:
+    #    #print "user", user, "has", (index.share(user) * 100.0), "%% items shared"
     for item in items:
-        if len(shared) * 1.0 / len(user_items[user]) >= per or len(candidates) == 0:
+        if index.share(user) >= per or len(candidates) == 0:
             break
 
-        pickv = randint(1, sum(candidates.values()))
-        for c in candidates:
-            if pickv <= candidates[c]:
-                pick = c
-                break
-            pickv -= candidates[c]
-
-        shared.add(pick)
+        pick = candidates.pick()
         changed += 1
 
         if item in train[user]:
@@ -90,18 +89,20 @@ for user in sorted(user_items.keys(), key=lambda x: len(user_items[x])):
             valid[user].remove(item)
             valid[user].add(pick)
 
-        del candidates[pick]
-        user_items[user].remove(item)
-        user_items[user].add(pick)
+        candidates.remove(pick)
+        index.swap(user, item, pick)
 
 
-    #print "user", user, "has", (len(shared) * 100.0 / len(user_items[user])), "%% items shared"
+    #print "user", user, "has", (index.share(user) * 100.0), "%% items shared"
 all_items = set()
 for user in user_items.keys():
     all_items = all_items | user_items[user]
 #print "  %d unique items in amplified data" % len(all_items)
-print changed, "changed items"
+profile.rows(changed)
+print(changed, "changed items")
+print((index.mean_share() * 100), "%  shared")
 
+profile.stage('write')
 f = open(out +'/train.tsv', 'w+')
 for user in train:
     for item in train[user]:
@@ -122,3 +123,4 @@ for user in valid:
         f.write('%d\t%d\t1\n' % (user,item))
 f.close()
 #print "* done writing out validation data"
+profile.finish()
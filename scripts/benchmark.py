@@ -0,0 +1,206 @@
+import argparse
+import csv
+import datetime
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import resources
+
+scripts = os.path.dirname(os.path.abspath(__file__))
+python = sys.executable
+
+# what each stage runs, given the raw lists, the split and an (empty)
+# output directory; stages reading the split (data) may add files to it,
+# which are removed again after the stage so each one starts from the same
+# data
+STAGES = (
+    ('process_data', lambda raw, data, out: ['process_data.py',
+        raw + '/ratings.tsv', raw + '/trust.tsv', out]),
+    ('process_data_numpy', lambda raw, data, out: ['process_data.py',
+        raw + '/ratings.tsv', raw + '/trust.tsv', out, '--engine', 'numpy']),
+    ('process_data_streaming', lambda raw, data, out: ['process_data.py',
+        raw + '/ratings.tsv', raw + '/trust.tsv', out, '--engine', 'numpy',
+        '--streaming', '--tmpdir', os.path.dirname(out)]),
+    ('process_time_data', lambda raw, data, out: ['process_time_data.py',
+        raw + '/times.tsv', raw + '/trust.tsv', out]),
+    ('amplification_check', lambda raw, data, out: ['amplification_check.py',
+        data]),
+    ('adjust_amplification', lambda raw, data, out: [
+        'adjust_amplification.py', data, out, '50']),
+    ('amplify_data', lambda raw, data, out: ['amplify_data.py', data, out,
+        '75']),
+    ('deamplify_data', lambda raw, data, out: ['deamplify_data.py', data,
+        out, '25']),
+    ('sweep_amplification', lambda raw, data, out: ['sweep_amplification.py',
+        data, '--levels', '0,50,100', '--seed', '11']),
+    ('to_list_form', lambda raw, data, out: ['to_list_form.py', data,
+        '--sorec', 'undirected']),
+    ('to_sorec_list_form', lambda raw, data, out: ['to_sorec_list_form.py',
+        data, 'undir']),
+    ('to_librec_form', lambda raw, data, out: ['to_librec_form.py', data,
+        'undir']),
+    ('to_bin_form', lambda raw, data, out: ['to_bin_form.py', data]),
+)
+STAGE_NAMES = [name for name, command in STAGES]
+
+RECORD_FIELDS = ('date', 'commit', 'host', 'stage', 'ratings', 'users',
+    'items', 'edges', 'returncode') + resources.FIELDS + \
+    ('ratings_per_second',)
+
+### command line args
+
+parser = argparse.ArgumentParser(description='time the data scripts on ' +
+    'synthetic datasets of growing size (see synth_data.py), appending ' +
+    'each stage\'s wall and CPU time, peak memory, I/O and throughput to ' +
+    'a results file for tracking regressions')
+parser.add_argument('work_dir', help='where the datasets and stage ' +
+    'outputs go')
+parser.add_argument('--scales', default='1e5,1e6',
+    help='comma-separated numbers of ratings, e.g. 1e5,1e6,1e7,1e8')
+parser.add_argument('--stages', default=','.join(STAGE_NAMES),
+    help='comma-separated stages to run, from: ' + ', '.join(STAGE_NAMES))
+parser.add_argument('--results', default=None,
+    help='the CSV results file, appended to (default: ' +
+    'work-dir/benchmark.csv)')
+parser.add_argument('--repeat', type=int, default=1,
+    help='runs of each stage at each scale')
+parser.add_argument('--reuse-data', action='store_true',
+    help='keep a scale\'s dataset from an earlier run instead of ' +
+    'generating it again')
+parser.add_argument('--keep', action='store_true',
+    help='keep the stage outputs (they are removed after each stage, ' +
+    'but for their stdout, stderr and profile.json)')
+parser.add_argument('--profile', action='store_true',
+    help='also have each stage write its per-step --profile report to ' +
+    'work-dir/[scale]/[stage]/profile.json')
+parser.add_argument('--seed', type=int, default=11)
+args = parser.parse_args()
+
+scales = [int(float(scale)) for scale in args.scales.split(',')]
+stages = args.stages.split(',')
+for stage in stages:
+    if stage not in STAGE_NAMES:
+        parser.error('unknown stage %s' % stage)
+work = os.path.abspath(args.work_dir)
+results = args.results or os.path.join(work, 'benchmark.csv')
+if not os.path.exists(work):
+    os.makedirs(work)
+
+def log(message):
+    print("%s  %s" % (time.strftime('%H:%M:%S'), message))
+    sys.stdout.flush()
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short',
+            'HEAD'], cwd=scripts, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+common = {'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    'commit': commit(), 'host': socket.gethostname()}
+
+def measure(name, command, out, sizes):
+    # run one stage, logging its stdout and stderr to out, and append its
+    # record to the results
+    stdout = open(os.path.join(out, 'stdout'), 'w')
+    stderr = open(os.path.join(out, 'stderr'), 'w')
+    returncode, usage = resources.run([python] + command, cwd=scripts,
+        stdout=stdout, stderr=stderr)
+    stdout.close()
+    stderr.close()
+
+    record = dict(common, stage=name, returncode=returncode, **sizes)
+    record.update(usage)
+    record['ratings_per_second'] = sizes['ratings'] / max(usage['wall'],
+        1e-9)
+    for field in resources.FIELDS + ('ratings_per_second',):
+        if isinstance(record[field], float):
+            record[field] = '%.3f' % record[field]
+    new = not os.path.exists(results)
+    f = open(results, 'a')
+    writer = csv.DictWriter(f, RECORD_FIELDS)
+    if new:
+        writer.writeheader()
+    writer.writerow(record)
+    f.close()
+
+    status = 'ok' if returncode == 0 else 'failed (%d)' % returncode
+    log("%s: %s in %.1fs, %.0f ratings/s, peak %d KB" % (name, status,
+        usage['wall'], float(record['ratings_per_second']),
+        usage['peak_rss_kb']))
+    return returncode
+
+def entries(path):
+    return set(os.listdir(path))
+
+def restore(path, before):
+    # remove what a stage added to path
+    for name in entries(path) - before:
+        target = os.path.join(path, name)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        else:
+            os.remove(target)
+
+
+### each scale: a dataset, then every stage on it
+
+for scale in scales:
+    base = os.path.join(work, str(scale))
+    data = os.path.join(base, 'data')
+    raw = os.path.join(data, 'raw')
+    sizes_file = os.path.join(data, 'sizes.tsv')
+
+    if not (args.reuse_data and os.path.exists(sizes_file)):
+        if os.path.exists(data):
+            shutil.rmtree(data)
+        os.makedirs(data)
+        log("generating %g ratings" % scale)
+        generate = os.path.join(base, 'synth')
+        if not os.path.exists(generate):
+            os.makedirs(generate)
+        if measure('synth_data', ['synth_data.py', data, str(scale), '--times',
+                '--seed', str(args.seed)], generate, {'ratings': scale,
+                'users': '', 'items': '', 'edges': ''}) != 0:
+            log("could not generate the data; see %s/stderr" % generate)
+            continue
+        # synth_data.py ends with the counts it wrote
+        counts = [line.split('\t') for line in
+            open(os.path.join(generate, 'stdout')) if '\t' in line]
+        f = open(sizes_file, 'w')
+        for key, value in counts:
+            f.write('%s\t%s' % (key, value))
+        f.close()
+
+    sizes = dict(line.strip().split('\t') for line in open(sizes_file))
+    sizes = dict((key, int(sizes[key])) for key in ('ratings', 'users',
+        'items', 'edges'))
+    before = entries(data)
+    for name, command in STAGES:
+        if name not in stages:
+            continue
+        for run in range(args.repeat):
+            out = os.path.join(base, name)
+            if os.path.exists(out):
+                shutil.rmtree(out)
+            os.makedirs(os.path.join(out, 'data'))
+            stage = command(raw, data, os.path.join(out, 'data'))
+            if args.profile:
+                stage += ['--profile', '--profile-out',
+                    os.path.join(out, 'profile.json')]
+            measure(name, stage, out, sizes)
+            restore(data, before)
+            if not args.keep:
+                for entry in entries(out) - set(['stdout', 'stderr',
+                        'profile.json']):
+                    target = os.path.join(out, entry)
+                    if os.path.isdir(target):
+                        shutil.rmtree(target)
+                    else:
+                        os.remove(target)
+
+log("results in %s" % results)
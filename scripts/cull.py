@@ -0,0 +1,68 @@
+import itertools
+import numpy as np
+import scipy.sparse as sp
+
+# edges scored per sparse product; bounds the size of the row-gathered blocks
+EDGE_CHUNK = 100000
+
+
+### building the user x item matrix
+
+def arrays_from_sets(user_items):
+    # flatten a {user: set(items)} map into parallel user/item arrays
+    lengths = [len(user_items[user]) for user in user_items]
+    users = np.repeat(np.fromiter(user_items.keys(), dtype=np.int64,
+        count=len(user_items)), lengths)
+    items = np.fromiter(itertools.chain.from_iterable(user_items.values()),
+        dtype=np.int64, count=sum(lengths))
+    return users, items
+
+def rating_matrix(users, items):
+    # binary CSR matrix with one row per distinct user (sorted by id) and an
+    # extra empty last row standing in for users with no ratings
+    uids, rows = np.unique(users, return_inverse=True)
+    iids, cols = np.unique(items, return_inverse=True)
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(uids) + 1, len(iids)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return uids, matrix
+
+def row_index(uids, users):
+    idx = np.searchsorted(uids, users)
+    idx[idx == len(uids)] = 0
+    missing = uids[idx] != users if len(uids) else np.ones(len(users), bool)
+    idx[missing] = len(uids)
+    return idx
+
+
+### culling
+
+def overlap(uids, matrix, a, b):
+    # number of items rated by both ends of each edge (a[j], b[j])
+    ra = row_index(uids, np.asarray(a, dtype=np.int64))
+    rb = row_index(uids, np.asarray(b, dtype=np.int64))
+    counts = np.zeros(len(ra), dtype=np.int64)
+    for start in range(0, len(ra), EDGE_CHUNK):
+        end = start + EDGE_CHUNK
+        shared = matrix[ra[start:end]].multiply(matrix[rb[start:end]])
+        counts[start:end] = np.asarray(shared.sum(axis=1)).ravel()
+    return counts
+
+def cull_edges(uids, matrix, a, b):
+    # keep only edges whose endpoints have at least one item in common;
+    # returns the kept edges and their overlap counts
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    counts = overlap(uids, matrix, a, b)
+    keep = counts != 0
+    return a[keep], b[keep], counts[keep]
+
+def cull_network(users, items, a, b):
+    uids, matrix = rating_matrix(users, items)
+    return cull_edges(uids, matrix, a, b)
+
+def edge_arrays(network):
+    # a set of (user, friend) pairs as two arrays, in iteration order
+    edges = np.array(list(network), dtype=np.int64).reshape(-1, 2)
+    return edges[:, 0], edges[:, 1]
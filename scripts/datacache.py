@@ -0,0 +1,251 @@
+import fcntl
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+# where the cache lives unless given: $SPF_CACHE_DIR, else ~/.cache/spf
+CACHE_DIR = os.environ.get('SPF_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'spf'))
+
+# the size the cache is trimmed to after each store, in GB
+CACHE_GB = 50
+
+HASH_BLOCK = 1 << 20
+
+# the ioctl that makes a file share another's blocks (Linux FICLONE), so a
+# copy costs neither time nor space on file systems that support it
+FICLONE = 0x40049409
+
+SCHEMA = '''
+create table if not exists digests (path text primary key, size integer,
+    mtime_ns integer, ino integer, sha1 text);
+create table if not exists entries (key text primary key, script text,
+    files text, bytes integer, created real, last_used real);
+'''
+
+
+### digests
+
+def code_version():
+    # sha1 of the scripts' sources: a change to any of them may change what
+    # they write, so it starts new cache entries
+    digest = hashlib.sha1()
+    scripts = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(glob.glob(os.path.join(scripts, '*.py'))):
+        digest.update(os.path.basename(filename).encode())
+        f = open(filename, 'rb')
+        digest.update(f.read())
+        f.close()
+    return digest.hexdigest()
+
+def _file_sha1(filename):
+    digest = hashlib.sha1()
+    f = open(filename, 'rb')
+    for block in iter(lambda: f.read(HASH_BLOCK), b''):
+        digest.update(block)
+    f.close()
+    return digest.hexdigest()
+
+def _copy(source, target):
+    # target as a copy of source (a clone where the file system can make
+    # one), with its mtime; an existing target is unlinked first, so a file
+    # linked elsewhere is replaced rather than written through
+    if os.path.lexists(target):
+        os.remove(target)
+    src = open(source, 'rb')
+    dst = open(target, 'wb')
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except (IOError, OSError):
+        shutil.copyfileobj(src, dst, HASH_BLOCK)
+    dst.close()
+    src.close()
+    shutil.copystat(source, target)
+
+
+### the cache
+
+class DataCache:
+    # Script outputs stored under a key: the sha1 of the script's name, its
+    # parameters, the contents of its input files and the code version.
+    # Entries live in root/objects/[key], and an SQLite index in root keeps
+    # their file lists and when each was last used.  Files go in and come
+    # out as copies (clones where the file system supports them), never as
+    # links, so no later write to an output directory can reach an entry or
+    # another directory restored from it.  Each file's size and mtime are
+    # kept too, and an entry whose files changed anyway is dropped at its
+    # next use; after each store the least recently used entries are
+    # evicted until the cache fits in max_bytes.  Input digests are kept by
+    # path, size, mtime and inode, so an unchanged file is hashed only once.
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_GB * 2**30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects = os.path.join(root, 'objects')
+        if not os.path.exists(self.objects):
+            os.makedirs(self.objects)
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'),
+            timeout=600)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def digest(self, filename):
+        # sha1 of a file's contents, hashed again only if it changed
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        row = self.db.execute('select size, mtime_ns, ino, sha1 from ' +
+            'digests where path = ?', (path,)).fetchone()
+        if row is not None and row[:3] == (stat.st_size, stat.st_mtime_ns,
+                stat.st_ino):
+            return row[3]
+        sha1 = _file_sha1(path)
+        with self.db:
+            self.db.execute('insert or replace into digests values ' +
+                '(?, ?, ?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns,
+                stat.st_ino, sha1))
+        return sha1
+
+    def key(self, script, params, inputs):
+        # inputs are (name, filename) pairs; a missing file counts as such
+        digest = hashlib.sha1()
+        digest.update(json.dumps([script, params, code_version()],
+            sort_keys=True).encode())
+        for name, filename in sorted(inputs):
+            digest.update(name.encode())
+            digest.update(self.digest(filename).encode()
+                if os.path.exists(filename) else b'-')
+        return digest.hexdigest()
+
+    def restore(self, key, out_dir):
+        # copy an entry's files into out_dir; False if there is no (intact)
+        # entry under key
+        row = self.db.execute('select files from entries where key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return False
+        files = json.loads(row[0])
+        entry = os.path.join(self.objects, key)
+        for name, (size, mtime_ns) in files.items():
+            try:
+                stat = os.stat(os.path.join(entry, name))
+            except OSError:
+                stat = None
+            if stat is None or (stat.st_size, stat.st_mtime_ns) != \
+                    (size, mtime_ns):
+                self.remove(key)
+                return False
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        for name in files:
+            _copy(os.path.join(entry, name), os.path.join(out_dir, name))
+        with self.db:
+            self.db.execute('update entries set last_used = ? where key = ?',
+                (time.time(), key))
+        return True
+
+    def store(self, key, script, out_dir, names):
+        # keep out_dir's files names under key, then evict down to size
+        tmp = tempfile.mkdtemp(prefix='store-', dir=self.root)
+        files = {}
+        for name in names:
+            _copy(os.path.join(out_dir, name), os.path.join(tmp, name))
+            stat = os.stat(os.path.join(tmp, name))
+            files[name] = (stat.st_size, stat.st_mtime_ns)
+        entry = os.path.join(self.objects, key)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # stored meanwhile by another run
+            shutil.rmtree(tmp)
+            return
+        now = time.time()
+        with self.db:
+            self.db.execute('insert or replace into entries values ' +
+                '(?, ?, ?, ?, ?, ?)', (key, script, json.dumps(files),
+                sum(size for size, mtime_ns in files.values()), now, now))
+        self.evict()
+
+    def remove(self, key):
+        shutil.rmtree(os.path.join(self.objects, key), ignore_errors=True)
+        with self.db:
+            self.db.execute('delete from entries where key = ?', (key,))
+
+    def evict(self):
+        # drop least recently used entries until the rest fit in max_bytes
+        rows = self.db.execute('select key, bytes from entries order by ' +
+            'last_used').fetchall()
+        total = sum(size for key, size in rows)
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= size
+
+
+### a cached run of a script
+
+class CachedRun:
+    # What a script does around its work: hit() restores the outputs of an
+    # earlier run with the same key (after removing any files matching
+    # remove, e.g. numbered chunks a bigger run may have left), and
+    # store(names) keeps the files the run wrote, named by the script, so
+    # nothing else in out_dir (another script's outputs, perhaps still
+    # being written) is ever stored with them.  Disabled (cache None),
+    # hit() is False and store() does nothing.
+
+    def __init__(self, cache, script, params, inputs, out_dir, remove=()):
+        self.cache = cache
+        self.script = script
+        self.out_dir = out_dir
+        self.remove = remove
+        if cache is not None:
+            self.key = cache.key(script, params, inputs)
+
+    def hit(self):
+        if self.cache is None:
+            return False
+        if os.path.isdir(self.out_dir):
+            for name in os.listdir(self.out_dir):
+                if any(fnmatch.fnmatch(name, p) for p in self.remove):
+                    os.remove(os.path.join(self.out_dir, name))
+        if not self.cache.restore(self.key, self.out_dir):
+            return False
+        print("restored %s output from cache (%s)" % (self.script,
+            self.key[:12]))
+        self.cache.close()
+        return True
+
+    def store(self, names):
+        # names: the files in out_dir the script wrote
+        if self.cache is None:
+            return
+        self.cache.store(self.key, self.script, self.out_dir,
+            sorted(set(os.path.basename(name) for name in names)))
+        self.cache.close()
+
+
+### command line
+
+def add_arguments(parser):
+    parser.add_argument('--cache', action='store_true',
+        help='reuse the output of an earlier run on the same inputs and ' +
+        'parameters from the data cache, or store this run\'s there')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+        help='the data cache (default: $SPF_CACHE_DIR or ~/.cache/spf)')
+    parser.add_argument('--cache-gb', type=float, default=CACHE_GB,
+        help='size the cache is trimmed to, least recently used first')
+
+def from_args(args, script, params, inputs, out_dir, remove=()):
+    # the CachedRun the --cache arguments ask for
+    cache = None
+    if args.cache:
+        cache = DataCache(args.cache_dir, int(args.cache_gb * 2**30))
+    return CachedRun(cache, script, params, inputs, out_dir, remove)
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# rows per formatted write; keeps the format string at a few MB
+WRITE_CHUNK = 100000
+
+
+### binary format
+# a 16 byte header (the magic 'SPF1', the column count as int32 and the row
+# count as int64) followed by each column as a contiguous little-endian int32
+# array; `src/data.cpp` reads the same layout
+
+BIN_MAGIC = b'SPF1'
+BIN_HEADER = np.dtype([('magic', 'S4'), ('ncols', '<i4'), ('nrows', '<i8')])
+BIN_DTYPE = np.dtype('<i4')
+
+def bin_name(filename):
+    # the binary twin of a tsv file: train.tsv -> train.bin
+    if filename.endswith('.tsv'):
+        return filename[:-4] + '.bin'
+    return filename + '.bin'
+
+def fresh_bin(filename):
+    # the binary twin of filename if there is one at least as new as the tsv
+    binary = bin_name(filename)
+    if not os.path.exists(binary):
+        return None
+    if os.path.exists(filename) and \
+        os.path.getmtime(binary) < os.path.getmtime(filename):
+        return None
+    return binary
+
+def _bin_header(ncols, nrows):
+    header = np.zeros(1, dtype=BIN_HEADER)
+    header['magic'] = BIN_MAGIC
+    header['ncols'] = ncols
+    header['nrows'] = nrows
+    return header
+
+def write_bin(filename, *columns):
+    # written to a temporary name and renamed, so a file linked elsewhere
+    # (see datacache.py) is replaced rather than rewritten
+    nrows = len(columns[0])
+    tmp = filename + '.tmp'
+    f = open(tmp, 'wb')
+    _bin_header(len(columns), nrows).tofile(f)
+    for column in columns:
+        column = np.asarray(column)
+        if len(column) and (column.min() < -2**31 or column.max() >= 2**31):
+            f.close()
+            os.remove(tmp)
+            raise ValueError('%s: values do not fit in int32' % filename)
+        column.astype(BIN_DTYPE).tofile(f)
+    f.close()
+    os.rename(tmp, filename)
+
+def read_bin(filename, mmap=True):
+    # one array per column; memory-mapped (read only) unless mmap is False
+    header = np.fromfile(filename, dtype=BIN_HEADER, count=1)
+    if len(header) != 1 or header['magic'][0] != BIN_MAGIC:
+        raise ValueError('%s is not an SPF binary data file' % filename)
+    ncols = int(header['ncols'][0])
+    nrows = int(header['nrows'][0])
+    if nrows == 0:
+        return [np.zeros(0, dtype=BIN_DTYPE) for c in range(ncols)]
+    if mmap:
+        data = np.memmap(filename, dtype=BIN_DTYPE, mode='r',
+            offset=BIN_HEADER.itemsize, shape=(ncols, nrows))
+    else:
+        data = np.fromfile(filename, dtype=BIN_DTYPE,
+            offset=BIN_HEADER.itemsize).reshape(ncols, nrows)
+    return [data[c] for c in range(ncols)]
+
+def tsv_to_bin(filename, ncols, splitchar=None):
+    # chunked, so memory stays bounded by the chunk size
+    import stream
+    if splitchar is None:
+        splitchar = sniff_splitchar(filename)
+    tmpdir = tempfile.mkdtemp(prefix='spf-bin-',
+        dir=os.path.dirname(os.path.abspath(filename)))
+    parts = [open(os.path.join(tmpdir, '%d' % c), 'wb') for c in range(ncols)]
+    nrows = 0
+    for rows in stream.read_chunks(filename, ncols, splitchar):
+        if len(rows) and (rows.min() < -2**31 or rows.max() >= 2**31):
+            for part in parts:
+                part.close()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise ValueError('%s: values do not fit in int32' % filename)
+        for c in range(ncols):
+            rows[:, c].astype(BIN_DTYPE).tofile(parts[c])
+        nrows += len(rows)
+    # written to a temporary name and renamed, as in write_bin
+    binary = bin_name(filename)
+    f = open(binary + '.tmp', 'wb')
+    _bin_header(ncols, nrows).tofile(f)
+    for part in parts:
+        part.close()
+        part = open(part.name, 'rb')
+        shutil.copyfileobj(part, f)
+        part.close()
+    f.close()
+    os.rename(binary + '.tmp', binary)
+    shutil.rmtree(tmpdir, ignore_errors=True)
+    return binary
+
+# the files of a data directory and their column counts
+DATA_FILES = (('train', 3), ('test', 3), ('validation', 3), ('network', 2))
+
+def dir_to_bin(path):
+    # write binary twins for every tsv data file in path; returns them
+    written = []
+    for name, ncols in DATA_FILES:
+        filename = os.path.join(path, name + '.tsv')
+        if os.path.exists(filename):
+            written.append(tsv_to_bin(filename, ncols))
+    return written
+
+def bin_to_tsv(binary, filename):
+    columns = read_bin(binary)
+    f = open(filename, 'w+')
+    for start in range(0, len(columns[0]), WRITE_CHUNK):
+        write_tsv(f, *[c[start:start + WRITE_CHUNK] for c in columns])
+    f.close()
+
+
+### reading
+
+def sniff_splitchar(filename):
+    # network files are sometimes comma separated
+    f = open(filename, 'r')
+    line = f.readline()
+    f.close()
+    return ',' if ',' in line else '\t'
+
+def read_columns(filename, ncols, splitchar='\t'):
+    # bulk-parse an integer tsv into one int64 array per column
+    data = np.loadtxt(filename, dtype=np.int64, delimiter=splitchar,
+        ndmin=2, usecols=range(ncols))
+    if data.size == 0:
+        return [np.zeros(0, dtype=np.int64) for c in range(ncols)]
+    return [data[:, c].copy() for c in range(ncols)]
+
+def read_ratings(filename, splitchar='\t'):
+    return read_columns(filename, 3, splitchar)
+
+def read_network(filename, splitchar='\t'):
+    return read_columns(filename, 2, splitchar)
+
+def load(filename, ncols):
+    # columns of a data file given by its tsv name, read from the binary twin
+    # when there is a fresh one
+    binary = fresh_bin(filename)
+    if binary is not None:
+        return read_bin(binary)[:ncols]
+    return read_columns(filename, ncols, sniff_splitchar(filename))
+
+def rows(filename, ncols):
+    # (user, item, ...) tuples of python ints, for the loop-based scripts
+    return zip(*[c.tolist() for c in load(filename, ncols)])
+
+
+### writing
+
+def write_tsv(f, *columns):
+    # one `%` call per chunk instead of one per row
+    if len(columns[0]) == 0:
+        return
+    rows = np.column_stack(columns).astype(np.int64)
+    line = '\t'.join(['%d'] * rows.shape[1]) + '\n'
+    for start in range(0, len(rows), WRITE_CHUNK):
+        block = rows[start:start + WRITE_CHUNK]
+        f.write((line * len(block)) % tuple(block.ravel().tolist()))
@@ -0,0 +1,52 @@
+import argparse
+import evaluation
+
+### command line args
+
+parser = argparse.ArgumentParser(description='evaluate a model on the ' +
+    'held-out data as the C++ eval() does, writing user_eval, item_eval ' +
+    'and eval_summary files in the same layouts')
+parser.add_argument('data_dir')
+parser.add_argument('out_dir', help='the fit to evaluate; results are ' +
+    'written here too')
+parser.add_argument('--model', choices=['spf', 'mf', 'librec', 'popularity'],
+    default='spf', help='spf: SPF\'s saved parameters; mf: CTR\'s ' +
+    'final-U/V.dat; librec: ratings.dat predictions; popularity: the pop ' +
+    'baseline')
+parser.add_argument('--label', default='final',
+    help='which saved SPF parameters to evaluate, and the output label')
+parser.add_argument('--binary', action='store_true',
+    help='binary ratings (always on for mf, librec and popularity, as ' +
+    'in their C++ evaluators)')
+parser.add_argument('--directed', action='store_true',
+    help='directed network, for the popularity stats columns')
+parser.add_argument('--seed', type=int, default=evaluation.EVAL_SEED,
+    help='seed for breaking ties between equal scores')
+parser.add_argument('--rankings', action='store_true',
+    help='also write rankings_[label].tsv (the top ranks of each user)')
+parser.add_argument('--ndcg-at', type=int, default=None,
+    help='also report NDCG truncated at this rank')
+parser.add_argument('--workers', type=int, default=1,
+    help='number of processes scoring blocks of test users')
+parser.add_argument('--batch', type=int, default=evaluation.EVAL_BATCH,
+    help='test users per block; memory is about batch x items floats')
+args = parser.parse_args()
+
+binary = args.binary or args.model != 'spf'
+stats = args.model == 'popularity'
+data = evaluation.EvalData(args.data_dir, binary, network=stats,
+    directed=args.directed)
+
+if args.model == 'spf':
+    scores = evaluation.spf_scores(args.out_dir, args.data_dir, args.label,
+        binary)
+elif args.model == 'mf':
+    scores = evaluation.mf_scores(args.out_dir, data)
+elif args.model == 'librec':
+    scores = evaluation.librec_scores(args.out_dir, data)
+else:
+    scores = evaluation.popularity_scores(data)
+
+print("evaluating model on held-out data")
+evaluation.evaluate(data, scores, args.out_dir, args.label, stats, args.seed,
+    args.rankings, args.ndcg_at, args.workers, args.batch)
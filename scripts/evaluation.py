@@ -0,0 +1,453 @@
+import itertools
+import os
+import numpy as np
+import scipy.sparse as sp
+import dataio
+import idindex
+import score
+
+# test users scored and ranked per block
+EVAL_BATCH = 1000
+
+# ranks per user written to the rankings file, as in eval()
+RANKINGS_DEPTH = 1000
+
+# the seed eval() is called with by mf, librec_eval and SPF's default
+EVAL_SEED = 11
+
+
+### the held-out data, numbered as src/data.cpp numbers it
+
+class EvalData:
+    # What src/data.cpp reads for an evaluation: training and validation
+    # ratings (the "seen" pairs that are never ranked), the test pairs that
+    # are left after dropping seen ones and ids not in training, and, with
+    # network, the neighbor counts and connectivity the stats columns need.
+    # The test pairs are kept sorted by (user, item) index, zero ratings
+    # included, since those still count towards num_test in eval().
+
+    def __init__(self, path, binary=False, network=False, directed=False):
+        self.users, self.items = idindex.load(path)
+        self.train = score.ratings_matrix(path, 'train', self.users,
+            self.items, binary)
+        seen = self.train.copy()
+        validation = path + '/validation.tsv'
+        if os.path.exists(validation) or dataio.fresh_bin(validation):
+            seen = seen + score.ratings_matrix(path, 'validation',
+                self.users, self.items, binary)
+        self.seen = seen.tocsr()
+        self.seen.sum_duplicates()
+
+        users, items, ratings = dataio.load(path + '/test.tsv', 3)
+        rows = self.users.lookup(users)
+        cols = self.items.lookup(items)
+        keep = (rows >= 0) & (cols >= 0)
+        rows, cols = rows[keep], cols[keep]
+        ratings = np.asarray(ratings, dtype=np.int64)[keep]
+        keep = ~self._seen(rows, cols)
+        rows, cols, ratings = rows[keep], cols[keep], ratings[keep]
+        if binary:
+            ratings = (ratings != 0).astype(np.int64)
+        # a pair listed twice keeps its last rating
+        keys = rows * max(len(self.items), 1) + cols
+        last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+        self.test_rows, self.test_cols = rows[last], cols[last]
+        self.test_ratings = ratings[last]
+        self.test_users = np.unique(self.test_rows)
+        self.test_items = np.unique(self.test_cols)
+        self.test_count = np.bincount(self.test_rows,
+            minlength=len(self.users))
+
+        self.num_train = np.diff(self.train.indptr)
+        self.popularity = np.bincount(self.train.indices,
+            minlength=len(self.items))
+        self.degree = self.connectivity = None
+        if network:
+            self._read_network(path, directed)
+
+    def _seen(self, rows, cols):
+        keys = rows * max(len(self.items), 1) + cols
+        coo = self.seen.tocoo()
+        seen = np.sort(coo.row.astype(np.int64) * max(len(self.items), 1) +
+            coo.col)
+        return np.isin(keys, seen)
+
+    def _read_network(self, path, directed):
+        # row u of the adjacency lists u's neighbors, both ways unless
+        # directed; connectivity(u) counts the ordered pairs of u's
+        # neighbors (i, j) where j is a neighbor of i
+        a, b = dataio.load(path + '/network.tsv', 2)
+        ra, rb = self.users.lookup(a), self.users.lookup(b)
+        keep = (ra >= 0) & (rb >= 0)
+        ra, rb = ra[keep], rb[keep]
+        if not directed:
+            ra, rb = np.concatenate((ra, rb)), np.concatenate((rb, ra))
+        n = len(self.users)
+        adjacency = sp.csr_matrix((np.ones(len(ra), dtype=np.int64),
+            (ra, rb)), shape=(n, n))
+        adjacency.data[:] = 1
+        self.degree = np.diff(adjacency.indptr)
+        self.connectivity = np.asarray((adjacency @ adjacency).multiply(
+            adjacency).sum(axis=1)).ravel().astype(np.int64)
+
+    def test_pairs(self, rows):
+        # (position, cols, ratings) of the test pairs of the given sorted
+        # user indexes, position being the index into rows
+        lo = np.searchsorted(self.test_rows, rows)
+        hi = np.searchsorted(self.test_rows, rows, side='right')
+        counts = hi - lo
+        position = np.repeat(np.arange(len(rows)), counts)
+        take = np.arange(counts.sum()) + np.repeat(lo - (np.cumsum(counts) -
+            counts), counts)
+        return position, self.test_cols[take], self.test_ratings[take]
+
+
+### ranking
+
+def tie_keys(rows, cols, seed):
+    # a pseudo-random 64 bit key per (user, item), from a splitmix64 hash:
+    # equal scores are ordered by it, so ties break at random as in eval()
+    # but the same way for every block, shard and worker
+    x = (np.asarray(rows, dtype=np.uint64) << np.uint64(32)) ^ \
+        np.asarray(cols, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def beaten(line, value, key, qline, qvalue, qkey):
+    # for each query (qline, qvalue, qkey), the number of candidates on the
+    # same line ranked ahead of it: a higher value, or an equal value and a
+    # smaller key; a candidate identical to the query is not counted
+    n = len(line)
+    lines = np.concatenate((line, qline))
+    values = np.concatenate((value, qvalue))
+    keys = np.concatenate((key, qkey))
+    query = np.zeros(len(lines), dtype=bool)
+    query[n:] = True
+    # among identical entries the query sorts first
+    order = np.lexsort((~query, keys, -values, lines))
+    candidate = ~query[order]
+    ahead = np.cumsum(candidate) - candidate
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    on_lower_lines = np.searchsorted(np.sort(line), qline)
+    return ahead[position[n:]] - on_lower_lines
+
+
+### metrics
+
+def metrics(line, rank, rating, pred, nlines, cutoff=None):
+    # eval()'s per-user (or per-item) metrics from the held-out pairs, each
+    # given by its line (user or item index), rank among the line's
+    # candidates, rating and prediction; lines with no held-out pairs get
+    # nan as eval()'s divisions by zero do, and first 0
+    order = np.lexsort((rank, line))
+    line, rank = line[order], rank[order]
+    rating = rating[order].astype(np.float64)
+    pred = pred[order].astype(np.float64)
+    heldout = np.bincount(line, minlength=nlines)
+    # position of each pair among its line's held-out pairs, from 1
+    starts = np.cumsum(heldout) - heldout
+    found = np.arange(1, len(line) + 1) - np.repeat(starts, heldout)
+    rank = rank.astype(np.float64)
+
+    def total(weights):
+        return np.bincount(line, weights, minlength=nlines)
+
+    result = {'heldout': heldout}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['rmse'] = np.sqrt(total((rating - pred) ** 2) / heldout)
+        result['mae'] = total(np.abs(rating - pred)) / heldout
+        result['rank'] = total(rank) / heldout
+        first = np.zeros(nlines, dtype=np.int64)
+        first[line[found == 1]] = rank[found == 1]
+        result['first'] = first
+        result['crr'] = total(1.0 / rank)
+        result['ncrr'] = result['crr'] / total(1.0 / found)
+        # the normalizer pairs each rating, in rank order, with the ideal
+        # position it was found at
+        result['ndcg'] = total(rating / np.log(rank + 1)) / \
+            total(rating / np.log(found + 1))
+        if cutoff is not None:
+            result['ndcg_at'] = total(rating / np.log(rank + 1) *
+                (rank <= cutoff)) / total(rating / np.log(found + 1) *
+                (found <= cutoff))
+    result['sums'] = {'sq': ((rating - pred) ** 2).sum(),
+        'abs': np.abs(rating - pred).sum(), 'rank': rank.sum(),
+        'rr': (1.0 / rank).sum(), 'count': len(line)}
+    return result
+
+
+### scoring blocks of test users
+
+# the evaluation inherited by forked workers: (data, scores, seed, queries)
+_eval_state = None
+
+def _candidates(rows):
+    # the block's unseen (user, test item) cells in row-major order: their
+    # rows in the block, positions among the test items, item indexes,
+    # scores and tie keys
+    data, scores, seed, queries = _eval_state
+    block = scores(rows)[:, data.test_items]
+    unseen = data.seen[rows][:, data.test_items].toarray() == 0
+    r, c = np.nonzero(unseen)
+    cols = data.test_items[c]
+    return r, c, cols, block[r, c].astype(np.float64), \
+        tie_keys(rows[r], cols, seed)
+
+def _user_block(task):
+    rows, rankings = task
+    data, scores, seed, queries = _eval_state
+    r, c, cols, values, keys = _candidates(rows)
+    position, qcols, qratings = data.test_pairs(rows)
+    # every test pair is a candidate (seen pairs were dropped from the
+    # test), found by its row-major cell number
+    ntest = len(data.test_items)
+    q = np.searchsorted(r * ntest + c, position * ntest +
+        np.searchsorted(data.test_items, qcols))
+    ranks = beaten(r, values, keys, position, values[q], keys[q]) + 1
+    heldout = qratings != 0
+    result = (rows[position[heldout]], qcols[heldout], ranks[heldout],
+        qratings[heldout], values[q][heldout])
+    if not rankings:
+        return result + (None,)
+
+    # eval() stops listing a user once all of their test pairs are found
+    stop = np.full(len(rows), np.iinfo(np.int64).max)
+    complete = np.bincount(position, minlength=len(rows)) == \
+        np.bincount(position[heldout], minlength=len(rows))
+    last = np.zeros(len(rows), dtype=np.int64)
+    np.maximum.at(last, position, ranks)
+    stop[complete] = last[complete]
+    order = np.lexsort((keys, -values, r))
+    counts = np.bincount(r, minlength=len(rows))
+    rank = np.empty(len(r), dtype=np.int64)
+    rank[order] = np.arange(len(r)) - np.repeat(np.cumsum(counts) - counts,
+        counts) + 1
+    shown = order[rank[order] <= np.minimum(stop[r[order]], RANKINGS_DEPTH)]
+    rating = np.zeros(len(r), dtype=np.int64)
+    rating[q] = qratings
+    listing = (rows[r[shown]], cols[shown], values[shown], rank[shown],
+        rating[shown])
+    return result + (listing,)
+
+def _item_block(rows):
+    # how many of the block's candidate users rank ahead of each held-out
+    # pair among the candidates for its item
+    data, scores, seed, queries = _eval_state
+    r, c, cols, values, keys = _candidates(rows)
+    qcols, qvalues, qkeys = queries
+    return beaten(cols, values, keys, qcols, qvalues, qkeys)
+
+def _run(function, tasks, workers):
+    if workers <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    import multiprocessing
+    pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for result in pool.imap(function, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+### evaluation
+
+def evaluate(data, scores, outdir, label='final', stats=False,
+             seed=EVAL_SEED, rankings=False, cutoff=None, workers=1,
+             batch=EVAL_BATCH):
+    # eval() from src/eval.cpp over blocks of test users: scores(rows) gives
+    # the dense len(rows) x items scores of the given user indexes; writes
+    # user_eval_[label].tsv, item_eval_[label].tsv, eval_summary_[label].dat
+    # and, with rankings, rankings_[label].tsv to outdir, in eval()'s
+    # layouts; cutoff adds NDCG@cutoff to the user file and the summary.
+    # With several workers the blocks are scored in forked processes.
+    global _eval_state
+    _eval_state = (data, scores, seed, None)
+    blocks = [data.test_users[start:start + batch]
+        for start in range(0, len(data.test_users), batch)]
+
+    if rankings:
+        f = open(os.path.join(outdir, 'rankings_%s.tsv' % label), 'w')
+        f.write("user.map\tuser.id\titem.map\titem.id\tpred\trank\trating\n")
+    parts = []
+    for result in _run(_user_block, [(rows, rankings) for rows in blocks],
+                       workers):
+        parts.append(result[:5])
+        if rankings:
+            users, items, preds, ranks, ratings = result[5]
+            _write_rows(f, "%d\t%d\t%d\t%d\t%f\t%d\t%d\n", users,
+                data.users.original(users), items, data.items.original(items),
+                preds, ranks, ratings)
+    if rankings:
+        f.close()
+    _eval_state = None
+    heldout = join_heldout(parts)
+    ranks = item_ranks(data, scores, heldout, blocks, seed, workers)
+    return write_results(data, heldout, ranks, outdir, label, stats, cutoff)
+
+def rank_users(data, scores, rows, seed=EVAL_SEED):
+    # (users, items, ranks, ratings, predictions) of the held-out pairs of
+    # the given sorted test users, ranked in one block
+    global _eval_state
+    _eval_state = (data, scores, seed, None)
+    try:
+        return _user_block((rows, False))[:5]
+    finally:
+        _eval_state = None
+
+def join_heldout(parts):
+    if not parts:
+        parts = [(np.zeros(0, dtype=np.int64),) * 5]
+    return tuple(np.concatenate(c) for c in zip(*parts))
+
+def item_ranks(data, scores, heldout, blocks, seed=EVAL_SEED, workers=1):
+    # the rank of each held-out pair among its item's candidate users,
+    # counting the candidates ahead of it in every block of test users
+    global _eval_state
+    users, items, ranks, ratings, preds = heldout
+    _eval_state = (data, scores, seed, (items, preds,
+        tie_keys(users, items, seed)))
+    try:
+        result = np.ones(len(items), dtype=np.int64)
+        for counts in _run(_item_block, blocks, workers):
+            result += counts
+    finally:
+        _eval_state = None
+    return result
+
+def write_results(data, heldout, item_ranks, outdir, label='final',
+                  stats=False, cutoff=None):
+    users, items, ranks, ratings, preds = heldout
+    per_user = metrics(users, ranks, ratings, preds, len(data.users), cutoff)
+    per_item = metrics(items, item_ranks, ratings, preds, len(data.items))
+    write_users(os.path.join(outdir, 'user_eval_%s.tsv' % label), data,
+        per_user, stats, cutoff)
+    write_items(os.path.join(outdir, 'item_eval_%s.tsv' % label), data,
+        per_item, stats)
+    write_summary(os.path.join(outdir, 'eval_summary_%s.dat' % label),
+        data, per_user, cutoff)
+    return per_user, per_item
+
+
+### output in eval()'s layouts
+
+def _write_rows(f, line, *columns):
+    columns = [np.asarray(c).tolist() for c in columns]
+    rows = list(zip(*columns))
+    for start in range(0, len(rows), dataio.WRITE_CHUNK):
+        chunk = rows[start:start + dataio.WRITE_CHUNK]
+        f.write((line * len(chunk)) % tuple(itertools.chain(*chunk)))
+
+METRIC_COLUMNS = ('rmse', 'mae', 'rank', 'first', 'crr', 'ncrr', 'ndcg')
+
+def write_users(filename, data, per_user, stats=False, cutoff=None):
+    users = data.test_users
+    values = [per_user[m][users] for m in METRIC_COLUMNS]
+    metrics_line = "%f\t%f\t%f\t%d\t%f\t%f\t%f"
+    extra = ''
+    if cutoff is not None:
+        values.append(per_user['ndcg_at'][users])
+        metrics_line += "\t%f"
+        extra = '\tndcg@%d' % cutoff
+    f = open(filename, 'w')
+    if stats:
+        f.write("user.map\tuser.id\tnum.heldout\tnum.train\tdegree\t" +
+            "connectivity\trmse\tmae\tave.rank\tfirst\tcrr\tncrr\tndcg%s\n" %
+            extra)
+        _write_rows(f, "%d\t%d\t%d\t%d\t%d\t%d\t" + metrics_line + "\n",
+            users, data.users.original(users), per_user['heldout'][users],
+            data.num_train[users], data.degree[users],
+            data.connectivity[users], *values)
+    else:
+        f.write("user.map\tuser.id\trmse\tmae\tave.rank\tfirst\tcrr\tncrr" +
+            "\tndcg%s\n" % extra)
+        _write_rows(f, "%d\t%d\t" + metrics_line + "\n", users,
+            data.users.original(users), *values)
+    f.close()
+
+def write_items(filename, data, per_item, stats=False):
+    # eval() writes the stats header even when the rows leave out the
+    # popularity and heldout columns; kept as is for existing readers
+    items = data.test_items
+    values = [per_item[m][items] for m in METRIC_COLUMNS]
+    f = open(filename, 'w')
+    f.write("item.map\titem.id\tpopularity\theldout\trmse\tmae\tave.rank\t" +
+        "first\tcrr\tncrr\tndcg\n")
+    if stats:
+        _write_rows(f, "%d\t%d\t%d\t%d\t%f\t%f\t%f\t%d\t%f\t%f\t%f\n", items,
+            data.items.original(items), data.popularity[items],
+            per_item['heldout'][items], *values)
+    else:
+        _write_rows(f, "%d\t%d\t%f\t%f\t%f\t%d\t%f\t%f\t%f\n", items,
+            data.items.original(items), *values)
+    f.close()
+
+def write_summary(filename, data, per_user, cutoff=None):
+    users = data.test_users
+    sums = per_user['sums']
+    n = sums['count']
+
+    def average(name):
+        return per_user[name][users].mean() if len(users) else float('nan')
+
+    def pair(total):
+        return total / n if n else float('nan')
+
+    f = open(filename, 'w')
+    f.write("metric\tuser average\theldout pair average\n")
+    f.write("RMSE\t%f\t%f\n" % (average('rmse'), np.sqrt(pair(sums['sq']))))
+    f.write("MAE\t%f\t%f\n" % (average('mae'), pair(sums['abs'])))
+    f.write("rank\t%f\t%f\n" % (average('rank'), pair(sums['rank'])))
+    f.write("first\t%f\t---\n" % average('first'))
+    f.write("CRR\t%f\t%f\n" % (average('crr'), pair(sums['rr'])))
+    f.write("NCRR\t%f\t---\n" % average('ncrr'))
+    f.write("NDCG\t%f\t---\n" % average('ndcg'))
+    if cutoff is not None:
+        f.write("NDCG@%d\t%f\t---\n" % (cutoff, average('ndcg_at')))
+    f.close()
+
+
+### scores of the models eval() is run on
+
+def spf_scores(fit_dir, path, label='final', binary=False):
+    import fit
+    return score.Scorer(fit.Fit(fit_dir, label), path, binary).scores
+
+def mf_scores(outdir, data):
+    # CTR's final-U.dat and final-V.dat: one row of K factors per user and
+    # item index, as src/mf.cpp reads them
+    theta = np.loadtxt(os.path.join(outdir, 'final-U.dat'), ndmin=2)
+    beta = np.loadtxt(os.path.join(outdir, 'final-V.dat'), ndmin=2)
+    theta, beta = theta[:len(data.users)], beta[:len(data.items)]
+
+    def scores(rows):
+        block = np.zeros((len(rows), len(data.items)))
+        block[:, :len(beta)] = theta[rows] @ beta.T
+        return block
+    return scores
+
+def popularity_scores(data):
+    # src/popularity.cpp's integer popularity * 5 / item count
+    values = (data.popularity * 5 // max(len(data.items), 1)).astype(
+        np.float64)
+    return lambda rows: np.tile(values, (len(rows), 1))
+
+def librec_scores(outdir, data):
+    # predictions from outdir/ratings.dat (the concatenated LibRec prediction
+    # files without their headers); pairs LibRec did not predict score 0, as
+    # in librec_eval
+    import scorestore
+    users, items, preds = scorestore.read_predictions(os.path.join(outdir,
+        'ratings.dat'), data.users, data.items, header=False)
+    keys = users * max(len(data.items), 1) + items
+    last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+    matrix = sp.csr_matrix((preds[last], (users[last], items[last])),
+        shape=(len(data.users), len(data.items)))
+    return lambda rows: matrix[rows].toarray()
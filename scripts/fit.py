@@ -0,0 +1,198 @@
+import itertools
+import os
+import re
+import numpy as np
+import scipy.sparse as sp
+
+# lines parsed per chunk of a parameter file
+PARAM_CHUNK = 200000
+
+# one record of a delta file; matched rather than split on lines because
+# older fits wrote the records without newlines in between (%e always prints
+# a two digit exponent for floats, so the next index cannot be mistaken for
+# part of the value)
+_DELTA_RECORD = re.compile(r'(\d+)\t(-?\d+)\t([-+]?\d\.\d+e[-+]\d\d)')
+
+# SPF's defaults (src/main.cpp), for a fit directory without settings.txt
+DEFAULT_SETTINGS = {'a_theta': 0.3, 'b_theta': 0.3, 'a_beta': 0.3,
+    'b_beta': 0.3, 'a_tau': 2.0, 'b_tau': 5.0, 'a_delta': 0.3,
+    'b_delta': 0.3, 'fix_influence': False, 'binary': False,
+    'directed': False, 'model': None}
+
+# the model specification line of settings.txt for each model
+_MODELS = (('social factorization (SF)', 'sf'),
+    ('social Poisson factorization (SPF)', 'spf'),
+    ('Poisson factorization (PF)', 'pf'))
+
+# a "\ttheta (0.300000, 0.300000)" line of settings.txt
+_PRIOR = re.compile(r'^\t(theta|beta|tau|delta)\s*\(([^,]+), ([^)]+)\)')
+
+
+### caching parsed files as .npy sidecars
+
+def _sidecar(filename, part):
+    # theta-final.dat -> theta-final.<part>.npy
+    base = filename[:-4] if filename.endswith('.dat') else filename
+    return '%s.%s.npy' % (base, part)
+
+def _cached(filename, parts, parse, mmap=True):
+    # the arrays named by parts, from fresh .npy sidecars when there are
+    # any, otherwise parsed from the text file and then cached
+    sidecars = [_sidecar(filename, part) for part in parts]
+    mtime = os.path.getmtime(filename)
+    if all(os.path.exists(s) and os.path.getmtime(s) >= mtime
+           for s in sidecars):
+        return [np.load(s, mmap_mode='r' if mmap else None) for s in sidecars]
+    arrays = parse(filename)
+    for s, array in zip(sidecars, arrays):
+        np.save(s, array)
+    return arrays
+
+
+### parsing
+
+def _parse_rows(filename):
+    # (index, original id) int64 columns and the remaining float32 columns
+    # of a tab separated file, a chunk of lines at a time
+    f = open(filename, 'r')
+    ids = []
+    values = []
+    while True:
+        lines = list(itertools.islice(f, PARAM_CHUNK))
+        if not lines:
+            break
+        rows = np.loadtxt(lines, dtype=np.float64, delimiter='\t', ndmin=2)
+        ids.append(rows[:, :2].astype(np.int64))
+        values.append(rows[:, 2:].astype(np.float32))
+    f.close()
+    if not ids:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros((0, 0), np.float32)
+    return np.concatenate(ids), np.concatenate(values)
+
+def _parse_factors(filename):
+    ids, values = _parse_rows(filename)
+    _check_order(filename, ids[:, 0])
+    return ids[:, 1], values
+
+def _parse_delta(filename):
+    f = open(filename, 'r')
+    records = _DELTA_RECORD.findall(f.read())
+    f.close()
+    ids = np.array([(int(a), int(b)) for a, b, v in records],
+        dtype=np.int64).reshape(-1, 2)
+    values = np.array([float(v) for a, b, v in records], dtype=np.float32)
+    _check_order(filename, ids[:, 0])
+    return ids[:, 1], values
+
+def _parse_tau(filename):
+    # uid, orig.uid, vid, orig.vid, tau after a header line
+    f = open(filename, 'r')
+    f.readline()
+    chunks = []
+    while True:
+        lines = list(itertools.islice(f, PARAM_CHUNK))
+        if not lines:
+            break
+        chunks.append(np.loadtxt(lines, dtype=np.float64, delimiter='\t',
+            ndmin=2))
+    f.close()
+    rows = np.concatenate(chunks) if chunks else np.zeros((0, 5))
+    uid = rows[:, 0].astype(np.int64)
+    vid = rows[:, 2].astype(np.int64)
+    n = int(max(uid.max(), vid.max())) + 1 if len(rows) else 0
+    ids = np.full(n, -1, dtype=np.int64)
+    ids[uid] = rows[:, 1].astype(np.int64)
+    ids[vid] = rows[:, 3].astype(np.int64)
+    # a repeated edge is the same tau written twice, not two to add up
+    first = np.unique(uid * max(n, 1) + vid, return_index=True)[1]
+    uid, vid, rows = uid[first], vid[first], rows[first]
+    matrix = sp.csr_matrix((rows[:, 4].astype(np.float32), (uid, vid)),
+        shape=(n, n))
+    return ids, matrix.indptr.astype(np.int64), \
+        matrix.indices.astype(np.int64), matrix.data
+
+def _check_order(filename, index):
+    if not np.array_equal(index, np.arange(len(index))):
+        raise ValueError('%s: rows are not in index order' % filename)
+
+
+### loading
+
+def load_settings(outdir):
+    # the hyperparameters and data options SPF wrote to outdir/settings.txt;
+    # model is 'spf', 'pf' or 'sf', None without the file
+    settings = dict(DEFAULT_SETTINGS)
+    filename = os.path.join(outdir, 'settings.txt')
+    if not os.path.exists(filename):
+        return settings
+    for line in open(filename):
+        match = _PRIOR.match(line)
+        if match:
+            settings['a_' + match.group(1)] = float(match.group(2))
+            settings['b_' + match.group(1)] = float(match.group(3))
+        elif 'social influence parameters fixed' in line:
+            settings['fix_influence'] = True
+        elif line.strip() == 'binary ratings':
+            settings['binary'] = True
+        elif line.strip() == 'directed network':
+            settings['directed'] = True
+        elif settings['model'] is None:
+            for spec, model in _MODELS:
+                if line.strip().startswith(spec):
+                    settings['model'] = model
+                    break
+    return settings
+
+def load_factors(filename, mmap=True):
+    # (original ids, n x K float32 matrix) from a theta or beta file
+    return tuple(_cached(filename, ('ids', 'values'), _parse_factors, mmap))
+
+def load_delta(filename, mmap=True):
+    # (original item ids, per-item bias) from a delta file
+    return tuple(_cached(filename, ('ids', 'values'), _parse_delta, mmap))
+
+def load_tau(filename, mmap=True, nusers=None):
+    # (original user ids, U x U CSR matrix) from a tau file, where row u
+    # holds tau for each of u's neighbors v (column v); users that appear in
+    # no edge have id -1, and nusers pads the matrix for users past the last
+    # one that does
+    ids, indptr, indices, data = _cached(filename,
+        ('ids', 'indptr', 'indices', 'data'), _parse_tau, mmap)
+    n = len(ids) if nusers is None else max(nusers, len(ids))
+    if n > len(ids):
+        indptr = np.concatenate((indptr, np.full(n - len(ids), indptr[-1])))
+        ids = np.concatenate((ids, np.full(n - len(ids), -1)))
+    matrix = sp.csr_matrix((data, indices, indptr), shape=(n, n), copy=False)
+    return ids, matrix
+
+class Fit:
+    # the parameters SPF saved in outdir under a label ('final' or an
+    # iteration like '0010'); each is None when that file was not written
+    # (theta/beta with social_only, tau with factor_only or fix_influence,
+    # delta without item_bias); settings are the fit's hyperparameters and
+    # options (see load_settings)
+
+    def __init__(self, outdir, label='final', mmap=True):
+        self.outdir = outdir
+        self.label = label
+        self.user_ids = self.item_ids = None
+        self.theta = self.beta = self.delta = self.tau = None
+        self.settings = load_settings(outdir)
+
+        theta = self._file('theta')
+        if theta is not None:
+            self.user_ids, self.theta = load_factors(theta, mmap)
+            self.item_ids, self.beta = load_factors(self._file('beta'), mmap)
+        delta = self._file('delta')
+        if delta is not None:
+            self.item_ids, self.delta = load_delta(delta, mmap)
+        tau = self._file('tau')
+        if tau is not None:
+            nusers = None if self.user_ids is None else len(self.user_ids)
+            tau_ids, self.tau = load_tau(tau, mmap, nusers)
+            if self.user_ids is None:
+                self.user_ids = tau_ids
+
+    def _file(self, name):
+        filename = os.path.join(self.outdir, '%s-%s.dat' % (name, self.label))
+        return filename if os.path.exists(filename) else None
@@ -0,0 +1,117 @@
+import argparse
+import os
+import time
+import numpy as np
+import dataio
+import fit
+import folding
+import score
+
+### command line args
+
+parser = argparse.ArgumentParser(description='fold new users into a saved ' +
+    'SPF fit: infer their preferences (theta) and their friends\' ' +
+    'influence on them (tau) from their ratings and friends, holding the ' +
+    'fit fixed, and write them with each user\'s top-N items')
+parser.add_argument('data_dir', help='the split the model was fit on')
+parser.add_argument('fit_dir', help='the directory SPF saved its fit in')
+parser.add_argument('ratings_file',
+    help='the new users\' ratings (user, item, rating tsv); items the fit ' +
+    'does not know are skipped')
+parser.add_argument('network_file', nargs='?', default=None,
+    help='their friendships (user, friend tsv); only friends in the ' +
+    'training data count')
+parser.add_argument('--label', default='final',
+    help='which saved parameters to use: final or an iteration like 0010')
+parser.add_argument('--directed', action='store_true',
+    help='a user\'s friends are only the second column of their lines ' +
+    '(default: as the fit\'s settings.txt says, else undirected)')
+parser.add_argument('--binary', action='store_true',
+    help='the model was fit with --binary (default: as settings.txt says)')
+parser.add_argument('-n', type=int, default=10,
+    help='recommendations per user; 0 for none')
+parser.add_argument('--batch', type=int,
+    default=folding.FOLD_BATCH, help='users folded in at a time')
+parser.add_argument('--tolerance', type=float,
+    default=folding.FOLD_TOLERANCE, help='a user is done when theta ' +
+    'and tau change by less than this')
+parser.add_argument('--iters', type=int,
+    default=folding.FOLD_ITERS, help='passes over a batch at most')
+parser.add_argument('--out-dir', default=None,
+    help='where foldin_theta_[label].dat, foldin_tau_[label].dat and ' +
+    'foldin_recommendations_[label].tsv go (default: fit_dir)')
+args = parser.parse_args()
+
+model = fit.Fit(args.fit_dir, args.label)
+binary = args.binary or model.settings['binary']
+directed = args.directed or model.settings['directed']
+scorer = score.Scorer(model, args.data_dir, binary)
+folder = folding.FoldIn(scorer, args.tolerance, args.iters)
+
+### the new users
+
+users, items, ratings = dataio.load(args.ratings_file, 3)
+keep = np.asarray(ratings) != 0
+friend_a = friend_b = np.zeros(0, dtype=np.int64)
+if args.network_file is not None:
+    friend_a, friend_b = dataio.load(args.network_file, 2)
+ids, ratings, network = folding.new_users(scorer.users,
+    scorer.items, np.asarray(users)[keep], np.asarray(items)[keep], friend_a,
+    friend_b, directed)
+print("%d new users: %d ratings of known items (%d skipped), %d friends " %
+    (len(ids), ratings.nnz, keep.sum() - ratings.nnz, network.nnz) +
+    "in the training data")
+
+### fold in and write
+
+out_dir = args.out_dir or args.fit_dir
+if not os.path.exists(out_dir):
+    os.makedirs(out_dir)
+def out(name, extension='dat'):
+    return open(os.path.join(out_dir, 'foldin_%s_%s.%s' % (name, args.label,
+        extension)), 'w+')
+
+theta_file = out('theta') if model.theta is not None else None
+tau_file = out('tau') if model.tau is not None else None
+if tau_file is not None:
+    tau_file.write("uid\torig.uid\tvid\torig.vid\ttau\n")
+recs_file = out('recommendations', 'tsv') if args.n > 0 else None
+if recs_file is not None:
+    recs_file.write("user.id\titem.id\tscore\trank\n")
+
+# new users' uids follow the fit's own, so the two files can be joined on uid
+first_uid = len(scorer.users)
+for start in range(0, len(ids), args.batch):
+    rows = np.arange(start, min(start + args.batch, len(ids)))
+    begin = time.time()
+    theta, tau, passes = folder.infer(ratings[rows], network[rows])
+    print("users %d-%d folded in: %.2fs, %.1f passes on average" % (
+        rows[0], rows[-1], time.time() - begin, passes.mean()))
+
+    if theta_file is not None:
+        columns = [first_uid + rows, ids[rows]] + [theta[:, k] for k in
+            range(theta.shape[1])]
+        theta_file.write(("%d\t%d" + "\t%e" * theta.shape[1] + "\n") *
+            len(rows) % tuple(np.column_stack(columns).astype(object)
+            .ravel().tolist()))
+    if tau_file is not None and tau.nnz:
+        uid = rows[np.repeat(np.arange(len(rows)), np.diff(tau.indptr))]
+        tau_file.write("%d\t%d\t%d\t%d\t%e\n" * tau.nnz % tuple(
+            np.column_stack((first_uid + uid, ids[uid], tau.indices,
+            scorer.users.original(tau.indices), tau.data)).astype(object)
+            .ravel().tolist()))
+    if recs_file is not None:
+        best, scores = folder.top(theta, tau, ratings[rows], args.n)
+        keep = best >= 0
+        ranks = np.tile(np.arange(1, best.shape[1] + 1), (len(rows), 1))
+        user_ids = np.repeat(ids[rows], best.shape[1]).reshape(best.shape)
+        user_ids = user_ids[keep]
+        item_ids = scorer.items.original(best[keep])
+        if len(user_ids):
+            recs_file.write(("%d\t%d\t%f\t%d\n" * len(user_ids)) % tuple(
+                np.column_stack((user_ids, item_ids, scores[keep],
+                ranks[keep])).astype(object).ravel().tolist()))
+
+for f in (theta_file, tau_file, recs_file):
+    if f is not None:
+        f.close()
@@ -0,0 +1,210 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.special import digamma
+import score
+
+# SPF::learn stops a user's local updates at a 1% change or after 10 passes,
+# but it comes back to the user every iteration; a fold-in starts from
+# scratch, so it goes on to a finer change and more passes
+FOLD_TOLERANCE = 0.001
+FOLD_ITERS = 100
+
+# new users folded in at a time; a batch holds a pairs x K array of
+# responsibilities
+FOLD_BATCH = 1000
+
+# the "log" tau SPF::initialize_parameters starts every edge at (and keeps
+# with fix_influence): it is really exp(E[log tau])
+INITIAL_LOGTAU = np.log(1.0 + 1e-5)
+
+
+### the new users' data as sparse matrices
+
+def new_users(user_index, item_index, users, items, friend_a, friend_b,
+              directed=False):
+    # (original ids, B x items ratings, B x users network) of the distinct
+    # users in users: their rated items that the fit knows, and their
+    # friends that are users of the fit (friend_b of friend_a, either way
+    # round unless directed)
+    ids, rows = np.unique(users, return_inverse=True)
+    cols = item_index.lookup(items)
+    known = cols >= 0
+    ratings = _pattern(rows[known], cols[known], (len(ids), len(item_index)))
+
+    a, b = np.asarray(friend_a, np.int64), np.asarray(friend_b, np.int64)
+    if not directed:
+        a, b = np.concatenate((a, b)), np.concatenate((b, a))
+    pos = np.searchsorted(ids, a)
+    pos[pos == len(ids)] = 0
+    keep = np.zeros(len(a), dtype=bool) if len(ids) == 0 else ids[pos] == a
+    friend = user_index.lookup(b)
+    keep &= (friend >= 0) & (a != b)
+    network = _pattern(pos[keep], friend[keep], (len(ids), len(user_index)))
+    return ids, ratings, network
+
+def _pattern(rows, cols, shape):
+    # CSR matrix of ones at the distinct (row, col) pairs
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.float32),
+        (rows, cols)), shape=shape)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+### fold-in
+
+class FoldIn:
+    # Theta and the influence on each of their edges (tau) of users the fit
+    # has not seen, from their ratings and friends alone, with beta, delta
+    # and every existing user held fixed: the per-user coordinate ascent of
+    # SPF::learn (update_shape, update_tau, update_theta), run for a whole
+    # batch of users at once.  Each rated pair is a row of a users x pairs
+    # matrix and each edge a row of an edges x pairs matrix holding the
+    # friend's rating of the pair's item, so a pass is a few sparse
+    # products.  Every pair counts once, as SPF::learn counts it, and the
+    # saved fit keeps only beta's mean, so E[log beta] is taken as log beta.
+    # Users stop at a relative change below tolerance (the mean of theta's
+    # and tau's, as in SPF::learn) or after iters passes.
+
+    def __init__(self, scorer, tolerance=FOLD_TOLERANCE, iters=FOLD_ITERS):
+        self.scorer = scorer
+        self.fit = scorer.fit
+        self.settings = self.fit.settings
+        self.tolerance = tolerance
+        self.iters = iters
+        fit = self.fit
+        self.social = scorer.tau is not None
+        self.learn_tau = fit.tau is not None
+        if fit.theta is not None:
+            beta = np.asarray(fit.beta, dtype=np.float64)
+            self.logbeta = np.log(np.maximum(beta, np.finfo(np.float32).tiny))
+            self.b_theta = self.settings['b_theta'] + beta.sum(axis=0)
+        if fit.delta is not None:
+            self.delta = np.asarray(fit.delta, dtype=np.float64)
+        # the rate of tau on an edge: the friend's ratings, summed
+        self.friend_totals = np.asarray(scorer.ratings.sum(axis=1)).ravel()
+
+    def infer(self, ratings, network):
+        # (theta, tau, passes) of the rows of ratings (B x items) and network
+        # (B x users): theta a B x K array (None for a social-only fit), tau
+        # a B x users CSR matrix with each friend's influence (None for a
+        # factor-only fit) and the passes each user took
+        fit = self.fit
+        settings = self.settings
+        ratings = sp.csr_matrix(ratings)
+        network = sp.csr_matrix(network) if self.social else \
+            sp.csr_matrix(ratings.shape[:1] + (len(self.scorer.users),))
+        nusers = ratings.shape[0]
+        pair_user = np.repeat(np.arange(nusers), np.diff(ratings.indptr))
+        pair_item = ratings.indices.astype(np.int64)
+        npairs = len(pair_item)
+        # users x pairs, to sum each user's pairs
+        by_user = sp.csr_matrix((np.ones(npairs), (pair_user,
+            np.arange(npairs))), shape=(nusers, npairs))
+
+        edge_user = np.repeat(np.arange(nusers), np.diff(network.indptr))
+        edge_friend = network.indices.astype(np.int64)
+        nedges = len(edge_friend)
+        friend_pairs = self._friend_pairs(ratings, edge_user, edge_friend)
+        pairs_friend = friend_pairs.T.tocsr()
+        b_tau = settings['b_tau'] + self.friend_totals[edge_friend]
+        tau = np.ones(nedges)
+        logtau = np.full(nedges, INITIAL_LOGTAU)
+
+        theta = None
+        if fit.theta is not None:
+            k = fit.theta.shape[1]
+            # the mean of SPF's random start, normalized to sum to 1
+            theta = np.full((nusers, k), 1.0 / k)
+            logtheta = np.log(theta)
+
+        passes = np.zeros(nusers, dtype=np.int64)
+        active = np.ones(nusers, dtype=bool)
+        while active.any() and passes.max() < self.iters:
+            passes[active] += 1
+
+            # update_shape for every pair at once
+            phi_sum = pairs_friend @ logtau
+            if theta is not None:
+                phi_mf = np.exp(logtheta[pair_user] + self.logbeta[pair_item])
+                phi_sum += phi_mf.sum(axis=1)
+            if fit.delta is not None:
+                phi_sum += self.delta[pair_item]
+            inverse = np.zeros(npairs)
+            np.divide(1.0, phi_sum, out=inverse, where=phi_sum != 0)
+
+            change = np.zeros(nusers)
+            parts = 0
+            if self.learn_tau:
+                a_tau = settings['a_tau'] + logtau * (friend_pairs @ inverse)
+                new_tau = a_tau / b_tau
+                moved = np.bincount(edge_user, np.abs(new_tau - tau),
+                    minlength=nusers)
+                total = np.bincount(edge_user, tau, minlength=nusers)
+                change += np.where(total > 0, moved / np.where(total > 0,
+                    total, 1), 0)
+                parts += 1
+                edges = active[edge_user]
+                tau[edges] = new_tau[edges]
+                logtau[edges] = np.exp(digamma(a_tau[edges]) -
+                    np.log(b_tau[edges]))
+            if theta is not None:
+                a_theta = settings['a_theta'] + by_user @ (phi_mf *
+                    inverse[:, np.newaxis])
+                new_theta = a_theta / self.b_theta
+                change += np.abs(new_theta - theta).sum(axis=1) / \
+                    theta.sum(axis=1)
+                parts += 1
+                theta[active] = new_theta[active]
+                logtheta[active] = digamma(a_theta[active]) - \
+                    np.log(self.b_theta)
+
+            active &= change / max(parts, 1) >= self.tolerance
+
+        influence = None
+        if fit.tau is not None:
+            influence = sp.csr_matrix((tau.astype(np.float32),
+                network.indices, network.indptr), shape=network.shape)
+        elif self.social:
+            influence = network.astype(np.float32)
+        if theta is not None:
+            theta = theta.astype(np.float32)
+        return theta, influence, passes
+
+    def _friend_pairs(self, ratings, edge_user, edge_friend):
+        # edges x pairs: the friend's training rating of each of the edge's
+        # user's rated items
+        npairs = ratings.nnz
+        if len(edge_user) == 0 or npairs == 0:
+            return sp.csr_matrix((len(edge_user), npairs))
+        pair_ids = sp.csr_matrix((np.arange(1, npairs + 1, dtype=np.float64),
+            ratings.indices, ratings.indptr), shape=ratings.shape)
+        friend_ratings = self.scorer.ratings[edge_friend]
+        values = friend_ratings.multiply(ratings[edge_user]).tocsr()
+        ids = pair_ids[edge_user].multiply(friend_ratings != 0).tocsr()
+        for matrix in (values, ids):
+            matrix.eliminate_zeros()
+            matrix.sort_indices()
+        return sp.csr_matrix((values.data, ids.data.astype(np.int64) - 1,
+            values.indptr), shape=(len(edge_user), npairs))
+
+    def scores(self, theta, tau):
+        # dense B x items float32 scores of folded-in users, as
+        # Scorer.scores computes them for the fit's own
+        fit = self.fit
+        nusers = tau.shape[0] if theta is None else theta.shape[0]
+        block = np.zeros((nusers, len(self.scorer.items)), dtype=np.float32)
+        if theta is not None:
+            block += theta @ np.asarray(fit.beta).T
+        else:
+            block += score.SOCIAL_ONLY_OFFSET
+        if tau is not None:
+            block += (tau @ self.scorer.ratings).toarray()
+        if fit.delta is not None:
+            block += np.asarray(fit.delta)[np.newaxis, :]
+        return block
+
+    def top(self, theta, tau, ratings, n):
+        # the n best items of each folded-in user that are not in ratings
+        return score.top_items(self.scores(theta, tau), sp.csr_matrix(ratings),
+            n)
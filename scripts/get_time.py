@@ -1,9 +1,17 @@
 import sys
+import resources
 
+# CPU seconds (user + sys) of a job: from its measure.py record, or from the
+# bash time output older studies wrote to .time.err files
+filename = sys.argv[1]
 t = 0
-for line in open(sys.argv[1]):
-    toks = line.split('\t')
-    if toks[0] == "user" or toks[0] == "sys":
-        m,s = [float(i) for i in toks[1][:-2].split('m')]
-        t += m*60 + s
-print t
+if filename.endswith('.json'):
+    record = resources.read_json(filename)
+    t = float(record['user']) + float(record['sys'])
+else:
+    for line in open(filename):
+        toks = line.split('\t')
+        if toks[0] == "user" or toks[0] == "sys":
+            m,s = [float(i) for i in toks[1][:-2].split('m')]
+            t += m*60 + s
+print(t)
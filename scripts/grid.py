@@ -0,0 +1,95 @@
+import os
+import multiprocessing
+import numpy as np
+import scipy.sparse as sp
+import dataio
+
+# grid cells generated per block; bounds memory while writing or streaming
+GRID_BLOCK = 1000000
+
+# names of the compact form of a grid in a data directory
+GRID_USERS = 'test_grid_users.bin'
+GRID_ITEMS = 'test_grid_items.bin'
+GRID_POSITIVES = 'test_positives.tsv'
+
+
+### the held-out ratings as a sparse user x item matrix
+
+def held_out(users, items, ratings, grid_users, grid_items):
+    # CSR matrix over the grid (rows follow grid_users, columns grid_items)
+    # holding the held-out ratings; pairs outside the grid are dropped
+    rows = np.searchsorted(grid_users, users)
+    cols = np.searchsorted(grid_items, items)
+    rows[rows == len(grid_users)] = 0
+    cols[cols == len(grid_items)] = 0
+    inside = (grid_users[rows] == users) & (grid_items[cols] == items) \
+        if len(grid_users) and len(grid_items) else np.zeros(len(users), bool)
+    return sp.csr_matrix((ratings[inside], (rows[inside], cols[inside])),
+        shape=(len(grid_users), len(grid_items)))
+
+
+### dense blocks
+
+def blocks(grid_users, grid_items, matrix, block=GRID_BLOCK):
+    # (users, items, ratings) arrays covering every grid cell, a few whole
+    # users at a time, with 0 for the cells that were not held out
+    per_block = max(block // max(len(grid_items), 1), 1)
+    for start in range(0, len(grid_users), per_block):
+        end = min(start + per_block, len(grid_users))
+        dense = matrix[start:end].toarray()
+        users = np.repeat(grid_users[start:end], len(grid_items))
+        items = np.tile(grid_items, end - start)
+        yield users, items, dense.ravel()
+
+def _write_chunk(task):
+    filename, grid_users, grid_items, matrix, block = task
+    f = open(filename, 'w+')
+    rows = 0
+    for users, items, ratings in blocks(grid_users, grid_items, matrix, block):
+        dataio.write_tsv(f, users, items, ratings)
+        rows += len(users)
+    f.close()
+    return filename, rows
+
+def write_chunks(pattern, grid_users, grid_items, matrix, max_rows,
+                 workers=1, block=GRID_BLOCK):
+    # write the dense grid as text files pattern % 1, pattern % 2, ... of
+    # whole users, starting a new file once one has more than max_rows lines;
+    # with several workers the files are written concurrently
+    users_per_chunk = max_rows // max(len(grid_items), 1) + 1
+    tasks = []
+    for n, start in enumerate(range(0, max(len(grid_users), 1),
+                                    users_per_chunk)):
+        end = start + users_per_chunk
+        tasks.append((pattern % (n + 1), grid_users[start:end], grid_items,
+            matrix[start:end], block))
+    if workers <= 1:
+        return [_write_chunk(task) for task in tasks]
+    pool = multiprocessing.Pool(workers)
+    try:
+        written = pool.map(_write_chunk, tasks)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return written
+
+
+### compact form: the grid's users and items plus its nonzero cells
+
+def write_compact(path, grid_users, grid_items, matrix):
+    dataio.write_bin(os.path.join(path, GRID_USERS), grid_users)
+    dataio.write_bin(os.path.join(path, GRID_ITEMS), grid_items)
+    coo = matrix.tocoo()
+    f = open(os.path.join(path, GRID_POSITIVES), 'w+')
+    dataio.write_tsv(f, grid_users[coo.row], grid_items[coo.col], coo.data)
+    f.close()
+
+def read_compact(path, block=GRID_BLOCK):
+    # stream the dense grid back from its compact form, in the same blocks
+    # write_chunks writes
+    grid_users = dataio.read_bin(os.path.join(path, GRID_USERS))[0]
+    grid_items = dataio.read_bin(os.path.join(path, GRID_ITEMS))[0]
+    users, items, ratings = dataio.load(os.path.join(path, GRID_POSITIVES), 3)
+    matrix = held_out(users, items, ratings, grid_users, grid_items)
+    return blocks(grid_users, grid_items, matrix, block)
@@ -0,0 +1,129 @@
+import os
+import numpy as np
+import dataio
+import stream
+
+# the index files written next to a split's train.tsv
+USER_INDEX = 'user_index.bin'
+ITEM_INDEX = 'item_index.bin'
+
+
+### original id <-> dense index
+
+class IdIndex:
+    # Dense 0..n-1 indexes for a set of original ids, numbered in order of
+    # first appearance in train.tsv: the numbering src/data.cpp gives users
+    # and items, and the one the list forms and id maps use.  Stored as the
+    # sorted original ids with the index of each (a two-column binary data
+    # file), so lookups are a binary search over a memory-mapped array and
+    # nothing is rebuilt when the index is reused.
+
+    def __init__(self, sorted_ids, index):
+        self.sorted_ids = sorted_ids
+        self.index = index
+        self._ids = None
+
+    def __len__(self):
+        return len(self.sorted_ids)
+
+    @classmethod
+    def from_first_seen(cls, ids, first):
+        # ids: distinct original ids, first: where each was first seen
+        order = np.argsort(ids)
+        ids, first = ids[order], first[order]
+        index = np.empty(len(ids), dtype=np.int64)
+        index[np.argsort(first, kind='stable')] = np.arange(len(ids))
+        return cls(ids, index)
+
+    @classmethod
+    def build(cls, values):
+        ids, first = np.unique(values, return_index=True)
+        return cls.from_first_seen(ids, first)
+
+    @classmethod
+    def load(cls, filename, mmap=True):
+        sorted_ids, index = dataio.read_bin(filename, mmap)
+        return cls(sorted_ids, index)
+
+    def save(self, filename):
+        dataio.write_bin(filename, self.sorted_ids, self.index)
+
+    @property
+    def ids(self):
+        # the original ids in index order
+        if self._ids is None:
+            self._ids = np.empty(len(self), dtype=np.int64)
+            self._ids[self.index] = self.sorted_ids
+        return self._ids
+
+    def lookup(self, values, missing=-1):
+        # the index of each original id, `missing` for ids not in the index
+        values = np.asarray(values, dtype=np.int64)
+        pos = np.searchsorted(self.sorted_ids, values)
+        pos[pos == len(self)] = 0
+        if len(self) == 0:
+            return np.full(len(values), missing, dtype=np.int64)
+        found = self.sorted_ids[pos] == values
+        return np.where(found, self.index[pos], missing).astype(np.int64)
+
+    def original(self, indexes):
+        return self.ids[np.asarray(indexes, dtype=np.int64)]
+
+
+### the user and item indexes of a data directory
+
+def _first_seen(chunks, column):
+    # distinct values of a column and the row where each first appears,
+    # merged chunk by chunk so only the distinct values are held in memory
+    ids = np.zeros(0, dtype=np.int64)
+    first = np.zeros(0, dtype=np.int64)
+    offset = 0
+    for rows in chunks:
+        new_ids, new_first = np.unique(rows[:, column], return_index=True)
+        ids = np.concatenate((ids, new_ids))
+        first = np.concatenate((first, new_first + offset))
+        # keep the earliest position of every id
+        order = np.lexsort((first, ids))
+        ids, first = ids[order], first[order]
+        keep = np.ones(len(ids), dtype=bool)
+        keep[1:] = ids[1:] != ids[:-1]
+        ids, first = ids[keep], first[keep]
+        offset += len(rows)
+    return ids, first
+
+def _train_chunks(path):
+    filename = os.path.join(path, 'train.tsv')
+    binary = dataio.fresh_bin(filename)
+    if binary is None:
+        return stream.read_chunks(filename, 2)
+    columns = dataio.read_bin(binary)[:2]
+    return (np.column_stack([c[start:start + stream.READ_CHUNK]
+        for c in columns]).astype(np.int64) for start in
+        range(0, len(columns[0]), stream.READ_CHUNK))
+
+def build(path):
+    # write the user and item indexes of the split in path from its train.tsv
+    users = IdIndex.from_first_seen(*_first_seen(_train_chunks(path), 0))
+    items = IdIndex.from_first_seen(*_first_seen(_train_chunks(path), 1))
+    users.save(os.path.join(path, USER_INDEX))
+    items.save(os.path.join(path, ITEM_INDEX))
+    return users, items
+
+def _fresh(path, name):
+    filename = os.path.join(path, name)
+    if not os.path.exists(filename):
+        return False
+    train = os.path.join(path, 'train.tsv')
+    for source in (train, dataio.bin_name(train)):
+        if os.path.exists(source) and \
+            os.path.getmtime(source) > os.path.getmtime(filename):
+            return False
+    return True
+
+def load(path):
+    # (users, items) indexes of the split in path, built first when they are
+    # missing or older than its training data
+    if not (_fresh(path, USER_INDEX) and _fresh(path, ITEM_INDEX)):
+        return build(path)
+    return (IdIndex.load(os.path.join(path, USER_INDEX)),
+        IdIndex.load(os.path.join(path, ITEM_INDEX)))
@@ -0,0 +1,121 @@
+import argparse
+import glob
+import errno
+import os
+import sys
+import time
+import numpy as np
+import evaluation
+import scorestore
+
+### command line args
+
+parser = argparse.ArgumentParser(description='ingest the LibRec ' +
+    'prediction file of each test chunk (model-dir/prediction-NN.txt) as ' +
+    'it appears, storing the scores in binary form and evaluating the ' +
+    'chunk\'s users right away; once every chunk is in, write the ' +
+    'librec_eval results (user_eval, item_eval, eval_summary)')
+parser.add_argument('data_dir')
+parser.add_argument('model_dir')
+parser.add_argument('--chunks', type=int, default=None,
+    help='number of prediction files to wait for (default: one per ' +
+    'data-dir/test-NN.dat)')
+parser.add_argument('--poll', type=float, default=5,
+    help='seconds between checks for the next prediction file')
+parser.add_argument('--timeout', type=float, default=None,
+    help='give up (exit 1) after waiting this many seconds for any one ' +
+    'prediction file (default: no limit)')
+parser.add_argument('--parent', type=int, default=None,
+    help='give up (exit 1) once the process with this pid has exited, e.g. ' +
+    'the study script handing the files over')
+parser.add_argument('--seed', type=int, default=evaluation.EVAL_SEED,
+    help='seed for breaking ties between equal scores')
+parser.add_argument('--workers', type=int, default=1,
+    help='processes for the final item ranking pass')
+args = parser.parse_args()
+
+chunks = args.chunks
+if chunks is None:
+    chunks = len(glob.glob(os.path.join(args.data_dir, 'test-*.dat')))
+
+# librec_eval reads the data as binary ratings
+data = evaluation.EvalData(args.data_dir, binary=True)
+store = scorestore.ScoreStore(os.path.join(args.model_dir, 'scores'),
+    len(data.users), len(data.items))
+
+def heldout_file(name):
+    return os.path.join(store.path, '%s.heldout.npy' % name)
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+def wait_for(text):
+    # poll for the file until it appears, the timeout runs out or the parent
+    # is gone
+    start = time.time()
+    while not os.path.exists(text):
+        if args.parent is not None and not alive(args.parent):
+            sys.exit("gave up on %s: process %d has exited" % (text,
+                args.parent))
+        if args.timeout is not None and time.time() - start > args.timeout:
+            sys.exit("gave up on %s after %g seconds" % (text, args.timeout))
+        time.sleep(args.poll)
+
+### ingest and evaluate each chunk as it arrives
+# a test chunk holds whole users (see grid.write_chunks), so a chunk's users
+# can be ranked from its predictions alone
+
+parts = []
+ranked = np.zeros(len(data.users), dtype=bool)
+for n in range(1, chunks + 1):
+    name = '%02d' % n
+    if not store.has(name):
+        text = os.path.join(args.model_dir, 'prediction-%s.txt' % name)
+        wait_for(text)
+        store.add(name, *scorestore.read_predictions(text, data.users,
+            data.items))
+
+    matrix = store.chunk(name, mmap=False)
+    users = np.intersect1d(np.unique(matrix.tocoo().row), data.test_users)
+    if os.path.exists(heldout_file(name)):
+        part = np.load(heldout_file(name))
+        part = (part[0].astype(np.int64), part[1].astype(np.int64),
+            part[2].astype(np.int64), part[3].astype(np.int64), part[4])
+    else:
+        part = evaluation.rank_users(data, lambda rows: matrix[rows].toarray(),
+            users, args.seed)
+        np.save(heldout_file(name), np.vstack(part).astype(np.float64))
+    parts.append(part)
+    ranked[users] = True
+
+    heldout = evaluation.join_heldout(parts)
+    per_user = evaluation.metrics(heldout[0], heldout[2], heldout[3],
+        heldout[4], len(data.users))
+    so_far = np.flatnonzero(ranked)
+    if len(so_far) == 0:
+        print("chunk %s: no test users yet" % name)
+        continue
+    print("chunk %s: %d users so far, CRR %f, NDCG %f" % (name, len(so_far),
+        per_user['crr'][so_far].mean(), per_user['ndcg'][so_far].mean()))
+
+### results over all chunks
+
+if not store.names() or store.matrix().nnz == 0:
+    print("no predictions; nothing to evaluate")
+else:
+    matrix = store.matrix()
+    scores = lambda rows: matrix[rows].toarray()
+    # test users LibRec made no predictions for score 0 everywhere
+    missing = data.test_users[~ranked[data.test_users]]
+    if len(missing):
+        parts.append(evaluation.rank_users(data, scores, missing, args.seed))
+    heldout = evaluation.join_heldout(parts)
+    blocks = [data.test_users[start:start + evaluation.EVAL_BATCH] for start
+        in range(0, len(data.test_users), evaluation.EVAL_BATCH)]
+    ranks = evaluation.item_ranks(data, scores, heldout, blocks, args.seed,
+        args.workers)
+    evaluation.write_results(data, heldout, ranks, args.model_dir)
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import resources
+
+# thread-count variables set for every job, so BLAS and OpenMP in the fits
+# keep to the job's share of the CPU budget
+THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# columns of the per-job record file
+RECORD_FIELDS = ('job', 'status', 'returncode', 'start') + resources.FIELDS
+
+
+### jobs
+
+class Job:
+    # One or more commands run one after another under a name, with their
+    # output appended to stdout/stderr files.  threads is the job's share of
+    # the CPU budget (0 for jobs that mostly wait, like the LibRec ingester);
+    # after names the jobs that must succeed first; done is called with the
+    # job once all of its commands have succeeded.
+
+    def __init__(self, name, commands, cwd=None, stdout=None, stderr=None,
+                 threads=1, after=(), done=None):
+        self.name = name
+        self.commands = commands
+        self.cwd = cwd
+        self.stdout = stdout
+        self.stderr = stderr
+        self.threads = threads
+        self.after = tuple(after)
+        self.done = done
+        self.status = 'pending'
+        self.returncode = None
+        self.start = None
+        self.usage = resources.empty()
+
+    def record(self):
+        record = {'job': self.name, 'status': self.status,
+            'returncode': '' if self.returncode is None else self.returncode,
+            'start': '' if self.start is None else '%.3f' % self.start}
+        for field, value in self.usage.items():
+            record[field] = '%.3f' % value if isinstance(value, float) \
+                else value
+        return record
+
+    def run(self):
+        # run the commands, stopping at the first failure, with the usage of
+        # each measured by resources.run
+        env = dict(os.environ)
+        for name in THREAD_VARS:
+            env[name] = str(max(self.threads, 1))
+        out = open(self.stdout, 'a') if self.stdout else None
+        err = open(self.stderr, 'a') if self.stderr else None
+        self.start = time.time()
+        try:
+            for command in self.commands:
+                self.returncode, usage = resources.run(command, self.cwd, env,
+                    out, err)
+                resources.add(self.usage, usage)
+                if self.returncode != 0:
+                    break
+        except OSError as e:
+            if err is not None:
+                err.write('%s: %s\n' % (self.name, e))
+            self.returncode = -1
+        finally:
+            self.usage['wall'] = time.time() - self.start
+            for f in (out, err):
+                if f is not None:
+                    f.close()
+        self.status = 'ok' if self.returncode == 0 else 'failed'
+        if self.status == 'ok' and self.done is not None:
+            self.done(self)
+
+
+### running jobs under a CPU budget
+
+def run(jobs, cpus, records=None, log=None):
+    # run the jobs, each as soon as the jobs it comes after have succeeded
+    # and its threads fit in what is left of the cpus budget (a job wider
+    # than the budget runs alone), in list order otherwise; jobs after a
+    # failed or skipped one are skipped.  One record per job is written to
+    # records (CSV) as it ends.
+    by_name = dict((job.name, job) for job in jobs)
+    finished = threading.Condition()
+    ended = []
+    if records is not None:
+        f = open(records, 'w')
+        f.write(','.join(RECORD_FIELDS) + '\n')
+        f.close()
+
+    def write_record(job):
+        if log is not None:
+            log('%s: %s' % (job.name, job.status))
+        if records is None:
+            return
+        f = open(records, 'a')
+        record = job.record()
+        f.write(','.join(str(record[field]) for field in RECORD_FIELDS) +
+            '\n')
+        f.close()
+
+    def thread(job):
+        job.run()
+        with finished:
+            ended.append(job)
+            finished.notify()
+
+    used = 0
+    running = 0
+    while True:
+        for job in jobs:
+            if job.status != 'pending':
+                continue
+            before = [by_name[name].status for name in job.after]
+            if any(status in ('failed', 'skipped') for status in before):
+                job.status = 'skipped'
+                write_record(job)
+                continue
+            if any(status != 'ok' for status in before):
+                continue
+            threads = min(job.threads, cpus)
+            if running and used + threads > cpus:
+                continue
+            job.status = 'running'
+            used += threads
+            running += 1
+            if log is not None:
+                log('%s: started' % job.name)
+            threading.Thread(target=thread, args=(job,)).start()
+        if not running:
+            break
+        with finished:
+            while not ended:
+                finished.wait()
+            done, ended[:] = list(ended), []
+        for job in done:
+            used -= min(job.threads, cpus)
+            running -= 1
+            write_record(job)
+    # what is left waits on a job that failed or was skipped
+    for job in jobs:
+        if job.status == 'pending':
+            job.status = 'skipped'
+            write_record(job)
+    return jobs
@@ -0,0 +1,89 @@
+import numpy as np
+import scipy.sparse as sp
+import dataio
+import idindex
+
+# rows per formatted write of a list file
+LIST_CHUNK = 100000
+
+
+### adjacency lists
+
+def lists(rows, cols, nrows, ncols):
+    # CSR matrix with row r listing the cols of every (rows[j], cols[j]) in
+    # input order, duplicates included (so no sum_duplicates)
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(nrows + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=nrows))
+    return sp.csr_matrix((np.ones(len(rows), dtype=np.int32), cols[order],
+        indptr), shape=(nrows, ncols))
+
+def write_lists(filename, matrix):
+    # one line per row: the entry count, then the column of each entry
+    f = open(filename, 'w+')
+    indptr, indices = matrix.indptr, matrix.indices
+    for start in range(0, matrix.shape[0], LIST_CHUNK):
+        end = min(start + LIST_CHUNK, matrix.shape[0])
+        counts = np.diff(indptr[start:end + 1])
+        cols = indices[indptr[start]:indptr[end]]
+        # each row is its count followed by its columns
+        tokens = np.insert(cols, indptr[start:end] - indptr[start], counts)
+        last = np.cumsum(counts + 1) - 1
+        fmt = np.full(len(tokens), '%d ', dtype=object)
+        fmt[last] = '%d\n'
+        f.write(''.join(fmt.tolist()) % tuple(tokens.tolist()))
+    f.close()
+
+def write_map(filename, ids):
+    # original id, index
+    f = open(filename, 'w+')
+    if len(ids):
+        f.write(('%d,%d\n' * len(ids)) % tuple(np.column_stack((ids,
+            np.arange(len(ids)))).ravel().tolist()))
+    f.close()
+
+
+### CTR/MF and SoRec list forms
+
+def export(path, ctr=True, sorec=None):
+    # write path/users.dat, items.dat and the id maps for CTR/MF, and with
+    # sorec 'directed' or 'undirected' the *_sorec.dat files, where each
+    # user is also an extra item (after the real ones) that their friends
+    # have, all from one read of train.tsv (and network.tsv for SoRec); users
+    # and items are numbered by the split's id index (see idindex.py);
+    # returns the files written
+    users, items = dataio.load(path + '/train.tsv', 2)
+    user_index, item_index = idindex.load(path)
+    uids, rows = user_index.ids, user_index.lookup(users)
+    iids, cols = item_index.ids, item_index.lookup(items)
+    nu, ni = len(uids), len(iids)
+    written = []
+
+    if ctr:
+        write_map(path + '/user_map.dat', uids)
+        write_map(path + '/item_map.dat', iids)
+        write_lists(path + '/users.dat', lists(rows, cols, nu, ni))
+        write_lists(path + '/items.dat', lists(cols, rows, ni, nu))
+        written += ['user_map.dat', 'item_map.dat', 'users.dat', 'items.dat']
+
+    if sorec is not None:
+        a, b = dataio.load(path + '/network.tsv', 2)
+        ra = user_index.lookup(a)
+        rb = user_index.lookup(b)
+        keep = (ra >= 0) & (rb >= 0)
+        ra, rb = ra[keep], rb[keep]
+        if sorec == 'undirected':
+            # each edge followed by its reverse, as the edges are read
+            ra, rb = np.column_stack((ra, rb)).ravel(), \
+                np.column_stack((rb, ra)).ravel()
+        social_rows = np.concatenate((rows, ra))
+        social_cols = np.concatenate((cols, ni + rb))
+        write_map(path + '/user_map_sorec.dat', uids)
+        write_map(path + '/item_map_sorec.dat', iids)
+        write_lists(path + '/users_sorec.dat', lists(social_rows, social_cols,
+            nu, ni + nu))
+        write_lists(path + '/items_sorec.dat', lists(social_cols, social_rows,
+            ni + nu, nu))
+        written += ['user_map_sorec.dat', 'item_map_sorec.dat',
+            'users_sorec.dat', 'items_sorec.dat']
+    return [path + '/' + name for name in written]
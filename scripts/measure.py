@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+import resources
+
+### command line args
+
+parser = argparse.ArgumentParser(description='run a command and write ' +
+    'its wall and CPU time, memory and I/O to a JSON record (what study.sh ' +
+    'used bash time for)')
+parser.add_argument('record', help='the record file, e.g. ' +
+    'out-dir/[job].resources.json')
+parser.add_argument('--job', default=None,
+    help='job name in the record (default: the record file\'s name)')
+parser.add_argument('--append', action='store_true',
+    help='add to an existing record, for a job run in several commands')
+parser.add_argument('command', nargs=argparse.REMAINDER,
+    help='the command, after --')
+args = parser.parse_args()
+
+command = args.command[1:] if args.command[:1] == ['--'] else args.command
+if not command:
+    parser.error('no command given')
+job = args.job
+if job is None:
+    job = os.path.basename(args.record).split('.resources.json')[0]
+
+record = {'job': job, 'command': ' '.join(command), 'start': time.time(),
+    'returncode': None}
+record.update(resources.empty())
+if args.append and os.path.exists(args.record):
+    record = resources.read_json(args.record)
+    record['command'] += '; ' + ' '.join(command)
+
+try:
+    returncode, usage = resources.run(command)
+except OSError as e:
+    sys.stderr.write('%s: %s\n' % (command[0], e))
+    returncode, usage = 127, resources.empty()
+resources.add(record, usage)
+if record['returncode'] in (None, 0):
+    record['returncode'] = returncode
+resources.write_json(args.record, record)
+sys.exit(returncode)
@@ -0,0 +1,143 @@
+import numpy as np
+
+# rounds of batched draws before the users still short of negatives are
+# sampled exactly from their full complement
+MAX_ROUNDS = 8
+
+
+### negative sampling
+
+class NegativeSampler:
+    # Draws, for each requested user, distinct items from a catalog that the
+    # user has no rating for.  Draws are made for many users at once from the
+    # catalog array (uniformly, or in proportion to per-item weights such as
+    # popularity) and rejected when they hit one of the user's items, found
+    # by binary search in the sorted (user, item) keys of the positives, or
+    # repeat an earlier draw.  Taking the first distinct draws in order is
+    # the same as sampling without replacement.
+
+    def __init__(self, users, items, catalog=None, weights=None, seed=11):
+        # users, items: the positive pairs; catalog: the items negatives come
+        # from (default: the distinct positive items); weights: one positive
+        # weight per catalog item (in sorted catalog order), or None
+        users = np.asarray(users, dtype=np.int64)
+        items = np.asarray(items, dtype=np.int64)
+        self.catalog = np.unique(items if catalog is None else
+            np.asarray(catalog, dtype=np.int64))
+        self.n = len(self.catalog)
+        self.uids, rows = np.unique(users, return_inverse=True)
+
+        cols = np.searchsorted(self.catalog, items)
+        cols[cols == self.n] = 0
+        inside = self.catalog[cols] == items if self.n else \
+            np.zeros(len(items), dtype=bool)
+        self.keys = np.unique(rows[inside] * self.n + cols[inside])
+        # per-user positive counts, plus a trailing 0 for row -1 (no user)
+        self.positives = np.bincount(self.keys // max(self.n, 1),
+            minlength=len(self.uids) + 1)
+
+        if weights is None:
+            self.cum = None
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            if len(weights) != self.n or (self.n and weights.min() <= 0):
+                raise ValueError('need one positive weight per catalog item')
+            self.cum = np.cumsum(weights)
+            self.cum /= self.cum[-1]
+            self.weights = weights
+        self.rng = np.random.default_rng(seed)
+
+    def _draw(self, size):
+        if self.cum is None:
+            return self.rng.integers(0, self.n, size=size)
+        cols = np.searchsorted(self.cum, self.rng.random(size), side='right')
+        return np.minimum(cols, self.n - 1)
+
+    def _rows(self, users):
+        # row of each user among the positives, -1 for users without any
+        rows = np.searchsorted(self.uids, users)
+        rows[rows == len(self.uids)] = 0
+        known = self.uids[rows] == users if len(self.uids) else \
+            np.zeros(len(users), dtype=bool)
+        return np.where(known, rows, -1)
+
+    def sample(self, users, counts):
+        # up to counts[j] negatives for users[j] (fewer only when the user has
+        # rated almost the whole catalog); returns parallel user and item
+        # arrays grouped by user in the order given
+        users = np.asarray(users, dtype=np.int64)
+        rows = self._rows(users)
+        free = self.n - self.positives[rows]
+        need = np.minimum(np.asarray(counts, dtype=np.int64), free)
+
+        owner = np.zeros(0, dtype=np.int64)
+        cols = np.zeros(0, dtype=np.int64)
+        got = np.zeros(len(users), dtype=np.int64)
+        for rnd in range(MAX_ROUNDS):
+            short = np.flatnonzero(got < need)
+            if len(short) == 0:
+                break
+            # oversample by the expected rejection rate, plus a little
+            missing = need[short] - got[short]
+            m = np.ceil(missing * 1.5 * self.n / free[short]).astype(np.int64)
+            new_owner = np.repeat(short, m + 2)
+            new_cols = self._draw(len(new_owner))
+            hit = self._positive(rows[new_owner], new_cols)
+            owner, cols = self._first(np.concatenate((owner,
+                new_owner[~hit])), np.concatenate((cols, new_cols[~hit])),
+                need)
+            got = np.bincount(owner, minlength=len(users))
+
+        short = np.flatnonzero(got < need)
+        if len(short):
+            extra_owner, extra_cols = self._exact(short, rows, need - got,
+                owner, cols)
+            owner = np.concatenate((owner, extra_owner))
+            cols = np.concatenate((cols, extra_cols))
+
+        order = np.argsort(owner, kind='stable')
+        return users[owner[order]], self.catalog[cols[order]]
+
+    def _positive(self, rows, cols):
+        keys = rows * self.n + cols
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == len(self.keys)] = 0
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        return (rows >= 0) & (self.keys[pos] == keys)
+
+    def _first(self, owner, cols, need):
+        # drop repeated (owner, col) draws, then keep each owner's first
+        # need[owner] draws, all in draw order
+        keys = owner * max(self.n, 1) + cols
+        first = np.sort(np.unique(keys, return_index=True)[1])
+        owner, cols = owner[first], cols[first]
+        order = np.argsort(owner, kind='stable')
+        counts = np.bincount(owner, minlength=len(need))
+        starts = np.cumsum(counts) - counts
+        rank = np.empty(len(owner), dtype=np.int64)
+        rank[order] = np.arange(len(owner)) - np.repeat(starts, counts)
+        keep = rank < need[owner]
+        return owner[keep], cols[keep]
+
+    def _exact(self, short, rows, missing, drawn_owner, drawn_cols):
+        # for the few users that rejection could not serve: draw from the
+        # explicit complement of what they have rated or already drawn
+        owner = []
+        cols = []
+        for j in short:
+            taken = np.zeros(self.n, dtype=bool)
+            taken[drawn_cols[drawn_owner == j]] = True
+            if rows[j] >= 0:
+                lo, hi = np.searchsorted(self.keys, [rows[j] * self.n,
+                    (rows[j] + 1) * self.n])
+                taken[self.keys[lo:hi] - rows[j] * self.n] = True
+            allowed = np.flatnonzero(~taken)
+            p = None
+            if self.cum is not None:
+                p = self.weights[allowed] / self.weights[allowed].sum()
+            picks = self.rng.choice(allowed, size=int(missing[j]),
+                replace=False, p=p)
+            owner.append(np.full(len(picks), j, dtype=np.int64))
+            cols.append(picks)
+        return np.concatenate(owner), np.concatenate(cols)
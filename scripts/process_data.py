@@ -1,15 +1,59 @@
 import sys
+import argparse
 import scipy.io
 from collections import defaultdict
 import os
 from os.path import join, exists
 import random
+import numpy as np
+import dataio
+import cull
+import datacache
+import idindex
+import profiling
 
 ### command line args
 
-ratings_file = sys.argv[1]
-network_file = sys.argv[2]
-output_dir = sys.argv[3]
+parser = argparse.ArgumentParser(description='split ratings into train, ' +
+    'test, and validation sets and cull the network')
+parser.add_argument('ratings_file')
+parser.add_argument('network_file')
+parser.add_argument('output_dir')
+parser.add_argument('--engine', choices=['python', 'numpy'], default='python',
+    help='python reproduces the original splits; numpy is vectorized and ' +
+    'seed-reproducible, but assigns ratings differently')
+parser.add_argument('--seed', type=int, default=11)
+parser.add_argument('--streaming', action='store_true',
+    help='partition ratings by user into spill files on disk and split and ' +
+    'cull one bucket at a time (same output as --engine numpy); memory is ' +
+    'bounded by the buckets and the network, which is still read whole')
+parser.add_argument('--tmpdir', default=None,
+    help='directory for --streaming and --workers spill files ' +
+    '(default: system temp)')
+parser.add_argument('--bucket-rows', type=int, default=5000000,
+    help='approximate ratings per --streaming bucket')
+parser.add_argument('--workers', type=int, default=1,
+    help='split users across this many processes (with --engine numpy); ' +
+    'the output does not depend on the number of workers')
+parser.add_argument('--binary', action='store_true',
+    help='also write binary .bin twins of the output files')
+parser.add_argument('--edge-overlap', action='store_true',
+    help='also write network_overlap.tsv with the number of items each ' +
+    'kept connection has in common')
+profiling.add_arguments(parser)
+datacache.add_arguments(parser)
+args = parser.parse_args()
+if args.streaming and args.engine != 'numpy':
+    parser.error('--streaming requires --engine numpy')
+if args.workers > 1 and args.engine != 'numpy':
+    parser.error('--workers requires --engine numpy')
+
+ratings_file = args.ratings_file
+network_file = args.network_file
+output_dir = args.output_dir
+if not exists(output_dir):
+    os.mkdir(output_dir)
+profile = profiling.from_args(args, 'process_data', output_dir)
 
 splitchar = '\t'
 
@@ -27,20 +71,44 @@ valid /= total
 
 print (train, test, valid)
 
-random.seed(11)
+random.seed(args.seed)
+
+# --streaming and --workers do not change the output, so they are not part
+# of the cache key
+cached = datacache.from_args(args, 'process_data', {'engine': args.engine,
+    'seed': args.seed, 'fractions': (train, test, valid),
+    'binary': args.binary, 'edge_overlap': args.edge_overlap},
+    [('ratings', ratings_file), ('network', network_file)], output_dir)
+if cached.hit():
+    sys.exit(0)
 
 
 ### read in everything
 
-ratings = open(ratings_file, 'r')
+profile.stage('read ratings')
 user_ratings = defaultdict(list)
 ur = defaultdict(set)
-for line in ratings:
-    user, item, rating = [int(x) for x in line.strip().split(splitchar)]
-    user_ratings[user].append((item, rating))
-    ur[user].add(item)
-ratings.close()
-
+if args.streaming:
+    import split
+    import stream
+    partition = stream.UserPartition(stream.read_chunks(ratings_file, 3,
+        splitchar), 3, args.tmpdir, args.bucket_rows)
+    profile.rows(partition.item_counts.sum())
+elif args.engine == 'numpy':
+    import split
+    users, items, ratings = [c.astype(np.int64) for c in
+        dataio.load(ratings_file, 3)]
+    profile.rows(len(users))
+else:
+    ratings = open(ratings_file, 'r')
+    for line in ratings:
+        user, item, rating = [int(x) for x in line.strip().split(splitchar)]
+        user_ratings[user].append((item, rating))
+        ur[user].add(item)
+    ratings.close()
+    profile.rows(sum(len(r) for r in user_ratings.values()))
+
+profile.stage('read network')
 trustnetwork = open(network_file, 'r')
 network = set()
 for line in trustnetwork:
@@ -48,13 +116,12 @@ for line in trustnetwork:
     if (friend, user) not in network:
         network.add((user, friend))
 trustnetwork.close()
+profile.rows(len(network))
 
 
 ### write out everything
 
-if not exists(output_dir):
-    os.mkdir(output_dir)
-
+profile.stage('split')
 train_file = open(join(output_dir, "train.tsv"), 'w+')
 valid_file = open(join(output_dir, "validation.tsv"), 'w+')
 test_file = open(join(output_dir, "test.tsv"), 'w+')
@@ -63,6 +130,16 @@ network_file = open(join(output_dir, "network.tsv"), 'w+')
 a = 0
 b = 0
 c = 0
+if args.engine == 'numpy':
+    if args.streaming:
+        sources = [partition.bucket_path(n) for n in range(partition.nbuckets)]
+    elif args.workers > 1:
+        sources = split.shards(users, items, ratings, 4 * args.workers)
+    else:
+        sources = [(users, items, ratings)]
+    a, b, c = split.split_to_files(sources, (train_file, test_file, valid_file),
+        test, valid, args.seed, args.workers, args.tmpdir)
+
 for user in user_ratings:
     ratings = user_ratings[user]
     random.shuffle(ratings)
@@ -86,15 +163,42 @@ for user in user_ratings:
             train_file.write("%d\t%d\t%d\n" % (user, item, rating))
             a += 1
 
-for user, friend in network:
-    if len(ur[user] & ur[friend]) != 0:
-        network_file.write("%d\t%d\n" % (user, friend))
+profile.rows(a + b + c)
+
+profile.stage('cull network')
+user_ids, friend_ids = cull.edge_arrays(network)
+if args.streaming:
+    user_ids, friend_ids, overlap = partition.cull_edges(user_ids,
+        friend_ids)
+    partition.close()
+else:
+    if args.engine == 'python':
+        users, items = cull.arrays_from_sets(ur)
+    uids, matrix = cull.rating_matrix(users, items)
+    user_ids, friend_ids, overlap = cull.cull_edges(uids, matrix,
+        user_ids, friend_ids)
+profile.rows(len(user_ids))
+dataio.write_tsv(network_file, user_ids, friend_ids)
+if args.edge_overlap:
+    overlap_file = open(join(output_dir, "network_overlap.tsv"), 'w+')
+    dataio.write_tsv(overlap_file, user_ids, friend_ids, overlap)
+    overlap_file.close()
 
 
 train_file.close()
 valid_file.close()
 test_file.close()
 network_file.close()
+profile.stage('write')
+idindex.build(output_dir)
+written = [f.name for f in (train_file, test_file, valid_file, network_file)]
+written += [idindex.USER_INDEX, idindex.ITEM_INDEX]
+if args.edge_overlap:
+    written.append(overlap_file.name)
+if args.binary:
+    written += dataio.dir_to_bin(output_dir)
+profile.finish()
+cached.store(written)
 
 total = float(a + b + c)
 print (a/total, b/total, c/total)
@@ -1,16 +1,37 @@
-import sys
+import argparse
 import scipy.io
 from collections import defaultdict
 import os
 from os.path import join, exists
 import random
+import dataio
+import cull
+import idindex
+import profiling
 
 ### command line args
 
-ratings_file = sys.argv[1]
-network_file = sys.argv[2]
-output_dir = sys.argv[3]
-Nusers = int(sys.argv[4])
+parser = argparse.ArgumentParser(description='split ratings, holding out ' +
+    'test data only for a random subset of users, and cull the network')
+parser.add_argument('ratings_file')
+parser.add_argument('network_file')
+parser.add_argument('output_dir')
+parser.add_argument('Nusers', type=int)
+parser.add_argument('--binary', action='store_true',
+    help='also write binary .bin twins of the output files')
+parser.add_argument('--edge-overlap', action='store_true',
+    help='also write network_overlap.tsv with the number of items each ' +
+    'kept connection has in common')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+ratings_file = args.ratings_file
+network_file = args.network_file
+output_dir = args.output_dir
+Nusers = args.Nusers
+if not exists(output_dir):
+    os.mkdir(output_dir)
+profile = profiling.from_args(args, 'process_data_Nusers', output_dir)
 
 splitchar = ' '
 splitchar = '\t'
@@ -38,6 +59,7 @@ random.seed(11)
 
 ### read in everything
 
+profile.stage('read ratings')
 ratings = open(ratings_file, 'r')
 user_ratings = defaultdict(list)
 ur = defaultdict(set)
@@ -53,7 +75,9 @@ for line in ratings:
     user_ratings[user].append((item, rating))
     ur[user].add(item)
 ratings.close()
+profile.rows(sum(len(r) for r in user_ratings.values()))
 
+profile.stage('read network')
 trustnetwork = open(network_file, 'r')
 network = set()
 for line in trustnetwork:
@@ -61,13 +85,12 @@ for line in trustnetwork:
     if (friend, user) not in network:
         network.add((user, friend))
 trustnetwork.close()
+profile.rows(len(network))
 
 
 ### write out everything
 
-if not exists(output_dir):
-    os.mkdir(output_dir)
-
+profile.stage('split')
 train_file = open(join(output_dir, "train.tsv"), 'w+')
 valid_file = open(join(output_dir, "validation.tsv"), 'w+')
 test_file = open(join(output_dir, "test.tsv"), 'w+')
@@ -77,7 +100,7 @@ a = 0
 b = 0
 c = 0
 
-all_users = user_ratings.keys()
+all_users = list(user_ratings.keys())
 random.shuffle(all_users)
 test_users = set(all_users[:Nusers])
 test_items = set()
@@ -125,19 +148,32 @@ for user in user_ratings:
             else:
                 train_file.write("%d\t%d\t%d\n" % (user, item, rating))
                 a += 1
+profile.rows(a + b + c)
 
-
-for user, friend in network:
-    if len(ur[user] & ur[friend]) != 0:
-        network_file.write("%d\t%d\n" % (user, friend))
+profile.stage('cull network')
+users, items = cull.arrays_from_sets(ur)
+user_ids, friend_ids = cull.edge_arrays(network)
+user_ids, friend_ids, overlap = cull.cull_network(users, items,
+    user_ids, friend_ids)
+profile.rows(len(user_ids))
+dataio.write_tsv(network_file, user_ids, friend_ids)
+if args.edge_overlap:
+    overlap_file = open(join(output_dir, "network_overlap.tsv"), 'w+')
+    dataio.write_tsv(overlap_file, user_ids, friend_ids, overlap)
+    overlap_file.close()
 
 
 train_file.close()
 valid_file.close()
 test_file.close()
 network_file.close()
+profile.stage('write')
+idindex.build(output_dir)
+if args.binary:
+    dataio.dir_to_bin(output_dir)
+profile.finish()
 
 total = float(a + b + c)
 print (a/total, b/total, c/total)
 
-print len(test_users), 'x', len(test_items), '=', (len(test_users)*len(test_items))
+print(len(test_users), 'x', len(test_items), '=', (len(test_users)*len(test_items)))
@@ -1,15 +1,49 @@
-import sys
-import scipy.io
-from collections import defaultdict
+import argparse
 import os
 from os.path import join, exists
-import random
+import numpy as np
+import dataio
+import cull
+import idindex
+import profiling
+import split
 
 ### command line args
 
-ratings_file = sys.argv[1]
-network_file = sys.argv[2]
-output_dir = sys.argv[3]
+parser = argparse.ArgumentParser(description='split timestamped ratings ' +
+    'into train, validation, and test sets by time and cull the network')
+parser.add_argument('ratings_file')
+parser.add_argument('network_file')
+parser.add_argument('output_dir')
+parser.add_argument('--windows', type=int, default=1,
+    help='number of rolling train/validation/test windows to write, each ' +
+    'into output_dir/window-NN; the last one is the usual split')
+parser.add_argument('--step', type=float, default=None,
+    help='percent of ratings between consecutive windows (default: the ' +
+    'test percent)')
+parser.add_argument('--streaming', action='store_true',
+    help='partition ratings by user into spill files on disk and split and ' +
+    'cull one bucket at a time (same ratings as the in-memory path); ' +
+    'memory is bounded by the buckets and the network, which is still ' +
+    'read whole')
+parser.add_argument('--tmpdir', default=None,
+    help='directory for --streaming spill files (default: system temp)')
+parser.add_argument('--bucket-rows', type=int, default=5000000,
+    help='approximate ratings per --streaming bucket')
+parser.add_argument('--binary', action='store_true',
+    help='also write binary .bin twins of the output files')
+parser.add_argument('--edge-overlap', action='store_true',
+    help='also write network_overlap.tsv with the number of items each ' +
+    'kept connection has in common')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+ratings_file = args.ratings_file
+network_file = args.network_file
+output_dir = args.output_dir
+if not exists(output_dir):
+    os.mkdir(output_dir)
+profile = profiling.from_args(args, 'process_time_data', output_dir)
 
 splitchar = '\t'
 
@@ -27,26 +61,42 @@ valid /= total
 
 print (train, test, valid)
 
-random.seed(11)
+# window w ends (N-1-w) steps before the end of the data; the last window
+# has no end, every earlier one stops where its test period runs out
+step = test if args.step is None else args.step / 100.0
+windows = []
+for w in range(args.windows):
+    shift = (args.windows - 1 - w) * step
+    if train - shift <= 0:
+        parser.error('%d windows of %.1f%% do not fit in the training data' %
+            (args.windows, step * 100))
+    fractions = [train - shift, train + valid - shift]
+    if shift > 0:
+        fractions.append(train + valid + test - shift)
+    windows.append(fractions)
 
 
 ### read in everything
 
-ratings = open(ratings_file, 'r')
-user_ratings = defaultdict(list)
-ur = defaultdict(set)
-pop = defaultdict(int)
-times = defaultdict(int)
-total = 0
-for line in ratings:
-    user, item, time = [int(x) for x in line.strip().split(splitchar)]
-    user_ratings[user].append((item, time))
-    times[time] += 1
-    ur[user].add(item)
-    pop[item] += 1
-    total += 1
-ratings.close()
-
+profile.stage('read ratings')
+if args.streaming:
+    import stream
+    time_tally = [None, None]
+    def observe(rows):
+        time_tally[:] = stream.tally(rows[:, 2], *time_tally)
+    partition = stream.UserPartition(stream.read_chunks(ratings_file, 3,
+        splitchar), 3, args.tmpdir, args.bucket_rows, observe)
+    distinct_times, time_counts = time_tally
+    iids, pop = partition.iids, partition.item_counts
+    profile.rows(pop.sum())
+else:
+    users, items, times = [c.astype(np.int64) for c in
+        dataio.load(ratings_file, 3)]
+    distinct_times, time_counts = np.unique(times, return_counts=True)
+    iids, pop = np.unique(items, return_counts=True)
+    profile.rows(len(users))
+
+profile.stage('read network')
 trustnetwork = open(network_file, 'r')
 network = set()
 for line in trustnetwork:
@@ -54,80 +104,94 @@ for line in trustnetwork:
     if (friend, user) not in network:
         network.add((user, friend))
 trustnetwork.close()
+profile.rows(len(network))
 
 
-### write out everything
+### time cutoffs for every window, from one cumulative count
 
-if not exists(output_dir):
-    os.mkdir(output_dir)
+cutoffs = [split.time_cutoffs(distinct_times, time_counts, fractions)
+    for fractions in windows]
+for cut in cutoffs:
+    print(*cut)
+
+
+### write out everything
 
-validation_start = 0
-test_start = 0
-cur = 0.0
-for time in sorted(times.keys(),):
-    cur += times[time]
-    if cur / total >= train and validation_start == 0:
-        validation_start = time
-        continue
-    elif cur / total >= train + valid and test_start == 0 and time != validation_start:
-        test_start = time
-        break
-print validation_start, test_start
-train_file = open(join(output_dir, "train.tsv"), 'w+')
-valid_file = open(join(output_dir, "validation.tsv"), 'w+')
-test_file = open(join(output_dir, "test.tsv"), 'w+')
-network_file = open(join(output_dir, "network.tsv"), 'w+')
-
-a = 0
-b = 0
-c = 0
-uinc = set()
-for user in user_ratings:
-    ratings = user_ratings[user]
-    R = len(ratings)
-    for i in range(R):
-        item, time = ratings[i]
-        tr = 0
-        va = 0
-        te = 0
-        if time < validation_start:
-            tr += 1
-        elif time >= validation_start and time < test_start:
-            va += 1
-        else:
-            te += 1
-
-    if tr < 1: # user must have at least one training item
-        print "user %d has no training items" % user
-        continue
-    uinc.add(user)
-
-    for i in range(R):
-        item, time = ratings[i]
-        if pop[item] < 2:
-            continue
-        if time < validation_start:
-            train_file.write("%d\t%d\t1\n" % (user, item))
-            a += 1
-        elif time >= validation_start and time < test_start:
-            valid_file.write("%d\t%d\t1\n" % (user, item))
-            c += 1
-        else:
-            test_file.write("%d\t%d\t1\n" % (user, item))
-            b += 1
-
-for user, friend in network:
-    if user not in uinc or friend not in uinc:
-        continue
-    if len(ur[user] & ur[friend]) != 0:
-        network_file.write("%d\t%d\n" % (user, friend))
-
-
-train_file.close()
-valid_file.close()
-test_file.close()
-network_file.close()
-
-total = float(a + b + c)
-print a, b, c, total
-print (a/total, b/total, c/total)
+profile.stage('split')
+outputs = []
+for w in range(args.windows):
+    out = output_dir if args.windows == 1 else \
+        join(output_dir, 'window-%02d' % w)
+    if not exists(out):
+        os.mkdir(out)
+    outputs.append({
+        'dir': out,
+        'files': [open(join(out, name), 'w+') for name in
+            ("train.tsv", "test.tsv", "validation.tsv")],
+        'counts': [0, 0, 0],
+        'included': []})
+
+if args.streaming:
+    blocks = (rows[np.argsort(rows[:, 0], kind='stable')].T
+        for rows in partition.buckets())
+else:
+    order = np.argsort(users, kind='stable')
+    blocks = [(users[order], items[order], times[order])]
+
+for users, items, times in blocks:
+    uids, inv = np.unique(users, return_inverse=True)
+    eligible = pop[np.searchsorted(iids, items)] >= 2
+    ones = np.ones(len(users), dtype=np.int64)
+    for output, cut in zip(outputs, cutoffs):
+        masks = split.time_split(inv, len(uids), times, eligible, *cut)
+        for s, mask in enumerate(masks[:3]):
+            dataio.write_tsv(output['files'][s], users[mask], items[mask],
+                ones[mask])
+            output['counts'][s] += int(mask.sum())
+        has_train = masks[3]
+        output['included'].append(uids[has_train])
+        if args.windows == 1:
+            for user in uids[~has_train].tolist():
+                print("user %d has no training items" % user)
+
+profile.rows(sum(sum(output['counts']) for output in outputs))
+
+profile.stage('rating matrix')
+if not args.streaming:
+    uids, matrix = cull.rating_matrix(users, items)
+user_ids, friend_ids = cull.edge_arrays(network)
+
+for output in outputs:
+    profile.stage('cull network')
+    for f in output['files']:
+        f.close()
+
+    included = np.concatenate(output['included'])
+    keep = np.isin(user_ids, included) & np.isin(friend_ids, included)
+    if args.streaming:
+        kept_users, kept_friends, overlap = partition.cull_edges(
+            user_ids[keep], friend_ids[keep])
+    else:
+        kept_users, kept_friends, overlap = cull.cull_edges(uids, matrix,
+            user_ids[keep], friend_ids[keep])
+    profile.rows(len(kept_users))
+    network_out = open(join(output['dir'], "network.tsv"), 'w+')
+    dataio.write_tsv(network_out, kept_users, kept_friends)
+    network_out.close()
+    if args.edge_overlap:
+        overlap_file = open(join(output['dir'], "network_overlap.tsv"), 'w+')
+        dataio.write_tsv(overlap_file, kept_users, kept_friends, overlap)
+        overlap_file.close()
+    profile.stage('write')
+    idindex.build(output['dir'])
+    if args.binary:
+        dataio.dir_to_bin(output['dir'])
+
+    a, b, c = output['counts']
+    total = float(a + b + c)
+    print(output['dir'])
+    print(a, b, c, total)
+    print (a/total, b/total, c/total)
+if args.streaming:
+    partition.close()
+profile.finish()
@@ -0,0 +1,138 @@
+import cProfile
+import os
+import pstats
+import resource
+import sys
+import time
+import resources
+
+# functions listed for each stage run under cProfile
+PROFILE_TOP = 20
+
+
+### measuring this process
+
+def _cpu():
+    # user + system seconds of this process and the children it waited for
+    # (e.g. pool workers)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def _reset_peak():
+    # start a fresh resident size high-water mark (Linux 4.0+); returns
+    # whether it could, otherwise peaks are the process's so far
+    try:
+        f = open('/proc/self/clear_refs', 'w')
+        f.write('5')
+        f.close()
+        return True
+    except (IOError, OSError):
+        return False
+
+def _peak_kb():
+    try:
+        for line in open('/proc/self/status'):
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+### named stages of a run
+
+class Profile:
+    # Wall time, CPU time, peak resident size and row counts of the named
+    # stages of a script's run, one after another: stage() ends the
+    # current stage and starts the next, rows() counts rows into the
+    # current one, and finish() ends the last and writes a JSON report.
+    # Disabled (report None), every call does nothing.  With cprofile each
+    # stage also runs under cProfile, its stats saved next to the report
+    # and its slowest functions listed in it.
+
+    def __init__(self, script, report=None, cprofile=False):
+        self.script = script
+        self.report = report
+        self.cprofile = cprofile and report is not None
+        self.stages = []
+        self.current = None
+        self.profiler = None
+        self.start = time.time()
+        self.start_cpu = _cpu()
+
+    def stage(self, name):
+        if self.report is None:
+            return
+        self._end()
+        self.current = {'name': name, 'rows': 0, 'start': time.time(),
+            'cpu': _cpu(), 'peak_is_stage': _reset_peak()}
+        if self.cprofile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def rows(self, n):
+        if self.current is not None:
+            self.current['rows'] += int(n)
+
+    def _end(self):
+        if self.current is None:
+            return
+        if self.profiler is not None:
+            self.profiler.disable()
+        stage = self.current
+        stage['wall'] = time.time() - stage.pop('start')
+        stage['cpu'] = _cpu() - stage['cpu']
+        stage['peak_rss_kb'] = _peak_kb()
+        if self.profiler is not None:
+            stats = '%s.%d.prof' % (os.path.splitext(self.report)[0],
+                len(self.stages))
+            self.profiler.dump_stats(stats)
+            stage['cprofile'] = stats
+            stage['functions'] = _top(self.profiler)
+            self.profiler = None
+        self.stages.append(stage)
+        self.current = None
+
+    def finish(self):
+        # end the last stage and write the report
+        if self.report is None:
+            return
+        self._end()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        resources.write_json(self.report, {'script': self.script,
+            'argv': sys.argv[1:], 'start': self.start,
+            'wall': time.time() - self.start, 'cpu': _cpu() - self.start_cpu,
+            'maxrss_kb': usage.ru_maxrss, 'stages': self.stages})
+
+def _top(profiler):
+    # the PROFILE_TOP functions with the most cumulative time
+    stats = pstats.Stats(profiler)
+    functions = []
+    for (filename, line, name), (calls, primitive, tottime, cumtime,
+            callers) in stats.stats.items():
+        functions.append({'function': '%s:%d(%s)' % (os.path.basename(
+            filename), line, name), 'calls': calls, 'tottime': tottime,
+            'cumtime': cumtime})
+    functions.sort(key=lambda f: -f['cumtime'])
+    return functions[:PROFILE_TOP]
+
+
+### command line
+
+def add_arguments(parser):
+    parser.add_argument('--profile', action='store_true',
+        help='write the time, memory and rows of each stage to a JSON ' +
+        'report')
+    parser.add_argument('--profile-out', default=None, metavar='REPORT',
+        help='the --profile report (default: profile-[script].json in the ' +
+        'output directory)')
+    parser.add_argument('--cprofile', action='store_true',
+        help='with --profile, also run each stage under cProfile')
+
+def from_args(args, script, directory='.'):
+    # the Profile the --profile arguments ask for
+    if not args.profile:
+        return Profile(script)
+    report = args.profile_out or os.path.join(directory, 'profile-%s.json' %
+        script)
+    return Profile(script, report, args.cprofile)
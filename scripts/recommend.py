@@ -0,0 +1,59 @@
+import argparse
+import os
+import numpy as np
+import fit
+import score
+
+### command line args
+
+parser = argparse.ArgumentParser(description='write the top-N unseen ' +
+    'items of each user under a saved SPF fit, scored in blocks of users')
+parser.add_argument('data_dir', help='the split the model was fit on')
+parser.add_argument('fit_dir', help='the directory SPF saved its fit in')
+parser.add_argument('--label', default='final',
+    help='which saved parameters to use: final or an iteration like 0010')
+parser.add_argument('-n', type=int, default=10,
+    help='recommendations per user')
+parser.add_argument('--users', default=None,
+    help='only these users: comma-separated ids, or a file of one id per line')
+parser.add_argument('--batch', type=int, default=score.SCORE_BATCH,
+    help='users scored at a time; memory is about batch x items floats')
+parser.add_argument('--binary', action='store_true',
+    help='the model was fit with --binary (default: as settings.txt says)')
+parser.add_argument('--out', default=None,
+    help='output file (default: fit_dir/recommendations_[label].tsv)')
+args = parser.parse_args()
+
+model = fit.Fit(args.fit_dir, args.label)
+scorer = score.Scorer(model, args.data_dir,
+    args.binary or model.settings['binary'])
+
+rows = None
+if args.users is not None:
+    if os.path.exists(args.users):
+        ids = np.loadtxt(args.users, dtype=np.int64, ndmin=1)
+    else:
+        ids = np.array([int(u) for u in args.users.split(',')], dtype=np.int64)
+    rows = scorer.users.lookup(ids)
+    if (rows < 0).any():
+        print("skipping %d users not in the training data" % (rows < 0).sum())
+    rows = rows[rows >= 0]
+
+### write the recommendations
+
+out = args.out
+if out is None:
+    out = os.path.join(args.fit_dir, 'recommendations_%s.tsv' % args.label)
+f = open(out, 'w+')
+f.write("user.id\titem.id\tscore\trank\n")
+for block_rows, items, scores in scorer.recommend(args.n, rows, args.batch):
+    keep = items >= 0
+    ranks = np.tile(np.arange(1, items.shape[1] + 1), (len(block_rows), 1))
+    user_ids = np.repeat(scorer.users.original(block_rows), items.shape[1])
+    user_ids = user_ids.reshape(items.shape)[keep]
+    item_ids = scorer.items.original(items[keep])
+    if len(user_ids):
+        f.write(("%d\t%d\t%f\t%d\n" * len(user_ids)) % tuple(np.column_stack(
+            (user_ids, item_ids, scores[keep], ranks[keep])).astype(object)
+            .ravel().tolist()))
+f.close()
@@ -0,0 +1,150 @@
+import csv
+import glob
+import json
+import os
+import select
+import subprocess
+import time
+
+# seconds between samples of a running command's processes
+SAMPLE_INTERVAL = 0.5
+
+# rusage counts block I/O in 512 byte units
+BLOCK_BYTES = 512
+
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+
+# what is measured for a command, in record order:
+#   wall, user, sys       seconds
+#   maxrss_kb             largest resident size of any one process (rusage)
+#   peak_rss_kb           largest sampled total over the process tree
+#   read_bytes,
+#   write_bytes           bytes read from and written to storage (rusage)
+#   rchar, wchar          bytes passed through read and write calls, cache
+#                         hits included (sampled from /proc/<pid>/io)
+FIELDS = ('wall', 'user', 'sys', 'maxrss_kb', 'peak_rss_kb', 'read_bytes',
+    'write_bytes', 'rchar', 'wchar')
+
+# fields that take the largest value, rather than the sum, across commands
+PEAK_FIELDS = ('maxrss_kb', 'peak_rss_kb')
+
+
+### usage of a command
+
+def empty():
+    return dict((field, 0) for field in FIELDS)
+
+def add(total, usage):
+    # usage of one more command (run after the others) folded into total
+    for field in FIELDS:
+        if field in PEAK_FIELDS:
+            total[field] = max(total[field], usage[field])
+        else:
+            total[field] += usage[field]
+    return total
+
+def _children(pid):
+    pids = []
+    for task in glob.glob('/proc/%d/task/*/children' % pid):
+        try:
+            pids.extend(int(p) for p in open(task).read().split())
+        except (IOError, ValueError):
+            pass
+    return pids
+
+def _tree(pid):
+    pids = [pid]
+    for p in pids:
+        pids.extend(_children(p))
+    return pids
+
+def _sample(pid, io):
+    # resident KB of the process tree under pid; the latest cumulative I/O
+    # counters of every process in it are kept in io
+    rss = 0
+    for p in _tree(pid):
+        try:
+            rss += int(open('/proc/%d/statm' % p).read().split()[1]) * PAGE_KB
+            counters = dict(line.split(': ') for line in
+                open('/proc/%d/io' % p).read().splitlines())
+            io[p] = (int(counters['rchar']), int(counters['wchar']))
+        except (IOError, OSError, ValueError, KeyError, IndexError):
+            pass
+    return rss
+
+def run(command, cwd=None, env=None, stdout=None, stderr=None,
+        interval=SAMPLE_INTERVAL):
+    # run command to completion; returns (exit code, usage).  CPU time, the
+    # largest process and storage I/O come from wait4, which covers every
+    # descendant the command waited for; the tree's total resident size and
+    # its read/write call bytes are sampled from /proc every interval
+    # seconds, and once more when the command exits (so processes that live
+    # shorter than an interval are only partly counted)
+    start = time.time()
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=stdout,
+        stderr=stderr)
+    io = {}
+    peak = 0
+    # a pidfd becomes readable when the process exits, so the wait between
+    # samples ends right then
+    try:
+        pidfd = os.pidfd_open(process.pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    # sample often at first, so short commands are not held up
+    pause = min(0.01, interval)
+    while True:
+        # WNOWAIT leaves the exited process to be sampled one last time
+        exited = os.waitid(os.P_PID, process.pid,
+            os.WEXITED | os.WNOHANG | os.WNOWAIT)
+        peak = max(peak, _sample(process.pid, io))
+        if exited is not None:
+            break
+        if pidfd is None:
+            time.sleep(pause)
+        else:
+            select.select([pidfd], [], [], pause)
+        pause = min(pause * 2, interval)
+    end = time.time()
+    if pidfd is not None:
+        os.close(pidfd)
+    pid, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    usage = {'wall': end - start, 'user': rusage.ru_utime,
+        'sys': rusage.ru_stime, 'maxrss_kb': rusage.ru_maxrss,
+        'peak_rss_kb': max(peak, rusage.ru_maxrss),
+        'read_bytes': rusage.ru_inblock * BLOCK_BYTES,
+        'write_bytes': rusage.ru_oublock * BLOCK_BYTES,
+        'rchar': sum(r for r, w in io.values()),
+        'wchar': sum(w for r, w in io.values())}
+    return process.returncode, usage
+
+
+### records
+
+def write_json(filename, record):
+    f = open(filename, 'w')
+    json.dump(record, f, sort_keys=True)
+    f.write('\n')
+    f.close()
+
+def read_json(filename):
+    f = open(filename, 'r')
+    record = json.load(f)
+    f.close()
+    return record
+
+def read_records(path):
+    # job name -> record, from the jobs.csv study.py writes and the
+    # [job].resources.json files measure.py writes in path (the json ones
+    # win for a job in both)
+    records = {}
+    table = os.path.join(path, 'jobs.csv')
+    if os.path.exists(table):
+        for row in csv.DictReader(open(table)):
+            records[row['job']] = row
+    for filename in glob.glob(os.path.join(path, '*.resources.json')):
+        record = read_json(filename)
+        records[record.get('job', os.path.basename(filename)[:-len(
+            '.resources.json')])] = record
+    return records
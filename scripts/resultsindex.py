@@ -0,0 +1,250 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# threads listing directories and reading summaries at once (the work is
+# mostly waiting on the file system)
+SCAN_THREADS = 16
+
+# the index file, kept in the directory it indexes unless given elsewhere
+INDEX_NAME = '.results.sqlite'
+
+# the directory layouts that can be indexed:
+#   study  [study]/[model]/eval_summary_final.dat (K given by the caller) and
+#          [study]/[K]/[model]/eval_summary_final.dat
+#   amp    [fits]/[amp level]/[model]/summary_eval.dat
+STUDY = 'study'
+AMP = 'amp'
+LAYOUTS = (STUDY, AMP)
+
+SCHEMA = '''
+create table if not exists files (path text primary key, mtime_ns integer,
+    size integer, model text, k integer, amp text);
+create table if not exists results (path text, line integer, model text,
+    k integer, amp text, metric text, value text);
+create index if not exists results_path on results (path);
+create index if not exists results_key on results (model, k, amp, metric);
+'''
+
+
+### finding and reading summaries
+
+def _entries(path):
+    # (name, is directory) of path's entries, sorted; none if unreadable
+    try:
+        entries = [(e.name, e.is_dir()) for e in os.scandir(path)]
+    except OSError:
+        return []
+    return sorted(entries)
+
+def _stat(filename):
+    try:
+        return os.stat(filename)
+    except OSError:
+        return None
+
+def _study_dir(root, name):
+    # summaries under one directory of a study, as (path relative to root,
+    # stat, model, k, amp): its own, and its models' when it is named
+    # after a K
+    found = []
+    for entry, is_dir in _entries(os.path.join(root, name)):
+        if is_dir and name.isdigit():
+            path = os.path.join(name, entry, 'eval_summary_final.dat')
+            model, k = entry, int(name)
+        elif not is_dir and entry == 'eval_summary_final.dat':
+            path = os.path.join(name, entry)
+            model, k = name, None
+        else:
+            continue
+        stat = _stat(os.path.join(root, path))
+        if stat is not None:
+            found.append((path, stat, model, k, None))
+    return found, []
+
+def _amp_dir(root, name):
+    # summaries of the models fit at one amplification level, and the
+    # model directories that have none
+    found, missing = [], []
+    for entry, is_dir in _entries(os.path.join(root, name)):
+        if not is_dir:
+            continue
+        path = os.path.join(name, entry, 'summary_eval.dat')
+        stat = _stat(os.path.join(root, path))
+        if stat is None:
+            missing.append((name, entry))
+        else:
+            found.append((path, stat, entry, None, name))
+    return found, missing
+
+def _study_rows(filename):
+    # (metric, value) of an eval_summary_final.dat: a header line, then
+    # the metric and its user average first on each line
+    rows = []
+    for line in open(filename).readlines()[1:]:
+        tokens = line.rstrip('\n').split('\t')
+        rows.append((tokens[0], tokens[1]))
+    return rows
+
+def _amp_rows(filename):
+    # (metric, value) of a summary_eval.dat, one tab-separated pair a line
+    rows = []
+    for line in open(filename):
+        metric, value = line.strip().split('\t')
+        rows.append((metric, value))
+    return rows
+
+
+### the index
+
+class ResultsIndex:
+    # The summaries under a study or amplification directory, parsed into
+    # an SQLite table of (model, K, amp level, metric, value) rows.  Each
+    # summary's path, mtime and size are kept with its rows, so update()
+    # only reads the summaries that changed (or are new) since the last
+    # one and drops those that are gone.  Paths are kept relative to the
+    # directory, so the index still holds if it is mounted elsewhere.
+    # Values are kept as the text the summary had, so exports match the
+    # files exactly.
+
+    def __init__(self, root, layout=STUDY, k=None, filename=None,
+                 threads=SCAN_THREADS):
+        if layout not in LAYOUTS:
+            raise ValueError("unknown layout %r" % layout)
+        self.root = root
+        self.layout = layout
+        # the K of summaries directly under a study's model directories
+        self.k = k
+        self.threads = threads
+        self.missing = []
+        if filename is None:
+            filename = os.path.join(root, INDEX_NAME)
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def scan(self):
+        # every summary under root as (path relative to root, stat, model,
+        # k, amp), sorted by path; the top-level directories are listed in
+        # parallel
+        if self.layout == STUDY:
+            scan_dir = _study_dir
+        else:
+            scan_dir = _amp_dir
+        names = [name for name, is_dir in _entries(self.root) if is_dir]
+        found, self.missing = [], []
+        pool = ThreadPoolExecutor(max(self.threads, 1))
+        for summaries, missing in pool.map(lambda name: scan_dir(self.root,
+                name), names):
+            found.extend(summaries)
+            self.missing.extend(missing)
+        pool.shutdown()
+        return sorted(found, key=lambda f: f[0])
+
+    def update(self):
+        # bring the index up to date with the files; returns the number of
+        # summaries found, re-read and dropped
+        parse = _study_rows if self.layout == STUDY else _amp_rows
+        found = self.scan()
+        known = dict((path, (mtime, size)) for path, mtime, size in
+            self.db.execute('select path, mtime_ns, size from files'))
+        changed = [f for f in found if known.get(f[0]) !=
+            (f[1].st_mtime_ns, f[1].st_size)]
+        gone = set(known) - set(f[0] for f in found)
+
+        pool = ThreadPoolExecutor(max(self.threads, 1))
+        parsed = list(pool.map(lambda f: parse(os.path.join(self.root, f[0])),
+            changed))
+        pool.shutdown()
+
+        with self.db:
+            for path in list(gone) + [f[0] for f in changed]:
+                self.db.execute('delete from files where path = ?', (path,))
+                self.db.execute('delete from results where path = ?',
+                    (path,))
+            for (path, stat, model, k, amp), rows in zip(changed, parsed):
+                self.db.execute('insert into files values (?, ?, ?, ?, ?, ?)',
+                    (path, stat.st_mtime_ns, stat.st_size, model, k, amp))
+                self.db.executemany('insert into results values ' +
+                    '(?, ?, ?, ?, ?, ?, ?)', [(path, line, model, k, amp,
+                    metric, value) for line, (metric, value) in
+                    enumerate(rows)])
+        return len(found), len(changed), len(gone)
+
+    def rows(self, model=None, k=None, amp=None, metric=None):
+        # (path, model, k, amp, metric, value text) rows matching the given
+        # keys, in path and file order
+        query = 'select path, model, coalesce(k, ?), amp, metric, value ' + \
+            'from results'
+        params = [self.k]
+        conditions = []
+        for column, value in (('model', model), ('k', k), ('amp', amp),
+                              ('metric', metric)):
+            if value is None:
+                continue
+            if column == 'k':
+                conditions.append('coalesce(k, ?) = ?')
+                params.append(self.k)
+            else:
+                conditions.append('%s = ?' % column)
+            params.append(value)
+        if conditions:
+            query += ' where ' + ' and '.join(conditions)
+        return self.db.execute(query + ' order by path, line', params)
+
+    def query(self, model=None, k=None, amp=None, metric=None):
+        # the matching results as a structured array with fields model, k
+        # (-1 if unknown), amp, metric and value (NaN if not a number)
+        rows = [(model, -1 if k is None else k, amp or '', metric,
+            _number(value)) for path, model, k, amp, metric, value in
+            self.rows(model, k, amp, metric)]
+        width = lambda i: max([len(row[i]) for row in rows] + [1])
+        dtype = [('model', 'U%d' % width(0)), ('k', np.int64),
+            ('amp', 'U%d' % width(2)), ('metric', 'U%d' % width(3)),
+            ('value', np.float64)]
+        return np.array(rows, dtype=dtype)
+
+    def models(self):
+        return [row[0] for row in self.db.execute(
+            'select distinct model from files order by model')]
+
+    def metrics(self):
+        return [row[0] for row in self.db.execute(
+            'select distinct metric from results order by metric')]
+
+
+    ### the CSV layouts of aggregate_results.py and aggregate_amp_results.py
+
+    def write_study_csv(self, fout, extra=None):
+        # model,k,metric,value lines after a header; extra(path, model), if
+        # given, supplies more (metric, value) rows after each summary's
+        fout.write("model,k,metric,value\n")
+        current = None
+        for path, model, k, amp, metric, value in self.rows():
+            if current is not None and path != current[0] and extra:
+                _write_extra(fout, current, extra)
+            current = (path, model, k)
+            fout.write("%s,%d,%s,%s\n" % (model, k, metric, value))
+        if current is not None and extra:
+            _write_extra(fout, current, extra)
+
+    def write_amp_csv(self, fout):
+        # amp level,model,metric,value lines, by level and model
+        for path, model, k, amp, metric, value in self.db.execute(
+                'select path, model, k, amp, metric, value from results ' +
+                'order by amp, model, line'):
+            fout.write("%s,%s,%s,%s\n" % (amp, model, metric, value))
+
+def _write_extra(fout, summary, extra):
+    path, model, k = summary
+    for metric, value in extra(path, model):
+        fout.write("%s,%d,%s,%s\n" % (model, k, metric, value))
+
+def _number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
@@ -0,0 +1,98 @@
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+### command line args
+
+parser = argparse.ArgumentParser(description='fit one LibRec model on ' +
+    'every test chunk of a data directory, handing each chunk\'s ' +
+    'predictions to model-dir/prediction-NN.txt (see ingest_librec.py)')
+parser.add_argument('data_dir')
+parser.add_argument('model_dir')
+parser.add_argument('model', help='LibRec recommender, e.g. SoRec')
+parser.add_argument('K', type=int)
+parser.add_argument('--iter', type=int, default=100)
+parser.add_argument('--threads', type=int, default=None,
+    help='processors the JVM may use (default: all)')
+parser.add_argument('--src', default=os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'src'),
+    help='the src directory, where setup.sh unpacked LibRec')
+args = parser.parse_args()
+
+data_dir = os.path.abspath(args.data_dir)
+model_dir = os.path.abspath(args.model_dir)
+jar = os.path.join(os.path.abspath(args.src), 'librec', 'librec.jar')
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'conf',
+    'base.conf')
+
+# each model gets its own configuration and Results directory, so several
+# can fit at once
+work = os.path.join(model_dir, 'work')
+if not os.path.exists(work):
+    os.makedirs(work)
+conf = os.path.join(model_dir, 'librec.conf')
+
+if args.model == 'TrustSVD':
+    social, rate = '0.5', '0.001'
+else:
+    social, rate = '1.0', '0.01'
+
+java = ['java']
+if args.threads is not None:
+    java.append('-XX:ActiveProcessorCount=%d' % args.threads)
+
+def hand_over(testidx, predictions):
+    # give model_dir the chunk's predictions under their final name only
+    # once they are complete (an empty file if the fit wrote none)
+    tmp = os.path.join(model_dir, 'prediction-%s.tmp' % testidx)
+    if predictions:
+        shutil.move(predictions[0], tmp)
+    else:
+        open(tmp, 'w').close()
+    os.rename(tmp, os.path.join(model_dir, 'prediction-%s.txt' % testidx))
+
+tests = sorted(glob.glob(os.path.join(data_dir, 'test-*.dat')))
+failed = 0
+try:
+    for n in range(1, len(tests) + 1):
+        testidx = '%02d' % n
+        print("%s\t(test section %s)" % (args.model, testidx))
+        sys.stdout.flush()
+        f = open(conf, 'w')
+        f.write("dataset.training.lins=%s/ratings.dat\n" % data_dir)
+        f.write("dataset.social.lins=%s/network.dat\n" % data_dir)
+        f.write("dataset.testing.lins=%s/test-%s.dat\n" % (data_dir,
+            testidx))
+        f.write("recommender=%s\n" % args.model)
+        f.write("num.factors=%d\n" % args.K)
+        f.write("num.max.iter=%d\n" % args.iter)
+        f.write("val.reg.social=%s\n" % social)
+        f.write("val.learn.rate=%s\n" % rate)
+        f.write(open(base).read())
+        f.close()
+
+        for old in glob.glob(os.path.join(work, 'Results',
+                                          '*prediction.txt')):
+            os.remove(old)
+        try:
+            if subprocess.call(java + ['-jar', jar, '-c', conf],
+                               cwd=work) != 0:
+                failed += 1
+        except OSError as e:
+            print("could not run LibRec: %s" % e)
+            failed += 1
+
+        hand_over(testidx, sorted(glob.glob(os.path.join(work, 'Results',
+            args.model + '*prediction.txt'))))
+finally:
+    # whatever happens, every chunk gets a file, so the ingester waiting on
+    # them finishes
+    for n in range(1, len(tests) + 1):
+        if not os.path.exists(os.path.join(model_dir,
+                                           'prediction-%02d.txt' % n)):
+            hand_over('%02d' % n, [])
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,128 @@
+from random import randint, randrange
+import numpy as np
+
+
+### dynamic weighted sampling
+
+class WeightedSampler:
+    # Draws keys with probability proportional to their integer weights and
+    # lets drawn keys be removed, both in O(log n), using a Fenwick tree over
+    # the weights in the order the keys were given.  A draw takes
+    # randint(1, total) and returns the first key whose running weight reaches
+    # it, exactly what a linear walk over an insertion-ordered dict of weights
+    # does, so swapping one for the other keeps the same picks for the same
+    # random state.
+
+    def __init__(self, weights):
+        # weights: {key: positive int}, e.g. a defaultdict(int) of counts
+        self.keys = list(weights)
+        self.index = dict((key, i) for i, key in enumerate(self.keys))
+        self.weights = [weights[key] for key in self.keys]
+        self.total = sum(self.weights)
+        self.count = len(self.keys)
+
+        # build the tree in O(n): each node pushes its sum to its parent
+        n = len(self.keys)
+        self.tree = [0] + self.weights
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self.tree[parent] += self.tree[i]
+        self.top = 1
+        while self.top * 2 <= n:
+            self.top *= 2
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        i = self.index.get(key)
+        return i is not None and self.weights[i] > 0
+
+    def _add(self, i, delta):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, value):
+        # the first key whose running weight is >= value, 1 <= value <= total
+        pos = 0
+        step = self.top
+        while step:
+            nxt = pos + step
+            if nxt < len(self.tree) and self.tree[nxt] < value:
+                pos = nxt
+                value -= self.tree[nxt]
+            step >>= 1
+        return self.keys[pos]
+
+    def pick(self):
+        return self.find(randint(1, self.total))
+
+    def remove(self, key):
+        i = self.index[key]
+        weight = self.weights[i]
+        if weight == 0:
+            return
+        self._add(i, -weight)
+        self.weights[i] = 0
+        self.total -= weight
+        self.count -= 1
+
+
+### uniform sampling from a catalog minus a few excluded items
+
+class ItemPicker:
+    # Draws items uniformly from a fixed catalog, skipping excluded ones, by
+    # rejection: draw a catalog position and retry if it is excluded.  The
+    # exclusions live in a bitmap over the catalog that is cleared position
+    # by position, so resetting it for the next user costs as much as that
+    # user's exclusions, not the catalog size.  Once fewer than one in
+    # DENSE_RETRIES items is still allowed, draws come from the allowed
+    # positions directly instead.
+
+    DENSE_RETRIES = 16
+
+    def __init__(self, items):
+        self.items = np.unique(np.fromiter(items, dtype=np.int64))
+        self.excluded = np.zeros(len(self.items), dtype=bool)
+        self.marked = []
+        self.nexcluded = 0
+
+    def __len__(self):
+        return len(self.items) - self.nexcluded
+
+    def reset(self):
+        for pos in self.marked:
+            self.excluded[pos] = False
+        self.marked = []
+        self.nexcluded = 0
+
+    def exclude(self, items):
+        # items outside the catalog are ignored
+        items = np.fromiter(items, dtype=np.int64)
+        pos = np.searchsorted(self.items, items)
+        inside = pos < len(self.items)
+        pos, items = pos[inside], items[inside]
+        pos = np.unique(pos[self.items[pos] == items])
+        pos = pos[~self.excluded[pos]]
+        self.excluded[pos] = True
+        self.marked.append(pos)
+        self.nexcluded += len(pos)
+
+    def pick(self):
+        # a uniformly drawn allowed item, which is then excluded
+        n = len(self.items)
+        if len(self) * self.DENSE_RETRIES >= n:
+            while True:
+                pos = randrange(n)
+                if not self.excluded[pos]:
+                    break
+        else:
+            allowed = np.flatnonzero(~self.excluded)
+            pos = allowed[randrange(len(allowed))]
+        self.excluded[pos] = True
+        self.marked.append(pos)
+        self.nexcluded += 1
+        return int(self.items[pos])
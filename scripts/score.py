@@ -0,0 +1,165 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+import dataio
+import idindex
+
+# users scored per block; a block holds a users x items dense score matrix
+SCORE_BATCH = 1000
+
+# added to every score of a social-only fit, as SPF::predict does, so items
+# no friend has rated still rank above the masked ones
+SOCIAL_ONLY_OFFSET = 1e-10
+
+
+### training data as sparse matrices
+
+def ratings_matrix(path, name, user_index, item_index, binary=False):
+    # CSR users x items matrix of the nonzero ratings in path/name.tsv whose
+    # user and item are in the indexes; a pair listed twice keeps its last
+    # rating
+    users, items, ratings = dataio.load('%s/%s.tsv' % (path, name), 3)
+    rows = user_index.lookup(users)
+    cols = item_index.lookup(items)
+    ratings = np.asarray(ratings, dtype=np.float32)
+    keep = (rows >= 0) & (cols >= 0) & (ratings != 0)
+    rows, cols, ratings = rows[keep], cols[keep], ratings[keep]
+    if binary:
+        ratings = np.ones(len(ratings), dtype=np.float32)
+    keys = rows * max(len(item_index), 1) + cols
+    last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+    return sp.csr_matrix((ratings[last], (rows[last], cols[last])),
+        shape=(len(user_index), len(item_index)))
+
+def network_matrix(path, user_index, directed=False):
+    # binary CSR users x users matrix of path/network.tsv as src/data.cpp
+    # reads it: row u holds u's neighbors (both ways round unless directed)
+    # among the users in the index
+    users, friends = dataio.load('%s/network.tsv' % path, 2)
+    rows = user_index.lookup(users)
+    cols = user_index.lookup(friends)
+    keep = (rows >= 0) & (cols >= 0)
+    rows, cols = rows[keep], cols[keep]
+    if not directed:
+        rows, cols = np.concatenate((rows, cols)), np.concatenate((cols, rows))
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.float32),
+        (rows, cols)), shape=(len(user_index), len(user_index)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+def _pad(matrix, n):
+    # a square CSR matrix grown to n x n; a social-only fit's tau stops at
+    # the last user with a neighbor
+    if matrix.shape[0] >= n:
+        return matrix
+    indptr = np.concatenate((matrix.indptr,
+        np.full(n - matrix.shape[0], matrix.indptr[-1])))
+    return sp.csr_matrix((matrix.data, matrix.indices, indptr), shape=(n, n))
+
+
+### ranking
+
+def top_items(block, seen, n):
+    # the n best items of each row of a dense score block and their scores,
+    # best first, leaving out the items of the matching row of the sparse
+    # matrix seen; rows with fewer than n such items are padded with item -1
+    # and score -inf
+    block[np.repeat(np.arange(block.shape[0]), np.diff(seen.indptr)),
+        seen.indices] = -np.inf
+    n = min(n, block.shape[1])
+    if n == 0:
+        return np.zeros((block.shape[0], 0), np.int64), \
+            np.zeros((block.shape[0], 0), np.float32)
+    if n < block.shape[1]:
+        best = np.argpartition(-block, n - 1, axis=1)[:, :n]
+    else:
+        best = np.tile(np.arange(n), (block.shape[0], 1))
+    best.sort(axis=1)
+    best_scores = np.take_along_axis(block, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best[np.isneginf(best_scores)] = -1
+    return best, best_scores
+
+
+### scoring
+
+class Scorer:
+    # SPF scores for blocks of users at once: theta . beta plus the social
+    # term (each friend's training ratings weighted by their tau), plus the
+    # item bias, as SPF::predict computes one pair at a time; train and
+    # validation pairs are the "seen" items left out of recommendations,
+    # as in eval().  A social fit with fix_influence saves no tau, and
+    # SPF::predict weighs every friend by 1 then, so tau is the network
+
+    def __init__(self, fit, path, binary=False):
+        self.fit = fit
+        self.users, self.items = idindex.load(path)
+        self._check(fit.user_ids, self.users, 'user')
+        self._check(fit.item_ids, self.items, 'item')
+        self.tau = None
+        settings = fit.settings
+        if fit.tau is not None:
+            self.tau = _pad(fit.tau, len(self.users))
+        elif settings['model'] in ('spf', 'sf'):
+            # a social fit without a tau file: --fix_influence
+            network = path + '/network.tsv'
+            if not (os.path.exists(network) or dataio.fresh_bin(network)):
+                raise ValueError('%s: the fit has fixed influence but there '
+                    'is no network.tsv' % path)
+            self.tau = network_matrix(path, self.users, settings['directed'])
+        self.ratings = ratings_matrix(path, 'train', self.users, self.items,
+            binary)
+        seen = self.ratings.copy()
+        validation = path + '/validation.tsv'
+        if os.path.exists(validation) or dataio.fresh_bin(validation):
+            seen = seen + ratings_matrix(path, 'validation', self.users,
+                self.items, binary)
+        self.seen = seen.tocsr()
+        self.seen.sum_duplicates()
+
+    def _check(self, fit_ids, index, what):
+        # the fit numbers users and items as its train.tsv did; a fit of
+        # another split cannot be scored against this one
+        if fit_ids is None:
+            return
+        if len(fit_ids) > len(index):
+            raise ValueError('fit has %d %ss, the data %d' % (len(fit_ids),
+                what, len(index)))
+        known = fit_ids >= 0
+        if not np.array_equal(fit_ids[known], index.ids[:len(fit_ids)][known]):
+            raise ValueError('fit %s ids do not match the data' % what)
+
+    def scores(self, rows):
+        # dense len(rows) x items float32 scores for the given user indexes
+        rows = np.asarray(rows, dtype=np.int64)
+        fit = self.fit
+        block = np.zeros((len(rows), len(self.items)), dtype=np.float32)
+        if fit.theta is not None:
+            block += np.asarray(fit.theta[rows]) @ np.asarray(fit.beta).T
+        else:
+            block += SOCIAL_ONLY_OFFSET
+        if self.tau is not None:
+            block += (self.tau[rows] @ self.ratings).toarray()
+        if fit.delta is not None:
+            block += np.asarray(fit.delta)[np.newaxis, :]
+        return block
+
+    def top(self, rows, n):
+        # the n best unseen items of each user and their scores, best first
+        # (see top_items)
+        rows = np.asarray(rows, dtype=np.int64)
+        return top_items(self.scores(rows), self.seen[rows], n)
+
+    def recommend(self, n=10, rows=None, batch=SCORE_BATCH):
+        # (rows, items, scores) blocks of top-n recommendations for the given
+        # user indexes (default: every user), batch users at a time
+        if rows is None:
+            rows = np.arange(len(self.users))
+        rows = np.asarray(rows, dtype=np.int64)
+        for start in range(0, len(rows), batch):
+            block_rows = rows[start:start + batch]
+            items, scores = self.top(block_rows, n)
+            yield block_rows, items, scores
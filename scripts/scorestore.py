@@ -0,0 +1,98 @@
+import glob
+import itertools
+import os
+import numpy as np
+import scipy.sparse as sp
+
+# prediction lines parsed at a time
+PREDICTION_CHUNK = 200000
+
+
+### LibRec predictions
+
+def read_predictions(filename, user_index, item_index, header=True):
+    # (user index, item index, prediction) arrays from a LibRec prediction
+    # file (a header line, then user, item, rating and prediction by
+    # original id, space separated); pairs outside the indexes are dropped
+    f = open(filename, 'r')
+    if header:
+        f.readline()
+    users, items, preds = [], [], []
+    while True:
+        lines = list(itertools.islice(f, PREDICTION_CHUNK))
+        if not lines:
+            break
+        table = np.loadtxt(lines, ndmin=2)
+        users.append(user_index.lookup(table[:, 0].astype(np.int64)))
+        items.append(item_index.lookup(table[:, 1].astype(np.int64)))
+        preds.append(table[:, 3].astype(np.float32))
+    f.close()
+    if not users:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), \
+            np.zeros(0, np.float32)
+    users, items, preds = [np.concatenate(c) for c in (users, items, preds)]
+    keep = (users >= 0) & (items >= 0)
+    return users[keep], items[keep], preds[keep]
+
+
+### the store
+
+class ScoreStore:
+    # Predicted scores kept as binary chunks in a directory, one chunk per
+    # prediction file, keyed by the split's user and item indexes (see
+    # idindex.py): the rows, columns and float32 values of each chunk as
+    # .npy files, sorted by (user, item) with repeated pairs keeping the
+    # last prediction.  Chunks are written to a temporary name and renamed,
+    # so a chunk that exists is complete.
+
+    def __init__(self, path, nusers, nitems):
+        self.path = path
+        self.shape = (nusers, nitems)
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def _file(self, name, part):
+        return os.path.join(self.path, '%s.%s.npy' % (name, part))
+
+    def has(self, name):
+        return os.path.exists(self._file(name, 'values'))
+
+    def names(self):
+        return sorted(os.path.basename(f)[:-len('.values.npy')]
+            for f in glob.glob(self._file('*', 'values')))
+
+    def add(self, name, rows, cols, values):
+        keys = rows * max(self.shape[1], 1) + cols
+        last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+        arrays = (('rows', rows[last].astype(np.int32)),
+            ('cols', cols[last].astype(np.int32)),
+            ('values', np.asarray(values[last], dtype=np.float32)))
+        # values last: its presence marks the chunk complete
+        for part, array in arrays:
+            tmp = self._file(name, part) + '.tmp'
+            f = open(tmp, 'wb')
+            np.save(f, array)
+            f.close()
+            os.rename(tmp, self._file(name, part))
+
+    def chunk(self, name, mmap=True):
+        # the chunk as a users x items CSR matrix
+        mode = 'r' if mmap else None
+        rows, cols, values = [np.load(self._file(name, part), mmap_mode=mode)
+            for part in ('rows', 'cols', 'values')]
+        return sp.csr_matrix((values, (rows, cols)), shape=self.shape)
+
+    def matrix(self, names=None):
+        # every chunk (or the named ones) as one CSR matrix; a pair in two
+        # chunks keeps the later one's prediction
+        names = self.names() if names is None else names
+        if not names:
+            return sp.csr_matrix(self.shape, dtype=np.float32)
+        parts = [self.chunk(name).tocoo() for name in names]
+        rows = np.concatenate([p.row for p in parts]).astype(np.int64)
+        cols = np.concatenate([p.col for p in parts]).astype(np.int64)
+        values = np.concatenate([p.data for p in parts])
+        keys = rows * max(self.shape[1], 1) + cols
+        last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+        return sp.csr_matrix((values[last], (rows[last], cols[last])),
+            shape=self.shape)
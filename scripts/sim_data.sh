@@ -1,17 +1,6 @@
 data=$1
 #thresh=$2
 
-mkdir $1/amp
-for ((i=0; i <= 100 ; i=i+10)); do
-    mkdir $1/amp/$i
-    echo "(de)amp $i"
-    python adjust_amplification.py $1 $1/amp/$i $i
-    #if [ $i -lt $thresh ]; then
-    #    echo "deamp $i"
-    #    python deamplify_data.py $1 $1/amp/$i $i
-    #else
-    #    echo "amp $i"
-    #    python amplify_data.py $1 $1/amp/$i $i
-    #fi 
-    ln -s $1/network.tsv $1/amp/$i/network.tsv
-done
+# all levels 0..100 step 10 from one read of the data; writes $1/amp/<pct>
+# with network.tsv linked in
+python sweep_amplification.py $1 --levels 0,10,20,30,40,50,60,70,80,90,100
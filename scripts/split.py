@@ -0,0 +1,225 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+import dataio
+
+TRAIN = 0
+TEST = 1
+VALID = 2
+
+
+### split math
+
+def split_fractions(train=89, test=10, valid=1):
+    total = float(train + test + valid)
+    return train / total, test / total, valid / total
+
+
+### counter-based randomness
+# every random draw is a hash of (seed, user, position, stream), so a user's
+# split depends only on the seed and that user's own ratings (in input order),
+# never on how many other users were processed before it
+
+_GOLDEN = np.uint64(0x9e3779b97f4a7c15)
+_MIX1 = np.uint64(0xbf58476d1ce4e5b9)
+_MIX2 = np.uint64(0x94d049bb133111eb)
+
+def _mix(x):
+    # splitmix64 finalizer
+    x = x ^ (x >> np.uint64(30))
+    x = x * _MIX1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _MIX2
+    return x ^ (x >> np.uint64(31))
+
+def uniform(seed, users, positions, stream=0):
+    with np.errstate(over='ignore'):
+        key = _mix(np.asarray(users, dtype=np.int64).astype(np.uint64)
+            ^ _mix(np.uint64(seed) + _GOLDEN * np.uint64(stream + 1)))
+        key = _mix(key + np.asarray(positions).astype(np.uint64) * _GOLDEN)
+    return (key >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+### grouping
+
+def group_by_user(users):
+    # stable order grouping rows by user, plus group starts and sizes
+    order = np.argsort(users, kind='stable')
+    uniq, starts, counts = np.unique(users[order], return_index=True,
+        return_counts=True)
+    return order, starts, counts
+
+def positions_in_group(starts, counts):
+    n = int(counts.sum())
+    return np.arange(n, dtype=np.int64) - np.repeat(starts, counts)
+
+
+### per-user train/test/validation assignment
+
+def assign(users, test, valid, seed):
+    # returns (order, split): `order` groups rows by user with each user's
+    # rows shuffled, and split[j] says where row order[j] goes
+    grouped, starts, counts = group_by_user(users)
+    pos = np.empty(len(users), dtype=np.int64)
+    pos[grouped] = positions_in_group(starts, counts)
+
+    keys = uniform(seed, users, pos)
+    order = np.lexsort((keys, users))
+
+    i = positions_in_group(starts, counts)
+    R = np.repeat(counts, counts).astype(np.float64)
+    r = i.astype(np.float64)
+
+    # the stochastic boundary rule: the row straddling a cutoff lands on
+    # either side of it at random
+    test_cut = test * R
+    valid_cut = (test + valid) * R
+    jitter = ((r < test_cut) & ~(r + 1 < test_cut)) | \
+        ((r < valid_cut) & ~(r + 1 < valid_cut))
+    r[jitter] += uniform(seed, users[order][jitter], i[jitter], 1)
+
+    split = np.full(len(users), TRAIN, dtype=np.int8)
+    split[r < valid_cut] = VALID
+    split[r < test_cut] = TEST
+    return order, split
+
+def split_ratings(users, items, ratings, test, valid, seed, skip_zero=True):
+    # returns train, test, validation as (users, items, ratings) tuples
+    order, split = assign(users, test, valid, seed)
+    u, i, r = users[order], items[order], ratings[order]
+    keep = r != 0 if skip_zero else np.ones(len(r), dtype=bool)
+    out = []
+    for s in (TRAIN, TEST, VALID):
+        mask = keep & (split == s)
+        out.append((u[mask], i[mask], r[mask]))
+    return out
+
+
+### time-based splits
+
+def time_cutoffs(times, counts, fractions):
+    # `times` are the sorted distinct timestamps and `counts` how many ratings
+    # carry each; each cutoff is the first time by which that fraction of all
+    # ratings is reached and that is later than the previous cutoff (one past
+    # the last time when it is never reached)
+    cum = np.cumsum(counts) / float(np.sum(counts))
+    cutoffs = []
+    lo = 0
+    for fraction in fractions:
+        idx = max(int(np.searchsorted(cum, fraction, side='left')), lo)
+        if idx >= len(times):
+            cutoffs.append(int(times[-1]) + 1 if len(times) else 0)
+            lo = len(times)
+        else:
+            cutoffs.append(int(times[idx]))
+            lo = idx + 1
+    return cutoffs
+
+def time_split(inv, nusers, times, eligible, validation_start, test_start,
+               test_end=None):
+    # row masks (train, test, validation) for ratings with user index `inv`;
+    # only users with at least one rating before validation_start are kept,
+    # and of their ratings only the `eligible` ones before test_end; also
+    # returns which of the nusers users were kept
+    in_train = times < validation_start
+    has_train = np.bincount(inv, weights=in_train, minlength=nusers) > 0
+    keep = has_train[inv] & eligible
+    if test_end is not None:
+        keep &= times < test_end
+    in_valid = ~in_train & (times < test_start)
+    in_test = ~in_train & ~in_valid
+    return keep & in_train, keep & in_test, keep & in_valid, has_train
+
+
+### duplicates
+
+def dedupe(users, items, ratings):
+    # one row per (user, item), at its first position but with its last
+    # rating, the way filling a per-user {item: rating} dict would
+    n = len(users)
+    order = np.lexsort((items, users))
+    u, i = users[order], items[order]
+    new = np.ones(n, dtype=bool)
+    new[1:] = (u[1:] != u[:-1]) | (i[1:] != i[:-1])
+    starts = np.flatnonzero(new)
+    ends = np.append(starts[1:], n) - 1
+    first = order[starts]
+    last_rating = ratings[order[ends]]
+    o = np.argsort(first, kind='stable')
+    return users[first[o]], items[first[o]], last_rating[o]
+
+
+### splitting to files, optionally across worker processes
+
+PART_NAMES = ('train', 'test', 'validation')
+
+def shards(users, items, ratings, n):
+    # cut the ratings into n pieces of whole users, in increasing user order;
+    # each user's rows keep their input order
+    order, starts, counts = group_by_user(users)
+    if len(counts) == 0:
+        return []
+    before = np.cumsum(counts) - counts
+    piece = before * n // max(len(users), 1)
+    cuts = np.append(starts[np.flatnonzero(np.diff(piece)) + 1], len(users))
+    out = []
+    lo = 0
+    for hi in cuts:
+        rows = order[lo:hi]
+        out.append((users[rows], items[rows], ratings[rows]))
+        lo = hi
+    return out
+
+def _load(source):
+    # a (users, items, ratings) tuple, or the path of a binary spill bucket
+    if isinstance(source, str):
+        return np.fromfile(source, dtype=np.int64).reshape(-1, 3).T
+    return source
+
+def _split_part(task):
+    source, test, valid, seed, skip_zero, prefix = task
+    splits = split_ratings(*_load(source), test=test, valid=valid, seed=seed,
+        skip_zero=skip_zero)
+    for name, rows in zip(PART_NAMES, splits):
+        f = open(prefix + name, 'w')
+        dataio.write_tsv(f, *rows)
+        f.close()
+    return prefix, [len(rows[0]) for rows in splits]
+
+def split_to_files(sources, files, test, valid, seed, workers=1, tmpdir=None,
+                   skip_zero=True):
+    # split each source and append its rows to files (train, test, validation)
+    # in source order; with several workers each source is split and
+    # formatted in a pool process and the parts are concatenated in order, so
+    # the output does not depend on the number of workers
+    counts = [0, 0, 0]
+    if workers <= 1:
+        for source in sources:
+            splits = split_ratings(*_load(source), test=test, valid=valid,
+                seed=seed, skip_zero=skip_zero)
+            for s, (f, rows) in enumerate(zip(files, splits)):
+                dataio.write_tsv(f, *rows)
+                counts[s] += len(rows[0])
+        return counts
+
+    partdir = tempfile.mkdtemp(prefix='spf-parts-', dir=tmpdir)
+    tasks = ((source, test, valid, seed, skip_zero,
+              os.path.join(partdir, '%05d-' % n))
+             for n, source in enumerate(sources))
+    pool = multiprocessing.Pool(workers)
+    try:
+        for prefix, part_counts in pool.imap(_split_part, tasks):
+            for s, (f, name) in enumerate(zip(files, PART_NAMES)):
+                part = open(prefix + name, 'r')
+                shutil.copyfileobj(part, f)
+                part.close()
+                os.remove(prefix + name)
+                counts[s] += part_counts[s]
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        shutil.rmtree(partdir, ignore_errors=True)
+    return counts
@@ -0,0 +1,183 @@
+import itertools
+import os
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+import cull
+
+# lines parsed per chunk while streaming a text file
+READ_CHUNK = 1000000
+
+# target number of ratings per on-disk user bucket; a bucket only exceeds
+# this when a single user has more ratings than that on their own
+BUCKET_ROWS = 5000000
+
+
+### chunked parsing
+
+def read_chunks(filename, ncols, splitchar='\t', dtype=np.int64,
+                chunk=READ_CHUNK):
+    # yields (rows x ncols) int64 arrays; splitchar None splits on whitespace
+    # and dtype float parses values like 3.5 (truncated like int(float(x)))
+    f = open(filename, 'r')
+    while True:
+        lines = list(itertools.islice(f, chunk))
+        if not lines:
+            break
+        rows = np.loadtxt(lines, dtype=dtype, delimiter=splitchar, ndmin=2,
+            usecols=range(ncols))
+        yield rows.astype(np.int64)
+    f.close()
+
+def merge_counts(ids, counts, new_ids, new_counts):
+    # add (new_ids, new_counts) into a sorted (ids, counts) tally
+    ids, inv = np.unique(np.concatenate((ids, new_ids)), return_inverse=True)
+    counts = np.bincount(inv, weights=np.concatenate((counts, new_counts)),
+        minlength=len(ids)).astype(np.int64)
+    return ids, counts
+
+def tally(values, ids=None, counts=None):
+    if ids is None:
+        ids = np.zeros(0, dtype=np.int64)
+        counts = np.zeros(0, dtype=np.int64)
+    new_ids, new_counts = np.unique(values, return_counts=True)
+    return merge_counts(ids, counts, new_ids, new_counts)
+
+
+### user-partitioned spill files
+
+class UserPartition:
+    # Streams rows (user first) to disk and range-partitions them by user id,
+    # so that each bucket holds whole users, buckets come back in increasing
+    # user order, and each user's rows keep their input order.  Only the
+    # per-user and per-item counts are held in memory while partitioning,
+    # and culling a network against the ratings holds two buckets' rows of
+    # the user x item matrix at a time (plus the edges themselves).
+
+    def __init__(self, chunks, ncols, tmpdir=None, bucket_rows=BUCKET_ROWS,
+                 observe=None):
+        self.ncols = ncols
+        self.dir = tempfile.mkdtemp(prefix='spf-split-', dir=tmpdir)
+
+        # pass 1: binary copy of the input plus user and item tallies
+        self.uids = self.iids = None
+        self.user_counts = self.item_counts = None
+        raw = open(os.path.join(self.dir, 'raw.bin'), 'wb')
+        self.rows = 0
+        for rows in chunks:
+            rows.tofile(raw)
+            self.rows += len(rows)
+            self.uids, self.user_counts = tally(rows[:, 0], self.uids,
+                self.user_counts)
+            self.iids, self.item_counts = tally(rows[:, 1], self.iids,
+                self.item_counts)
+            if observe is not None:
+                observe(rows)
+        raw.close()
+        if self.uids is None:
+            self.uids, self.user_counts = tally(np.zeros(0, dtype=np.int64))
+            self.iids, self.item_counts = tally(np.zeros(0, dtype=np.int64))
+
+        # assign contiguous user ranges to buckets of ~bucket_rows ratings
+        before = np.cumsum(self.user_counts) - self.user_counts
+        self.user_bucket = before // max(bucket_rows, 1)
+        self.nbuckets = int(self.user_bucket[-1]) + 1 if len(before) else 0
+
+        # pass 2: spill each chunk of the binary copy into its buckets
+        files = [open(self.bucket_path(b), 'wb') for b in range(self.nbuckets)]
+        if self.rows:
+            data = np.memmap(os.path.join(self.dir, 'raw.bin'), dtype=np.int64,
+                mode='r', shape=(self.rows, ncols))
+            for start in range(0, self.rows, READ_CHUNK):
+                rows = np.asarray(data[start:start + READ_CHUNK])
+                buckets = self.user_bucket[np.searchsorted(self.uids,
+                    rows[:, 0])]
+                order = np.argsort(buckets, kind='stable')
+                bounds = np.searchsorted(buckets[order],
+                    np.arange(self.nbuckets + 1))
+                for b in np.unique(buckets):
+                    rows[order[bounds[b]:bounds[b + 1]]].tofile(files[b])
+            del data
+        for f in files:
+            f.close()
+        os.remove(os.path.join(self.dir, 'raw.bin'))
+
+    def bucket_path(self, bucket):
+        return os.path.join(self.dir, 'bucket-%05d.bin' % bucket)
+
+    def bucket(self, b):
+        rows = np.fromfile(self.bucket_path(b), dtype=np.int64)
+        return rows.reshape(-1, self.ncols)
+
+    def buckets(self):
+        for b in range(self.nbuckets):
+            yield self.bucket(b)
+
+    def bucket_matrix(self, b):
+        # bucket b's rows of cull.rating_matrix's binary user x item matrix
+        # (its users, in id order), built once and then read back from disk
+        path = os.path.join(self.dir, 'matrix-%05d' % b)
+        if not os.path.exists(path + '.indices.npy'):
+            rows = self.bucket(b)
+            uids, r = np.unique(rows[:, 0], return_inverse=True)
+            c = np.searchsorted(self.iids, rows[:, 1])
+            block = sp.csr_matrix((np.ones(len(r), dtype=np.int32), (r, c)),
+                shape=(len(uids), len(self.iids)))
+            block.sum_duplicates()
+            np.save(path + '.indptr.npy', block.indptr)
+            np.save(path + '.indices.npy', block.indices)
+        indptr = np.load(path + '.indptr.npy')
+        indices = np.load(path + '.indices.npy')
+        return sp.csr_matrix((np.ones(len(indices), dtype=np.int32), indices,
+            indptr), shape=(len(indptr) - 1, len(self.iids)))
+
+    def edge_overlap(self, a, b):
+        # cull.overlap's counts with at most two buckets' rows of the user x
+        # item matrix in memory: edges are grouped by the buckets of their
+        # two ends, and each group is scored against just those two
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        counts = np.zeros(len(a), dtype=np.int64)
+        ra = cull.row_index(self.uids, a)
+        rb = cull.row_index(self.uids, b)
+        edges = np.flatnonzero((ra < len(self.uids)) & (rb < len(self.uids)))
+        ra, rb = ra[edges], rb[edges]
+        # each edge's end in the lower bucket first
+        swap = self.user_bucket[ra] > self.user_bucket[rb]
+        lo, hi = np.where(swap, rb, ra), np.where(swap, ra, rb)
+        first, second = self.user_bucket[lo], self.user_bucket[hi]
+        order = np.lexsort((second, first))
+        edges, lo, hi = edges[order], lo[order], hi[order]
+        first, second = first[order], second[order]
+        # row of each bucket's first user
+        starts = np.searchsorted(self.user_bucket, np.arange(self.nbuckets))
+
+        groups = np.flatnonzero(np.diff(first * max(self.nbuckets, 1) +
+            second)) + 1
+        loaded = None
+        for start, end in zip(np.concatenate(([0], groups)),
+                              np.concatenate((groups, [len(edges)]))):
+            if end == start:
+                continue
+            x, y = first[start], second[start]
+            if loaded != x:
+                left, loaded = self.bucket_matrix(x), x
+            right = left if y == x else self.bucket_matrix(y)
+            for chunk in range(start, end, cull.EDGE_CHUNK):
+                part = slice(chunk, min(chunk + cull.EDGE_CHUNK, end))
+                shared = left[lo[part] - starts[x]].multiply(
+                    right[hi[part] - starts[y]])
+                counts[edges[part]] = np.asarray(shared.sum(axis=1)).ravel()
+        return counts
+
+    def cull_edges(self, a, b):
+        # cull.cull_edges against the partitioned ratings
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        counts = self.edge_overlap(a, b)
+        keep = counts != 0
+        return a[keep], b[keep], counts[keep]
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,146 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+import datacache
+import jobs
+
+scripts = os.path.dirname(os.path.abspath(__file__))
+
+SPF_MODELS = ('spf', 'pf', 'sf')
+BASELINES = ('pop', 'rand')
+MF_MODELS = ('MF', 'SoRec-ctr')
+LIBREC_MODELS = ('SoRec', 'SocialMF', 'TrustMF', 'RSTE', 'TrustSVD')
+
+### command line args
+
+parser = argparse.ArgumentParser(description='run SPF and the comparison ' +
+    'models on a dataset, as study.sh does, but with independent fits ' +
+    'running at once within a CPU budget')
+parser.add_argument('data_dir')
+parser.add_argument('out_dir')
+parser.add_argument('K', type=int)
+parser.add_argument('network', choices=['directed', 'undirected'])
+parser.add_argument('--cpus', type=int, default=os.cpu_count(),
+    help='CPU budget shared by the running jobs (default: all)')
+parser.add_argument('--models', default=','.join(SPF_MODELS + BASELINES +
+    MF_MODELS + LIBREC_MODELS), help='comma-separated models to run')
+parser.add_argument('--librec-threads', type=int, default=1,
+    help='processors each LibRec fit may use')
+parser.add_argument('--iter', type=int, default=100,
+    help='LibRec iterations')
+parser.add_argument('--seed', type=int, default=948237247)
+parser.add_argument('--src', default=os.path.join(scripts, '..', 'src'),
+    help='the src directory with the compiled models (see setup.sh)')
+parser.add_argument('--cache-dir', default=datacache.CACHE_DIR,
+    help='the data cache the conversions are reused from (default: ' +
+    '$SPF_CACHE_DIR or ~/.cache/spf)')
+parser.add_argument('--cache-gb', type=float, default=datacache.CACHE_GB,
+    help='size the data cache is trimmed to')
+args = parser.parse_args()
+
+datadir = os.path.abspath(args.data_dir)
+outdir = os.path.abspath(args.out_dir)
+src = os.path.abspath(args.src)
+models = args.models.split(',')
+K = str(args.K)
+seed = str(args.seed)
+directed = args.network == 'directed'
+
+def log(message):
+    print("%s  %s" % (time.strftime('%H:%M:%S'), message))
+    sys.stdout.flush()
+
+
+### conversions, reused from the data cache (see datacache.py)
+
+def conversion(name, command):
+    return jobs.Job(name, [command + ['--cache', '--cache-dir',
+        args.cache_dir, '--cache-gb', str(args.cache_gb)]], cwd=src,
+        stdout=os.path.join(outdir, name + '.out'),
+        stderr=os.path.join(outdir, name + '.err'))
+
+
+### the jobs of the study
+
+def job(name, commands, threads=1, after=()):
+    return jobs.Job(name, commands, cwd=src,
+        stdout=os.path.join(outdir, name + '.out'),
+        stderr=os.path.join(outdir, name + '.err'), threads=threads,
+        after=after)
+
+def spf(name, *options):
+    command = ['./spf', '--data', datadir, '--out', os.path.join(outdir, name)]
+    if directed:
+        command.append('--directed')
+    return command + ['--svi', '--K', K, '--seed', seed, '--save_freq',
+        '1000', '--conv_freq', '100', '--min_iter', '100', '--max_iter',
+        '1000', '--final_pass'] + list(options)
+
+def mf(name, users, items):
+    out = os.path.join(outdir, name)
+    return [['./ctr/ctr', '--directory', out, '--user',
+        os.path.join(datadir, users), '--item', os.path.join(datadir, items),
+        '--num_factors', K, '--b', '1', '--random_seed', seed],
+        ['./mf', '--data', datadir, '--out', out, '--K', K]]
+
+python = sys.executable
+planned = []
+if 'spf' in models:
+    planned.append(job('spf', [spf('spf')]))
+if 'pf' in models:
+    planned.append(job('pf', [spf('pf', '--factor_only')]))
+if 'sf' in models:
+    planned.append(job('sf', [spf('sf', '--social_only')]))
+if 'pop' in models:
+    planned.append(job('pop', [['./pop', '--data', datadir, '--out',
+        os.path.join(outdir, 'pop')]]))
+if 'rand' in models:
+    planned.append(job('rand', [['./rand', '--data', datadir, '--out',
+        os.path.join(outdir, 'rand')]]))
+
+if any(model in models for model in MF_MODELS):
+    planned.append(conversion('list-form', [python,
+        os.path.join(scripts, 'to_list_form.py'), datadir, '--sorec',
+        args.network]))
+    if 'MF' in models:
+        planned.append(job('MF', mf('MF', 'users.dat', 'items.dat'),
+            after=['list-form']))
+    if 'SoRec-ctr' in models:
+        planned.append(job('SoRec-ctr', mf('SoRec-ctr', 'users_sorec.dat',
+            'items_sorec.dat'), after=['list-form']))
+
+librec = [model for model in LIBREC_MODELS if model in models]
+if librec:
+    command = [python, os.path.join(scripts, 'to_librec_form.py'), datadir]
+    if not directed:
+        command.append('undir')
+    planned.append(conversion('librec-form', command))
+    for model in librec:
+        model_dir = os.path.join(outdir, model)
+        planned.append(job(model, [[python,
+            os.path.join(scripts, 'run_librec.py'), datadir, model_dir, model,
+            K, '--iter', str(args.iter), '--threads',
+            str(args.librec_threads), '--src', src]],
+            threads=args.librec_threads, after=['librec-form']))
+        # waits for each chunk's predictions, so it takes no CPU share
+        planned.append(job(model + '-eval', [[python,
+            os.path.join(scripts, 'ingest_librec.py'), datadir, model_dir,
+            '--parent', str(os.getpid())]],
+            threads=0, after=['librec-form']))
+
+### directory structure
+
+log("creating directory structure")
+if os.path.isdir(outdir):
+    shutil.rmtree(outdir)
+os.makedirs(outdir)
+for model in models:
+    os.makedirs(os.path.join(outdir, model))
+
+jobs.run(planned, args.cpus, os.path.join(outdir, 'jobs.csv'), log)
+failed = [j.name for j in planned if j.status in ('failed', 'skipped')]
+if failed:
+    log("did not finish: %s" % ', '.join(failed))
+log("all done!")
@@ -38,41 +38,40 @@ maxi=1000
 
 if [ "$directed" = "directed" ]; then
     # directed
-    (time (./spf --data $datadir --out $outdir/spf --directed --svi --K $K --seed $seed --save_freq $savef --conv_freq $convf --min_iter $mini --max_iter $maxi --final_pass > $outdir/spf.out 2> $outdir/spf.err) > $outdir/spf.time.out 2> $outdir/spf.time.err &)
-    (time (./spf --data $datadir --out $outdir/pf --directed --svi --K $K --seed $seed --save_freq $savef --conv_freq $convf --factor_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/pf.out 2> $outdir/pf.err) > $outdir/pf.time.out 2> $outdir/pf.time.err &)
-    (time (./spf --data $datadir --out $outdir/sf --directed --svi --K $K --seed $seed --save_freq $savef --conv_freq $convf --social_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/sf.out 2> $outdir/sf.err) > $outdir/sf.time.out 2> $outdir/sf.time.err &)
+    (python ../scripts/measure.py $outdir/spf.resources.json -- ./spf --data $datadir --out $outdir/spf --directed --svi --K $K --seed $seed --save_freq $savef --conv_freq $convf --min_iter $mini --max_iter $maxi --final_pass > $outdir/spf.out 2> $outdir/spf.err &)
+    (python ../scripts/measure.py $outdir/pf.resources.json -- ./spf --data $datadir --out $outdir/pf --directed --svi --K $K --seed $seed --save_freq $savef --conv_freq $convf --factor_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/pf.out 2> $outdir/pf.err &)
+    (python ../scripts/measure.py $outdir/sf.resources.json -- ./spf --data $datadir --out $outdir/sf --directed --svi --K $K --seed $seed --save_freq $savef --conv_freq $convf --social_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/sf.out 2> $outdir/sf.err &)
 else
     # undirected
-    (time (./spf --data $datadir --out $outdir/spf --svi --K $K --seed $seed --save_freq $savef --conv_freq $conf --min_iter $mini --max_iter $maxi --final_pass > $outdir/spf.out 2> $outdir/spf.err) > $outdir/spf.time.out 2> $outdir/spf.time.err &)
-    (time (./spf --data $datadir --out $outdir/pf --svi --K $K --seed $seed --save_freq $savef --conv_freq $conf --factor_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/pf.out 2> $outdir/pf.err) > $outdir/pf.time.out 2> $outdir/pf.time.err &)
-    (time (./spf --data $datadir --out $outdir/sf --svi --K $K --seed $seed --save_freq $savef --conv_freq $conf --social_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/sf.out 2> $outdir/sf.err) > $outdir/sf.time.out 2> $outdir/sf.time.err &)
+    (python ../scripts/measure.py $outdir/spf.resources.json -- ./spf --data $datadir --out $outdir/spf --svi --K $K --seed $seed --save_freq $savef --conv_freq $conf --min_iter $mini --max_iter $maxi --final_pass > $outdir/spf.out 2> $outdir/spf.err &)
+    (python ../scripts/measure.py $outdir/pf.resources.json -- ./spf --data $datadir --out $outdir/pf --svi --K $K --seed $seed --save_freq $savef --conv_freq $conf --factor_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/pf.out 2> $outdir/pf.err &)
+    (python ../scripts/measure.py $outdir/sf.resources.json -- ./spf --data $datadir --out $outdir/sf --svi --K $K --seed $seed --save_freq $savef --conv_freq $conf --social_only --min_iter $mini --max_iter $maxi --final_pass > $outdir/sf.out 2> $outdir/sf.err &)
 fi
 
-(time (./pop --data $datadir --out $outdir/pop > $outdir/pop.out 2> $outdir/pop.err) > $outdir/pop.time.out 2> $outdir/pop.time.err &)
-(time (./rand --data $datadir --out $outdir/rand > $outdir/rand.out 2> $outdir/rand.err) > $outdir/rand.time.out 2> $outdir/rand.time.err &)
+(python ../scripts/measure.py $outdir/pop.resources.json -- ./pop --data $datadir --out $outdir/pop > $outdir/pop.out 2> $outdir/pop.err &)
+(python ../scripts/measure.py $outdir/rand.resources.json -- ./rand --data $datadir --out $outdir/rand > $outdir/rand.out 2> $outdir/rand.err &)
 
 
 
 echo " * reformatting input for MF comparisons"
-python ../scripts/to_list_form.py $datadir
 if [ "$directed" = "directed" ]; then
     # directed
-    python ../scripts/to_sorec_list_form.py $datadir
+    python ../scripts/to_list_form.py $datadir --sorec directed
 else
     # undirected
-    python ../scripts/to_sorec_list_form.py $datadir undir
+    python ../scripts/to_list_form.py $datadir --sorec undirected
 fi
 
 echo " * fitting MF comparisons"
 mkdir $outdir/MF
 mkdir $outdir/SoRec
-time (./ctr/ctr --directory $outdir/MF --user $datadir/users.dat --item $datadir/items.dat --num_factors $K --b 1 --random_seed $seed) > $outdir/MF.time.out 2> $outdir.MF.time.err
-time (./ctr/ctr --directory $outdir/SoRec --user $datadir/users_sorec.dat --item $datadir/items_sorec.dat --num_factors $K --b 1 --random_seed $seed) > $outdir/SoRec-ctr.time.out 2> $outdir/SoRec-ctr.time.err
+python ../scripts/measure.py $outdir/MF.resources.json -- ./ctr/ctr --directory $outdir/MF --user $datadir/users.dat --item $datadir/items.dat --num_factors $K --b 1 --random_seed $seed > $outdir/MF.out 2> $outdir/MF.err
+python ../scripts/measure.py $outdir/SoRec-ctr.resources.json -- ./ctr/ctr --directory $outdir/SoRec --user $datadir/users_sorec.dat --item $datadir/items_sorec.dat --num_factors $K --b 1 --random_seed $seed > $outdir/SoRec-ctr.out 2> $outdir/SoRec-ctr.err
 
 echo " * evaluating MF comparisons"
 make mf
-time (./mf --data $datadir --out $outdir/MF --K $K) >$outdir.MF.eval.time.out 2>$outdir.MF.eval.time.err
-time (./mf --data $datadir --out $outdir/SoRec --K $K) >$outdir.SoRec-ctr.eval.time.out 2>$outdir.SoRec-ctr.eval.time.err
+python ../scripts/measure.py $outdir/MF-eval.resources.json -- ./mf --data $datadir --out $outdir/MF --K $K > $outdir/MF.eval.out 2> $outdir/MF.eval.err
+python ../scripts/measure.py $outdir/SoRec-ctr-eval.resources.json -- ./mf --data $datadir --out $outdir/SoRec --K $K > $outdir/SoRec-ctr.eval.out 2> $outdir/SoRec-ctr.eval.err
 
 mv $outdir/SoRec $outdir/SoRec-ctr
 
@@ -91,10 +90,16 @@ fi
 echo " * fitting librec comparisons"
 
 #for model in SoRec SocialMF TrustMF SoReg RSTE PMF TrustSVD BiasedMF "SVD++"
-numtest=1
+numtest=`ls $datadir/test-*.dat | wc -l`
 for model in SoRec SocialMF TrustMF RSTE TrustSVD
 do
-    rm $outdir/$model/ratings.dat
+    rm -rf $outdir/$model $outdir/$model.resources.json
+    mkdir $outdir/$model
+
+    # stores and evaluates each chunk's predictions while the next one fits
+    python ../scripts/measure.py $outdir/$model-eval.resources.json -- python ../scripts/ingest_librec.py $datadir $outdir/$model --chunks $numtest --parent $$ > $outdir/$model.eval.out 2> $outdir/$model.eval.err &
+    ingest=$!
+
     for testidx in $(seq -f "%02g" 1 $numtest)
     do
         echo -e "$model\t(test section $testidx)"
@@ -115,17 +120,20 @@ do
         
         cat tmp ../conf/base.conf > ../conf/tmp.conf
         echo ""
-        time java -jar librec/librec.jar -c ../conf/tmp.conf 2> $outdir/$model.fit.time.err
-        mkdir $outdir/$model
-        tail -n +2 Results/$model*prediction.txt >> $outdir/$model/ratings.dat
+        python ../scripts/measure.py --append $outdir/$model.resources.json -- java -jar librec/librec.jar -c ../conf/tmp.conf 2>> $outdir/$model.fit.err
 
+        # hand the predictions over under their final name only once they
+        # are complete (an empty file if the fit wrote none)
+        prediction=`ls Results/$model*prediction.txt 2> /dev/null | head -n 1`
+        if [ -n "$prediction" ]; then
+            mv $prediction $outdir/$model/prediction-$testidx.tmp
+        else
+            touch $outdir/$model/prediction-$testidx.tmp
+        fi
+        mv $outdir/$model/prediction-$testidx.tmp $outdir/$model/prediction-$testidx.txt
     done
-    
-    LINECOUNT=`wc -l $outdir/$model/ratings.dat | cut -f1 -d' '`
 
-    if [[ $LINECOUNT != 0 ]]; then
-        time ./librec_eval --data $datadir --out $outdir/$model 2> $outdir/$model.eval.time.err
-    fi
+    wait $ingest
 done
 
 echo "all done!"
@@ -0,0 +1,36 @@
+import argparse
+import os
+import amplification
+import profiling
+
+### command line args
+
+parser = argparse.ArgumentParser(description='write amplification ' +
+    'datasets for several target shares at once into data_dir/amp/<pct>, ' +
+    'reading data_dir only once')
+parser.add_argument('data_dir')
+parser.add_argument('--levels', default='0,10,20,30,40,50,60,70,80,90,100',
+    help='comma-separated target percentages of items shared with friends')
+parser.add_argument('--passes', type=int, default=1,
+    help='passes over the users per level (see adjust_amplification.py)')
+parser.add_argument('--workers', type=int, default=1,
+    help='number of levels to build at once in forked processes')
+parser.add_argument('--seed', type=int, default=None,
+    help='seed for reproducible datasets (default: a fresh one per level)')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+levels = [float(level) for level in args.levels.split(',')]
+profile = profiling.from_args(args, 'sweep_amplification',
+    os.path.join(args.data_dir, 'amp'))
+
+# one stage: reading the data and every level
+profile.stage('sweep')
+
+for pct, changed_amp, changed_deamp, share in amplification.sweep(
+    args.data_dir, levels, args.passes, args.workers, args.seed):
+    print("(de)amp %g: %d changed items ( %d %d ), %f %% shared" %
+        (pct, changed_amp + changed_deamp, changed_amp, changed_deamp,
+        share * 100))
+    profile.rows(changed_amp + changed_deamp)
+profile.finish()
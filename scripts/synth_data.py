@@ -0,0 +1,46 @@
+import argparse
+import time
+import synthetic
+
+### command line args
+
+parser = argparse.ArgumentParser(description='generate a synthetic ' +
+    'social rating dataset: power-law user activity and item popularity, ' +
+    'and a social graph whose friends tend to share a community and so ' +
+    'its items; writes the raw lists to output-dir/raw and the ' +
+    'train/test/validation/network.tsv split to output-dir')
+parser.add_argument('output_dir')
+parser.add_argument('ratings', type=float,
+    help='about how many ratings to generate, e.g. 1e6')
+parser.add_argument('--users', type=int, default=None,
+    help='number of users (default: one per 40 ratings)')
+parser.add_argument('--items', type=int, default=None,
+    help='number of items (default: one per 100 ratings)')
+parser.add_argument('--degree', type=float, default=10,
+    help='average number of friends before culling')
+parser.add_argument('--communities', type=int, default=None,
+    help='number of communities (default: one per 500 users)')
+parser.add_argument('--homophily', type=float, default=0.5,
+    help='share of friendships within a community, and of ratings from ' +
+    'the community\'s slice of the items')
+parser.add_argument('--user-exponent', type=float, default=1.5,
+    help='tail exponent of user activity and friend counts')
+parser.add_argument('--item-exponent', type=float, default=1.0,
+    help='Zipf exponent of item popularity')
+parser.add_argument('--times', action='store_true',
+    help='also write raw/times.tsv (user, item, unix time) for ' +
+    'process_time_data.py')
+parser.add_argument('--raw-only', action='store_true',
+    help='write only the raw lists, not the split')
+parser.add_argument('--seed', type=int, default=11)
+args = parser.parse_args()
+
+def log(message):
+    print("%s  %s" % (time.strftime('%H:%M:%S'), message))
+
+written = synthetic.generate(args.output_dir, int(args.ratings), args.users,
+    args.items, args.degree, args.communities, args.homophily,
+    args.user_exponent, args.item_exponent, args.times, not args.raw_only,
+    args.seed, log)
+for key in sorted(written):
+    print("%s\t%d" % (key, written[key]))
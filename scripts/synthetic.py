@@ -0,0 +1,214 @@
+import os
+import numpy as np
+import cull
+import dataio
+import idindex
+import split
+
+# ratings generated, split and written at a time
+SYNTH_BLOCK = 5000000
+
+# rounds of redrawing the items a user already had
+TOP_UPS = 5
+
+# rating values and how often each is given (about as in FilmTrust)
+RATING_VALUES = np.array([1, 2, 3, 4, 5])
+RATING_WEIGHTS = np.array([0.05, 0.1, 0.2, 0.35, 0.3])
+
+# timestamps fall in the three years from the start of 2010
+TIME_START = 1262304000
+TIME_SPAN = 3 * 365 * 86400
+
+
+### shapes of the data
+
+def pareto_weights(rng, n, exponent):
+    # heavy-tailed positive weights; a smaller exponent gives a longer tail
+    return rng.pareto(exponent, n) + 1.0
+
+def activity(rng, nusers, nratings, nitems, exponent):
+    # ratings per user: power-law, at least one, at most half the items,
+    # summing to about nratings
+    weights = pareto_weights(rng, nusers, exponent)
+    counts = np.floor(weights * (nratings / weights.sum()) + rng.random(nusers))
+    return np.clip(counts, 1, max(nitems // 2, 1)).astype(np.int64)
+
+def zipf_cdf(n, exponent):
+    # cumulative popularity of ranks 0..n-1, with weight (rank + 1)^-exponent
+    cdf = np.cumsum(np.arange(1, n + 1, dtype=np.float64) ** -exponent)
+    return cdf / cdf[-1]
+
+def draw(rng, cdf, n):
+    # n ranks drawn from a cumulative distribution
+    return np.minimum(np.searchsorted(cdf, rng.random(n)), len(cdf) - 1)
+
+
+def distinct(keys):
+    # the sorted distinct values of an integer array (a sort and a compare,
+    # much faster than np.unique's hashing on large arrays)
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return keys
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+
+### the social graph
+
+def social_graph(rng, community, degree, exponent, homophily):
+    # undirected edges (a, b) with a < b, about degree per user on average:
+    # endpoints are drawn in proportion to power-law weights, the second
+    # one from the first one's community with probability homophily
+    nusers = len(community)
+    weights = pareto_weights(rng, nusers, exponent)
+    nedges = int(nusers * degree / 2)
+
+    # users grouped by community, with cumulative weights inside each group
+    order = np.argsort(community, kind='stable')
+    starts = np.searchsorted(community[order], np.arange(community.max() + 2))
+    within = np.cumsum(weights[order])
+    base = np.concatenate(([0.0], within))[starts]
+    total = within[-1]
+
+    a = order[np.searchsorted(within, rng.random(nedges) * total)]
+    b = order[np.searchsorted(within, rng.random(nedges) * total)]
+    local = rng.random(nedges) < homophily
+    c = community[a[local]]
+    spot = base[c] + rng.random(local.sum()) * (base[c + 1] - base[c])
+    b[local] = order[np.minimum(np.searchsorted(within, spot),
+        starts[c + 1] - 1)]
+
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    keep = a != b
+    keys = distinct(a[keep] * nusers + b[keep])
+    return keys // nusers, keys % nusers
+
+
+### ratings
+
+def _draw_items(rng, rows, community, homophily, item_cdf, slice_cdf):
+    items = draw(rng, item_cdf, len(rows))
+    local = rng.random(len(rows)) < homophily
+    items[local] = community[rows[local]] * len(slice_cdf) + \
+        draw(rng, slice_cdf, local.sum())
+    return items
+
+def user_ratings(rng, users, counts, community, nitems, homophily,
+                 item_cdf, slice_cdf):
+    # (users, items) for a block of users, sorted: each rating is drawn
+    # from the user's community's slice of the catalog with probability
+    # homophily, and from the whole catalog otherwise, by power-law
+    # popularity in both.  A user's repeated items are drawn again, a few
+    # rounds at most, so most users get their full count
+    keys = np.zeros(0, dtype=np.int64)
+    short = counts
+    for attempt in range(TOP_UPS):
+        rows = np.repeat(users, short)
+        items = _draw_items(rng, rows, community, homophily, item_cdf,
+            slice_cdf)
+        keys = distinct(np.concatenate((keys, rows * nitems + items)))
+        short = counts - np.bincount(keys // nitems - users[0],
+            minlength=len(users))
+        if not short.any():
+            break
+    return keys // nitems, keys % nitems
+
+def blocks(counts):
+    # [start, end) ranges of users with about SYNTH_BLOCK ratings each
+    ends = np.searchsorted(np.cumsum(counts), np.arange(SYNTH_BLOCK,
+        counts.sum(), SYNTH_BLOCK), side='right')
+    edges = np.unique(np.concatenate(([0], ends, [len(counts)])))
+    return zip(edges[:-1], edges[1:])
+
+
+### writing a dataset
+
+def generate(out_dir, nratings, nusers=None, nitems=None, degree=10,
+             communities=None, homophily=0.5, user_exponent=1.5,
+             item_exponent=1.0, times=False, layout=True, seed=11, log=None):
+    # write a synthetic dataset to out_dir: the raw ratings (user, item,
+    # rating) and trust (user, friend) lists that process_data.py takes in
+    # out_dir/raw, with the (user, item, unix time) list for
+    # process_time_data.py if times, and unless layout is False the
+    # train/test/validation/network.tsv split process_data.py --engine
+    # numpy would make of them; returns the counts written
+    if nusers is None:
+        nusers = max(nratings // 40, 2)
+    if nitems is None:
+        nitems = max(nratings // 100, 2)
+    if communities is None:
+        communities = max(nusers // 500, 1)
+    communities = min(communities, nitems)
+    log = log or (lambda message: None)
+    rng = np.random.default_rng(seed)
+
+    raw = os.path.join(out_dir, 'raw')
+    if not os.path.exists(raw):
+        os.makedirs(raw)
+
+    community = rng.integers(0, communities, nusers)
+    counts = activity(rng, nusers, nratings, nitems, user_exponent)
+    # popular items are spread over the catalog rather than the lowest ids
+    item_ids = rng.permutation(nitems) + 1
+    item_cdf = zipf_cdf(nitems, item_exponent)
+    slice_cdf = zipf_cdf(nitems // communities, item_exponent)
+
+    log("network: %d users, %d communities" % (nusers, communities))
+    a, b = social_graph(rng, community, degree, user_exponent, homophily)
+    a, b = a + 1, b + 1
+    trust = open(os.path.join(raw, 'trust.tsv'), 'w+')
+    dataio.write_tsv(trust, a, b)
+    trust.close()
+
+    ratings = open(os.path.join(raw, 'ratings.tsv'), 'w+')
+    stamps = open(os.path.join(raw, 'times.tsv'), 'w+') if times else None
+    if layout:
+        train, test, valid = split.split_fractions()
+        files = [open(os.path.join(out_dir, name + '.tsv'), 'w+') for name
+            in ('train', 'test', 'validation')]
+        split_counts = [0, 0, 0]
+        kept_users, kept_items = [], []
+
+    total = 0
+    for start, end in blocks(counts):
+        users, items = user_ratings(rng, np.arange(start, end),
+            counts[start:end], community, nitems, homophily, item_cdf,
+            slice_cdf)
+        users, items = users + 1, item_ids[items]
+        values = rng.choice(RATING_VALUES, len(users), p=RATING_WEIGHTS)
+        dataio.write_tsv(ratings, users, items, values)
+        if times:
+            dataio.write_tsv(stamps, users, items, TIME_START +
+                rng.integers(0, TIME_SPAN, len(users)))
+        if layout:
+            parts = split.split_ratings(users, items, values, test, valid,
+                seed)
+            for s, (u, i, r) in enumerate(parts):
+                dataio.write_tsv(files[s], u, i, r)
+                split_counts[s] += len(u)
+            kept_users.append(users.astype(np.int32))
+            kept_items.append(items.astype(np.int32))
+        total += len(users)
+        log("ratings: %d of about %d" % (total, counts.sum()))
+    ratings.close()
+    if times:
+        stamps.close()
+
+    written = {'users': nusers, 'items': nitems, 'ratings': total,
+        'edges': len(a)}
+    if not layout:
+        return written
+
+    for f in files:
+        f.close()
+    # culled as process_data.py does: friends with no item in common go
+    uids, matrix = cull.rating_matrix(np.concatenate(kept_users),
+        np.concatenate(kept_items))
+    del kept_users, kept_items
+    a, b, overlap = cull.cull_edges(uids, matrix, a, b)
+    network = open(os.path.join(out_dir, 'network.tsv'), 'w+')
+    dataio.write_tsv(network, a, b)
+    network.close()
+    idindex.build(out_dir)
+    written.update(train=split_counts[0], test=split_counts[1],
+        validation=split_counts[2], network=len(a))
+    return written
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import fit
+import idindex
+import score
+
+# a small split: 6 users, 5 items, a network with a user outside train
+TRAIN = [(1, 10, 4), (1, 11, 2), (2, 10, 5), (2, 12, 3), (3, 13, 1),
+    (4, 11, 5), (4, 14, 2), (5, 12, 4), (6, 10, 3), (6, 14, 5)]
+VALIDATION = [(1, 12, 3), (3, 10, 2)]
+NETWORK = [(1, 2), (1, 4), (3, 2), (5, 6), (6, 1), (7, 1)]
+K = 3
+
+SETTINGS = '''data directory: %s
+
+model specification:
+\tsocial Poisson factorization (SPF)
+\tsocial influence parameters fixed to 1
+\tK = 3   (number of latent factors for general preferences)
+
+shape and rate hyperparameters:
+\ttheta (0.300000, 0.300000)
+\tbeta  (0.300000, 0.300000)
+\ttau   (2.000000, 5.000000)
+\tdelta (0.30, 0.30)
+
+data attributes:
+\tinteger ratings
+\t%s network
+'''
+
+
+def write_rows(filename, rows):
+    f = open(filename, 'w')
+    for row in rows:
+        f.write('\t'.join(str(x) for x in row) + '\n')
+    f.close()
+
+def make_fit(tmp_path, directed):
+    data = str(tmp_path / 'data')
+    out = str(tmp_path / 'fit')
+    os.makedirs(data)
+    os.makedirs(out)
+    write_rows(data + '/train.tsv', TRAIN)
+    write_rows(data + '/validation.tsv', VALIDATION)
+    write_rows(data + '/network.tsv', NETWORK)
+    idindex.build(data)
+    users, items = idindex.load(data)
+
+    rng = np.random.default_rng(3)
+    theta = rng.gamma(0.3, 1, (len(users), K))
+    beta = rng.gamma(0.3, 1, (len(items), K))
+    delta = rng.gamma(0.3, 1, len(items))
+    write_rows(out + '/theta-final.dat', [[u, users.ids[u]] +
+        ['%e' % x for x in theta[u]] for u in range(len(users))])
+    write_rows(out + '/beta-final.dat', [[i, items.ids[i]] +
+        ['%e' % x for x in beta[i]] for i in range(len(items))])
+    write_rows(out + '/delta-final.dat', [[i, items.ids[i], '%e' % delta[i]]
+        for i in range(len(items))])
+    f = open(out + '/settings.txt', 'w')
+    f.write(SETTINGS % (data, 'directed' if directed else 'undirected'))
+    f.close()
+    return data, out, users, items
+
+def predict(data, fit_dir, users, items, directed):
+    # SPF::predict (src/spf.cpp), one pair at a time: tau(neighbor, user) is
+    # 1 on every edge Data::read_network keeps, and 0 elsewhere
+    model = fit.Fit(fit_dir)
+    ratings = {}
+    for user, item, rating in TRAIN:
+        ratings[users.lookup([user])[0], items.lookup([item])[0]] = rating
+    neighbors = dict((u, set()) for u in range(len(users)))
+    for user, neighbor in NETWORK:
+        u, n = users.lookup([user, neighbor])
+        if u < 0 or n < 0:
+            continue
+        neighbors[u].add(n)
+        if not directed:
+            neighbors[n].add(u)
+    expected = np.zeros((len(users), len(items)))
+    for u in range(len(users)):
+        for i in range(len(items)):
+            prediction = sum(ratings.get((n, i), 0) for n in neighbors[u])
+            prediction += np.dot(model.theta[u], model.beta[i])
+            prediction += model.delta[i]
+            expected[u, i] = prediction
+    return expected
+
+def test_fixed_influence_scores_match_predict(tmp_path):
+    for directed in (False, True):
+        base = tmp_path / ('directed' if directed else 'undirected')
+        data, out, users, items = make_fit(base, directed)
+        scorer = score.Scorer(fit.Fit(out), data)
+        assert scorer.tau is not None
+        scores = scorer.scores(np.arange(len(users)))
+        expected = predict(data, out, users, items, directed)
+        assert np.allclose(scores, expected, rtol=1e-5)
@@ -0,0 +1,18 @@
+import argparse
+import dataio
+import profiling
+
+# write binary .bin twins of train/test/validation/network.tsv; every script
+# reading these files (and the C++ loader) prefers a fresh twin over the tsv
+
+parser = argparse.ArgumentParser(description='write binary .bin twins of ' +
+    'the tsv data files in a directory')
+parser.add_argument('path')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+path = args.path
+profile = profiling.from_args(args, 'to_bin_form', path)
+profile.stage('convert')
+dataio.dir_to_bin(path)
+profile.finish()
@@ -1,27 +1,69 @@
+import argparse
+import glob
+import os
 import sys
 from collections import defaultdict
-import random
+import numpy as np
+import cull
+import datacache
+import dataio
+import grid
+import profiling
+from negatives import NegativeSampler
 
-random.seed(11)
+### command line args
 
+parser = argparse.ArgumentParser(description='write a data directory in ' +
+    'the form LibRec reads: ratings.dat with sampled negatives, the dense ' +
+    'test grid test-NN.dat, and network.dat')
+parser.add_argument('path')
+parser.add_argument('undir', nargs='?', default=None,
+    help='any value writes the network in both directions')
+parser.add_argument('--negatives', choices=['uniform', 'popularity'],
+    default='uniform', help='draw the negatives in ratings.dat uniformly ' +
+    'from the training items or in proportion to their training counts')
+parser.add_argument('--grid', choices=['dense', 'compact', 'both'],
+    default='dense', help='write the test grid as dense test-NN.dat text ' +
+    'files, in compact form (%s, %s and the nonzero cells in %s), or both' %
+    (grid.GRID_USERS, grid.GRID_ITEMS, grid.GRID_POSITIVES))
+parser.add_argument('--test-max', type=int, default=60000000,
+    help='lines after which a new test-NN.dat file is started')
+parser.add_argument('--workers', type=int, default=1,
+    help='number of test-NN.dat files to write at once')
+profiling.add_arguments(parser)
+datacache.add_arguments(parser)
+args = parser.parse_args()
 
-path = sys.argv[1]
-undir = (len(sys.argv) == 3)
+path = args.path
+undir = args.undir is not None
+profile = profiling.from_args(args, 'to_librec_form', path)
 
+# --workers does not change the output; a restored dense grid replaces all
+# test-NN.dat files, as a run does
+cached = datacache.from_args(args, 'to_librec_form', {'undir': undir,
+    'negatives': args.negatives, 'grid': args.grid,
+    'test_max': args.test_max}, [(name, '%s/%s.tsv' % (path, name)) for name
+    in ('train', 'validation', 'test', 'network')], path,
+    remove=['test-[0-9][0-9].dat'] if args.grid != 'compact' else [])
+if cached.hit():
+    sys.exit(0)
+
+profile.stage('ratings')
 users = set()
 items = set()
 fout = open(path +'/ratings.dat', 'w+')
+written = [fout.name]
 user_items = defaultdict(set)
 user_counts = defaultdict(int)
-for line in open(path + '/train.tsv'):
-    user, item, rating = [int(x.strip()) for x in line.split('\t')]
+item_counts = defaultdict(int)
+for user, item, rating in dataio.rows(path + '/train.tsv', 3):
     fout.write("%d\t%d\t%d\n" % (user, item, rating))
     items.add(item)
     users.add(user)
     user_items[user].add(item)
     user_counts[user] += 1
-for line in open(path + '/validation.tsv'):
-    user, item, rating = [int(x.strip()) for x in line.split('\t')]
+    item_counts[item] += 1
+for user, item, rating in dataio.rows(path + '/validation.tsv', 3):
     if user in users and item in items:
         fout.write("%d\t%d\t%d\n" % (user, item, rating))
         user_items[user].add(item)
@@ -29,51 +71,61 @@ for line in open(path + '/validation.tsv'):
 test_users = set()
 test_items = set()
 ratings = dict()
-for line in open(path + '/test.tsv'):
-    user, item, rating = [int(x.strip()) for x in line.split('\t')]
+for user, item, rating in dataio.rows(path + '/test.tsv', 3):
     if user in users and item in items:
         test_users.add(user)
         test_items.add(item)
         ratings[(user,item)] = rating
         user_items[user].add(item)
 
-test_max = 60000000
-test_index = 1
-test_count = 0
-fout_test = open(path +'/test-%02d.dat' % test_index, 'w+')
-
-print "starting test batch 1"
-for user in test_users:
-    all_items = list(items)
-    random.shuffle(all_items)
-    while user_counts[user] > 0 and len(all_items) != 0:
-        item = all_items.pop()
-        if item not in user_items:
-            fout.write("%d\t%d\t0\n" % (user, item))
-            user_counts[user] -= 1
+profile.rows(sum(user_counts.values()))
 
-    for item in test_items:
-        if (user,item) in ratings:
-            fout_test.write("%d\t%d\t%d\n" % (user, item, rating))
-        else:
-            fout_test.write("%d\t%d\t0\n" % (user, item))
-        test_count += 1
+# as many negatives per test user as they have training and validation
+# ratings, drawn from the training items they have not rated anywhere
+profile.stage('negatives')
+catalog = np.array(sorted(items), dtype=np.int64)
+weights = None
+if args.negatives == 'popularity':
+    weights = [item_counts[item] for item in catalog.tolist()]
+sampler = NegativeSampler(*cull.arrays_from_sets(user_items), catalog=catalog,
+    weights=weights, seed=11)
+negative_users = np.array(sorted(test_users), dtype=np.int64)
+neg_users, neg_items = sampler.sample(negative_users,
+    [user_counts[user] for user in negative_users.tolist()])
+dataio.write_tsv(fout, neg_users, neg_items, np.zeros(len(neg_users)))
+fout.close()
+profile.rows(len(neg_users))
 
-    if test_count > test_max:
-        fout_test.close()
-        test_index += 1
-        fout_test = open(path +'/test-%02d.dat' % test_index, 'w+')
-        print "starting test batch %d" % test_index
-        test_count = 0
+profile.stage('test grid')
+# the test grid is every test user x every test item, 0 unless held out
+grid_users = np.array(sorted(test_users), dtype=np.int64)
+grid_items = np.array(sorted(test_items), dtype=np.int64)
+held = np.array([(u, i, r) for (u, i), r in ratings.items()],
+    dtype=np.int64).reshape(-1, 3)
+matrix = grid.held_out(held[:, 0], held[:, 1], held[:, 2], grid_users,
+    grid_items)
+if args.grid in ('dense', 'both'):
+    # study.sh runs LibRec on every test-NN.dat, so drop any from older runs
+    for filename in glob.glob(path + '/test-[0-9][0-9].dat'):
+        os.remove(filename)
+    for filename, rows in grid.write_chunks(path + '/test-%02d.dat',
+        grid_users, grid_items, matrix, args.test_max, args.workers):
+        print("wrote %s (%d lines)" % (filename, rows))
+        written.append(filename)
+if args.grid in ('compact', 'both'):
+    grid.write_compact(path, grid_users, grid_items, matrix)
+    written += [grid.GRID_USERS, grid.GRID_ITEMS, grid.GRID_POSITIVES]
 
-fout.close()
-fout_test.close()
+profile.rows(len(grid_users) * len(grid_items))
 
+profile.stage('network')
 fout = open(path +'/network.dat', 'w+')
-for line in open(path + '/network.tsv'):
-    user, friend = [int(x.strip()) for x in line.split('\t')]
+written.append(fout.name)
+for user, friend in dataio.rows(path + '/network.tsv', 2):
     if user in users and friend in users:
         fout.write("%d\t%d\t1\n" % (user, friend))
         if undir:
             fout.write("%d\t%d\t1\n" % (friend, user))
 fout.close()
+profile.finish()
+cached.store(written)
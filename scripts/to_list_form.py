@@ -1,44 +1,31 @@
+import argparse
 import sys
-from collections import defaultdict
-
-path = sys.argv[1]
-
-fin = open(path +'/train.tsv')
-fout_items = open(path +'/items.dat', 'w+')
-fout_users = open(path +'/users.dat', 'w+')
-
-users = defaultdict(list)
-items = defaultdict(list)
-for line in fin:
-    user, item, rating = [int(x.strip()) for x in line.split('\t')]
-    users[user].append(item)
-    items[item].append(user)
-
-umap = {}
-imap = {}
-fmap_items = open(path +'/item_map.dat', 'w+')
-fmap_users = open(path +'/user_map.dat', 'w+')
-for user in users:
-    umap[user] = len(umap)
-    fmap_users.write("%d,%d\n" % (user, umap[user]))
-for item in items:
-    imap[item] = len(imap)
-    fmap_items.write("%d,%d\n" % (item, imap[item]))
-fmap_users.close()
-fmap_items.close()
-
-for user in sorted(users, key=lambda x: umap[x]):
-    line = str(len(users[user]))
-    for item in users[user]:
-        line += ' ' + str(imap[item])
-    fout_users.write(line + '\n')
-
-for item in sorted(items, key=lambda x: imap[x]):
-    line = str(len(items[item]))
-    for user in items[item]:
-        line += ' ' + str(umap[user])
-    fout_items.write(line + '\n')
-
-fout_items.close()
-fout_users.close()
-
+import datacache
+import listform
+import profiling
+
+### command line args
+
+parser = argparse.ArgumentParser(description='write the training data in ' +
+    'the list form CTR/MF reads: users.dat, items.dat and the id maps')
+parser.add_argument('path')
+parser.add_argument('--sorec', choices=['directed', 'undirected'],
+    default=None, help='also write the SoRec list form (*_sorec.dat) from ' +
+    'the same read of the data')
+profiling.add_arguments(parser)
+datacache.add_arguments(parser)
+args = parser.parse_args()
+profile = profiling.from_args(args, 'to_list_form', args.path)
+
+inputs = [('train', args.path + '/train.tsv')]
+if args.sorec:
+    inputs.append(('network', args.path + '/network.tsv'))
+cached = datacache.from_args(args, 'to_list_form', {'sorec': args.sorec},
+    inputs, args.path)
+if cached.hit():
+    sys.exit(0)
+
+profile.stage('export')
+written = listform.export(args.path, ctr=True, sorec=args.sorec)
+profile.finish()
+cached.store(written)
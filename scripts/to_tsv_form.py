@@ -0,0 +1,22 @@
+import argparse
+from os.path import exists, join
+import dataio
+import profiling
+
+# convert the binary twins of a directory's data files back to tsv
+
+parser = argparse.ArgumentParser(description='convert the binary twins of ' +
+    'a directory\'s data files (train, test, validation and network.bin) ' +
+    'back to tsv')
+parser.add_argument('path')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+
+path = args.path
+profile = profiling.from_args(args, 'to_tsv_form', path)
+profile.stage('convert')
+for name, ncols in dataio.DATA_FILES:
+    if exists(join(path, name + '.bin')):
+        print(name + '.bin')
+        dataio.bin_to_tsv(join(path, name + '.bin'), join(path, name + '.tsv'))
+profile.finish()
@@ -1,4 +1,68 @@
 #include "data.h"
+#include "utils.h"
+#include <string.h>
+
+RowReader::RowReader(string filename, int cols) {
+    ncols = cols;
+    fileptr = NULL;
+    row = 0;
+    nrows = 0;
+
+    string binname = binary_twin(filename);
+    struct stat tsv_stat, bin_stat;
+    binary = stat(binname.c_str(), &bin_stat) == 0 &&
+        (stat(filename.c_str(), &tsv_stat) != 0 ||
+         bin_stat.st_mtime >= tsv_stat.st_mtime) &&
+        read_binary(binname);
+
+    if (!binary)
+        fileptr = fopen(filename.c_str(), "r");
+}
+
+RowReader::~RowReader() {
+    if (fileptr)
+        fclose(fileptr);
+}
+
+bool RowReader::read_binary(string filename) {
+    FILE* file = fopen(filename.c_str(), "rb");
+    if (!file)
+        return false;
+
+    char magic[4];
+    bool ok = fread(magic, 1, 4, file) == 4 && memcmp(magic, "SPF1", 4) == 0 &&
+        fread(&file_cols, sizeof(int), 1, file) == 1 &&
+        fread(&nrows, sizeof(long long), 1, file) == 1 &&
+        file_cols >= ncols;
+    if (ok) {
+        columns.resize(file_cols * nrows);
+        ok = nrows == 0 || fread(&columns[0], sizeof(int), columns.size(), file)
+            == columns.size();
+    }
+    fclose(file);
+    if (!ok)
+        printf("could not read binary data file %s; using tsv\n", filename.c_str());
+    return ok;
+}
+
+bool RowReader::next(int* a, int* b, int* c) {
+    if (binary) {
+        if (row >= nrows)
+            return false;
+        *a = columns[row];
+        *b = columns[nrows + row];
+        if (c)
+            *c = columns[2 * nrows + row];
+        row++;
+        return true;
+    }
+
+    if (!fileptr)
+        return false;
+    if (c)
+        return fscanf(fileptr, "%d\t%d\t%d\n", a, b, c) != EOF;
+    return fscanf(fileptr, "%d\t%d\n", a, b) != EOF;
+}
 
 Data::Data(bool bin, bool dir) {
     binary = bin;
@@ -8,12 +72,12 @@ Data::Data(bool bin, bool dir) {
 
 void Data::read_ratings(string filename) {
     // read in training data
-    FILE* fileptr = fopen(filename.c_str(), "r");
+    RowReader reader(filename, 3);
     mean_rating = 0;
 
     int user, item, rating;
     set<unsigned long long> dupe_checker;
-    while ((fscanf(fileptr, "%d\t%d\t%d\n", &user, &item, &rating) != EOF)) {
+    while (reader.next(&user, &item, &rating)) {
         // look for duplicate entries; this is not a perfect check, but it's ok
         unsigned long long dupe_id = item * 1000000000 + user * 100 +  rating;
         if (dupe_checker.count(dupe_id) != 0)
@@ -44,7 +108,6 @@ void Data::read_ratings(string filename) {
             mean_rating += rating;
         }
     }
-    fclose(fileptr);
 
     umat locations = umat(2, num_training());
     fcolvec values = fcolvec(num_training());
@@ -72,11 +135,11 @@ void Data::read_network(string filename) {
     has_network = true;
 
     // read in network data from file
-    FILE* fileptr = fopen(filename.c_str(), "r");
+    RowReader reader(filename, 2);
 
     int user, neighbor, u, n;
     int network_count = 0;
-    while ((fscanf(fileptr, "%d\t%d\n", &user, &neighbor) != EOF)) {
+    while (reader.next(&user, &neighbor)) {
         // skip connections in which either user or neighbor is seen in training
         if (user_ids.count(user) == 0 || user_ids.count(neighbor) == 0)
             continue;
@@ -94,8 +157,6 @@ void Data::read_network(string filename) {
         }
     }
 
-    fclose(fileptr);
-
     umat locations = umat(2, network_count);
     fcolvec values = fcolvec(network_count);
     network_count = 0;
@@ -116,11 +177,11 @@ void Data::read_network(string filename) {
 
 void Data::read_validation(string filename) {
     // read in validation data
-    FILE* fileptr = fopen(filename.c_str(), "r");
+    RowReader reader(filename, 3);
 
     int user, item, rating;
     set<long> dupe_checker;
-    while ((fscanf(fileptr, "%d\t%d\t%d\n", &user, &item, &rating) != EOF)) {
+    while (reader.next(&user, &item, &rating)) {
         // look for duplicate entries; this is not a perfect check, but it's ok
         long dupe_id = item * 100000 + user * 100 +  rating;
         if (dupe_checker.count(dupe_id) != 0)
@@ -139,8 +200,6 @@ void Data::read_validation(string filename) {
             validation_ratings.push_back(binary ? 1 : rating);
         //TODO: all evaluation assumes no zero held out (see above lines for problem)
     }
-
-    fclose(fileptr);
     
     umat locations = umat(2, num_validation());
     fcolvec values = fcolvec(num_validation());
@@ -155,11 +214,11 @@ void Data::read_validation(string filename) {
 
 void Data::read_test(string filename) {
     // read in test data
-    FILE* fileptr = fopen(filename.c_str(), "r");
+    RowReader reader(filename, 3);
 
     int user, item, rating, u, i;
     test_ratings = sp_umat(user_count(), item_count());
-    while ((fscanf(fileptr, "%d\t%d\t%d\n", &user, &item, &rating) != EOF)) {
+    while (reader.next(&user, &item, &rating)) {
         // map user and item ids
         if (user_ids.count(user) == 0 || item_ids.count(item) == 0)
             continue;
@@ -179,8 +238,6 @@ void Data::read_test(string filename) {
         test_count_item[i]++;
         test_count[-1]++;
     }
-
-    fclose(fileptr);
 }
 
 void Data::save_summary(string filename) {
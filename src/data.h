@@ -14,6 +14,28 @@
 using namespace std;
 using namespace arma;
 
+// reads rows of integers from a tsv data file, or from its binary twin
+// (written by scripts/dataio.py) when that exists and is at least as new:
+// a 16 byte header ("SPF1", int32 column count, int64 row count) followed
+// by each column as a contiguous int32 array
+class RowReader {
+    private:
+        FILE* fileptr;
+        bool binary;
+        int ncols;
+        int file_cols;
+        long long nrows;
+        long long row;
+        vector<int> columns;
+
+        bool read_binary(string filename);
+
+    public:
+        RowReader(string filename, int cols);
+        ~RowReader();
+        bool next(int* a, int* b, int* c = NULL);
+};
+
 class Data {
     private:
         bool binary;
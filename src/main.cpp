@@ -286,17 +286,17 @@ int main(int argc, char* argv[]) {
     }
     printf("data directory: %s\n", data.c_str());
 
-    if (!file_exists(data + "/train.tsv")) {
+    if (!data_file_exists(data + "/train.tsv")) {
         printf("training data file (train.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
 
-    if (!file_exists(data + "/validation.tsv")) {
+    if (!data_file_exists(data + "/validation.tsv")) {
         printf("validation data file (validation.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
 
-    if (!factor_only && !file_exists(data + "/network.tsv")) {
+    if (!factor_only && !data_file_exists(data + "/network.tsv")) {
         printf("network data file (network.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
@@ -417,7 +417,7 @@ int main(int argc, char* argv[]) {
     dataset->read_validation(settings.datadir + "/validation.tsv");
     printf("done\n");
 
-    if (!file_exists(data + "/test.tsv")) {
+    if (!data_file_exists(data + "/test.tsv")) {
         printf("testing data file (test.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
@@ -133,12 +133,12 @@ int main(int argc, char* argv[]) {
     }
     printf("data directory: %s\n", datadir.c_str());
 
-    if (!file_exists(datadir + "/train.tsv")) {
+    if (!data_file_exists(datadir + "/train.tsv")) {
         printf("training data file (train.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
     
-    if (!file_exists(datadir + "/validation.tsv")) {
+    if (!data_file_exists(datadir + "/validation.tsv")) {
         printf("validation data file (validation.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
@@ -163,7 +163,7 @@ int main(int argc, char* argv[]) {
     data->read_validation(datadir + "/validation.tsv");
     printf("done\n");
     
-    if (!file_exists(datadir + "/test.tsv")) {
+    if (!data_file_exists(datadir + "/test.tsv")) {
         printf("testing data file (test.tsv) doesn't exist!  Exiting.\n");
         exit(-1);
     }
@@ -397,7 +397,7 @@ void SPF::save_parameters(string label) {
         // write out bias delta
         file = fopen((settings->outdir+"/delta-"+label+".dat").c_str(), "w");
         for (int item = 0; item < data->item_count(); item++) {
-            fprintf(file, "%d\t%d\t%e", item, data->item_id(item), delta(item));
+            fprintf(file, "%d\t%d\t%e\n", item, data->item_id(item), delta(item));
         }
         fclose(file);
     }
@@ -7,6 +7,18 @@ bool file_exists(string filename) {
   return false;
 }
 
+// the binary version of a data file: train.tsv -> train.bin
+string binary_twin(string filename) {
+  if (filename.size() > 4 && filename.substr(filename.size() - 4) == ".tsv")
+    return filename.substr(0, filename.size() - 4) + ".bin";
+  return filename + ".bin";
+}
+
+// check if a data file exists in either tsv or binary form
+bool data_file_exists(string filename) {
+  return file_exists(filename) || file_exists(binary_twin(filename));
+}
+
 // check if a directory exists
 int dir_exists(string dname) {
   struct stat st;
@@ -112,6 +112,8 @@ double vnormalize(gsl_vector* x);
 */
 int dir_exists(string dname);
 bool file_exists(string filename);
+string binary_twin(string filename);
+bool data_file_exists(string filename);
 void make_directory(string name);
 void remove_directory(string name);
 